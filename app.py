@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from sqlalchemy import func
 from datetime import datetime, timedelta
 import sys
 import os
@@ -12,70 +13,39 @@ st.set_page_config(
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# --- IMPORTAÇÕES REPORTLAB (com tratamento de erros) ---
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib.units import inch
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-    from reportlab.pdfgen import canvas
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
-    REPORTLAB_AVAILABLE = True
-except ImportError as e:
-    print(f"⚠️ ReportLab não disponível: {e}")
-    REPORTLAB_AVAILABLE = False
-    # Definir placeholders para evitar erros
-    class SimpleDocTemplate:
-        pass
-    class Paragraph:
-        pass
-    class Spacer:
-        pass
-    class Table:
-        pass
-    class TableStyle:
-        pass
-    class colors:
-        class HexColor:
-            def __init__(self, color):
-                pass
-        white = None
-        black = None
-        gray = None
-        class colors:
-            pass
-    class getSampleStyleSheet:
-        def __init__(self):
-            self.Normal = type('Normal', (), {})
-            self.Heading1 = type('Heading1', (), {})
-    class ParagraphStyle:
-        def __init__(self, name, parent, **kwargs):
-            pass
-    class TA_CENTER:
-        pass
-    class TA_LEFT:
-        pass
-    class TA_RIGHT:
-        pass
-    A4 = (595.2755905511812, 841.8897637795277)
-    colors.HexColor = lambda x: None
-    colors.white = "#FFFFFF"
-    colors.black = "#000000"
-    colors.gray = "#808080"
-
 # --- IMPORTAÇÕES PRINCIPAIS ---
 try:
     from auth import require_auth, get_current_user, show_login_register_page, auth_system, is_admin
     from models import init_db, SessionLocal, User, Product, Customer, Supplier, Order, Budget, SystemConfig
     from security import hash_password, verify_password, validate_email, validate_password_strength
     from config import config
+    from batch_planner import PlanoImpressao
+    from gangsheet import compor_folha
+    from artwork_library import ingerir_arte, ler_arte, ler_miniatura
+    from pdf_cache import cache_pdfs, chave_documento
+    from artifact_store import armazem_artefatos
+    from db_pool import metricas_pool, CONFIGURACOES_POOL
+    from pdf_documents import VERSAO_LAYOUT_PDF, argumentos_documento
+    from number_sequences import proximo_numero
+    from line_items import gravar_itens
+    from document_preview import previa_orcamento, previa_nota_fiscal
+    from pdf_workers import pool_pdfs, pre_renderizador, FilaCheia, TEMPO_LIMITE_S
+    from sales_report import assinatura_mes, NOMES_MESES
+    from pdf_export import TIPOS_EXPORTACAO, contar_documentos, listar_documentos, exportar_zip
+    from film_ledger import registrar_corrida, pecas_impressas, resumo_consumo, consumo_por_dia, consumo_por_produto
+    from artwork import detectar_area_impressao, hash_conteudo, calcular_custo_tinta
+    from schema_migrations import migrar
+    from order_queries import pedidos_atrasados, fila_producao, pedidos_do_cliente, pedidos_filtrados
+    
+    @st.cache_resource
+    def preparar_banco():
+        """Uma vez por processo: migrações pendentes (normalmente já aplicadas no deploy) e dados padrão"""
+        migrar()
+        init_db()
     
     # Inicialização única segura
     if 'db_initialized' not in st.session_state:
-        init_db()
+        preparar_banco()
         st.session_state.db_initialized = True
         
 except Exception as e:
@@ -96,6 +66,8 @@ COR_CINZA = "#30363D"
 COR_AMARELA = "#FFD700"
 COR_AZUL = "#1F6FEB"
 
+TIPOS_ARTE = ["png", "jpg", "jpeg", "webp", "tif", "tiff"]
+
 # --- FUNÇÕES UTILITÁRIAS ---
 def carregar_dados():
     """Carrega dados do banco de dados para o contexto atual"""
@@ -129,7 +101,7 @@ def carregar_dados():
             "clientes": customers,
             "fornecedores": suppliers,
             "pedidos": orders,
-            "ultimo_numero_orcamento": max([b.get('budget_number', 0) for b in budgets], default=0),
+            "ultimo_numero_orcamento": max((b['budget_number'] for b in budgets if b.get('budget_number')), default=None, key=lambda n: (len(n), n)),
             "ultimo_id_cliente": max([c.get('id', 0) for c in customers], default=0),
             "ultimo_id_fornecedor": max([s.get('id', 0) for s in suppliers], default=0),
             "ultimo_id_pedido": max([o.get('id', 0) for o in orders], default=0),
@@ -169,402 +141,130 @@ def get_cor_status_pedido(pedido):
     else:
         return COR_AMARELA  # Amarelo para recente
 
-def gerar_pdf(orcamento):
-    """Gera PDF para um orçamento"""
+def aplicar_arte_nas_dimensoes(arquivo, chave_altura, chave_largura, dpi_padrao=300):
+    """Detecta a área útil da arte enviada e preenche os campos de dimensão"""
+    if arquivo is None:
+        return None
+    
+    dados = arquivo.getvalue()
     try:
-        # Criar arquivo temporário
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        pdf_path = temp_file.name
-        temp_file.close()
-        
-        # Criar documento
-        doc = SimpleDocTemplate(pdf_path, pagesize=A4, 
-                               rightMargin=72, leftMargin=72,
-                               topMargin=72, bottomMargin=72)
-        
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Estilos personalizados
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            alignment=TA_CENTER,
-            spaceAfter=12
-        )
-        
-        # Título
-        title = Paragraph(f"ORÇAMENTO #{orcamento.get('budget_number', orcamento.get('numero', ''))}", title_style)
-        elements.append(title)
-        elements.append(Spacer(1, 12))
-        
-        # Informações da empresa
-        empresa_info = [
-            ["Criatividade, Personalidade e muito Capricho!", ""],
-            ["DTF Pricing Calculator", ""],
-            [f"Data: {orcamento.get('created_at', orcamento.get('data', ''))}", ""]
-        ]
-        
-        empresa_table = Table(empresa_info, colWidths=[doc.width/2.0]*2)
-        empresa_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (0, 1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        
-        elements.append(empresa_table)
-        elements.append(Spacer(1, 20))
-        
-        # Dados do Cliente
-        cliente_data = [
-            ["DADOS DO CLIENTE", ""],
-            ["Cliente:", orcamento.get('client_name', orcamento.get('cliente', ''))],
-            ["Endereço:", orcamento.get('address', orcamento.get('endereco', ''))],
-            ["Tipo de Entrega:", orcamento.get('delivery_type', orcamento.get('tipo_entrega', ''))],
-            ["Tipo de Venda:", orcamento.get('sale_type', orcamento.get('tipo_venda', ''))],
-            ["Prazo de Produção:", orcamento.get('production_deadline', orcamento.get('prazo_producao', ''))]
-        ]
-        
-        cliente_table = Table(cliente_data, colWidths=[doc.width/3.0, doc.width*2/3.0])
-        cliente_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_ROXA)),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f5f5f5')),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('PADDING', (0, 1), (-1, -1), 6),
-        ]))
-        
-        elements.append(cliente_table)
-        elements.append(Spacer(1, 20))
-        
-        # Itens do Orçamento
-        items_data = [["ITENS DO ORÇAMENTO", "", "", ""], 
-                     ["Produto", "Quantidade", "Valor Unitário (R$)", "Valor Total (R$)"]]
-        
-        items = orcamento.get('items', [])
-        if isinstance(items, str):
-            items = json.loads(items)
-        
-        for item in items:
-            item_total = float(item.get('valor_unitario', item.get('unit_price', 0))) * float(item.get('quantidade', item.get('quantity', 0)))
-            items_data.append([
-                item.get('nome', item.get('name', '')),
-                f"{item.get('quantidade', item.get('quantity', 0)):.0f}",
-                formatar_moeda(item.get('valor_unitario', item.get('unit_price', 0))),
-                formatar_moeda(item_total)
-            ])
-        
-        items_table = Table(items_data, colWidths=[doc.width*0.4, doc.width*0.2, doc.width*0.2, doc.width*0.2])
-        items_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_LARANJA)),
-            ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor(COR_AZUL_ARDOSIA)),
-            ('TEXTCOLOR', (0, 0), (-1, 1), colors.white),
-            ('ALIGN', (0, 0), (-1, 1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 1), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (0, 2), (-1, 2), 'CENTER'),
-            ('BACKGROUND', (0, 2), (-1, 2), colors.HexColor('#f9f9f9')),
-            ('FONTSIZE', (0, 2), (-1, 2), 10),
-            ('PADDING', (0, 2), (-1, 2), 8),
-        ]))
-        
-        elements.append(items_table)
-        elements.append(Spacer(1, 20))
-        
-        # Resumo
-        resumo_data = [
-            ["RESUMO DO ORÇAMENTO", ""],
-            ["Valor Total:", formatar_moeda(orcamento.get('total_amount', orcamento.get('valor_total', 0)))]
-        ]
-        
-        resumo_table = Table(resumo_data, colWidths=[doc.width/2.0]*2)
-        resumo_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_VERDE)),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
-            ('FONTSIZE', (0, 1), (-1, -1), 11),
-            ('PADDING', (0, 1), (-1, -1), 8),
-            ('BACKGROUND', (1, 1), (1, 1), colors.HexColor('#f0f8ff')),
-        ]))
-        
-        elements.append(resumo_table)
-        
-        # Observações (se existirem)
-        if orcamento.get('observacoes') or orcamento.get('notes'):
-            elements.append(Spacer(1, 20))
-            obs_text = orcamento.get('observacoes') or orcamento.get('notes', '')
-            obs_data = [
-                ["OBSERVAÇÕES"],
-                [obs_text]
-            ]
-            
-            obs_table = Table(obs_data, colWidths=[doc.width])
-            obs_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_CINZA)),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (0, 1), (-1, 1), 'LEFT'),
-                ('FONTSIZE', (0, 1), (-1, 1), 10),
-                ('PADDING', (0, 1), (-1, 1), 8),
-                ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor('#f5f5f5')),
-            ]))
-            
-            elements.append(obs_table)
-        
-        # Rodapé
-        elements.append(Spacer(1, 30))
-        rodape = Paragraph(
-            "CONDIÇÕES E INFORMAÇÕES ADICIONAIS<br/>"
-            "1. Este orçamento tem validade de 30 dias a partir da data de emissão.<br/>"
-            "2. O prazo de produção começa a contar após a confirmação do pedido e pagamento.<br/>"
-            "3. Preços sujeitos a alteração sem aviso prévio.<br/>"
-            "4. Para dúvidas, acesse nossos canais de atendimento.<br/>"
-            "(75) 9155-5968 | @sejacapricho | sejacapricho.com.br",
-            ParagraphStyle(
-                'Rodape',
-                parent=styles['Normal'],
-                fontSize=9,
-                alignment=TA_CENTER,
-                textColor=colors.gray
-            )
+        area = dict(detectar_area_impressao(dados, dpi_padrao))
+    except Exception as e:
+        st.error(f"Não foi possível analisar a arte: {str(e)}")
+        return None
+    area['hash'] = hash_conteudo(dados)
+    
+    if area['vazia']:
+        st.warning("A arte enviada está totalmente transparente.")
+        return area
+    
+    # Preencher só uma vez por arquivo para não sobrescrever ajustes manuais
+    chave_aplicada = f"{chave_altura}_arte"
+    if st.session_state.get(chave_aplicada) != area['hash']:
+        st.session_state[chave_altura] = round(area['altura_cm'], 1)
+        st.session_state[chave_largura] = round(area['largura_cm'], 1)
+        st.session_state[chave_aplicada] = area['hash']
+    
+    # Guardar na biblioteca (uma vez por arquivo) para reusar em pedidos e prévias
+    chave_salva = f"{chave_altura}_arte_salva"
+    if st.session_state.get(chave_salva) != area['hash']:
+        try:
+            ingerir_arte(dados, arquivo.name, get_current_user()['id'], dpi_padrao)
+            st.session_state[chave_salva] = area['hash']
+        except Exception as e:
+            st.warning(f"A arte não foi salva na biblioteca: {str(e)}")
+    if st.session_state.get(chave_salva) == area['hash']:
+        area['arte_id'] = area['hash']
+    
+    st.caption(f"Área útil: {area['largura_cm']:.1f} × {area['altura_cm']:.1f} cm "
+               f"(arquivo: {area['largura_total_cm']:.1f} × {area['altura_total_cm']:.1f} cm, "
+               f"{area['dpi'][0]:.0f} DPI)")
+    cobertura = area['cobertura']
+    st.caption(f"Cobertura de tinta: C {cobertura['c']:.0%} · M {cobertura['m']:.0%} · "
+               f"Y {cobertura['y']:.0%} · K {cobertura['k']:.0%} · Branco {cobertura['branco']:.0%}")
+    return area
+
+def ids_das_artes(analise_frente, analise_costas):
+    """Referências (ids da biblioteca) das artes usadas em um item"""
+    artes = {}
+    if analise_frente and analise_frente.get('arte_id'):
+        artes['frente'] = analise_frente['arte_id']
+    if analise_costas and analise_costas.get('arte_id'):
+        artes['costas'] = analise_costas['arte_id']
+    return artes
+
+def mostrar_previas_artes(items):
+    """Miniaturas das artes referenciadas pelos itens (sem abrir os originais)"""
+    previas = []
+    for item in items:
+        artes = (item.get('detalhes') or {}).get('artes') or {}
+        for lado, arte_id in artes.items():
+            miniatura = ler_miniatura(arte_id)
+            if miniatura:
+                previas.append((miniatura, f"{item.get('nome', item.get('name', ''))} - {lado.capitalize()}"))
+    if not previas:
+        return
+    st.subheader("Artes")
+    colunas = st.columns(min(len(previas), 4))
+    for indice, (miniatura, legenda) in enumerate(previas):
+        with colunas[indice % len(colunas)]:
+            st.image(miniatura, caption=legenda)
+
+def custo_tinta_da_arte(analise, altura, largura, config):
+    """Custo de tinta de um lado da estampa a partir da cobertura da arte"""
+    if not analise or analise.get('vazia'):
+        return 0.0
+    return calcular_custo_tinta(analise['cobertura'], altura * largura,
+                                config.get('ink_cost_cmyk_m2', 0.0),
+                                config.get('ink_cost_white_m2', 0.0))
+
+def gerar_documento_pdf(tipo, rotulo, *dados, tempo_limite=TEMPO_LIMITE_S):
+    """Busca o PDF no cache ou gera no pool de processos, mostrando o andamento"""
+    dados = argumentos_documento(tipo, *dados)
+    chave = chave_documento(tipo, VERSAO_LAYOUT_PDF, *dados)
+    pdf = cache_pdfs.obter(chave)
+    if pdf is not None:
+        return pdf
+    
+    etapas = {'fila': 'aguardando na fila...', 'gerando': 'gerando...', 'pronto': 'pronto!'}
+    barra = st.progress(0.0, text=f"{rotulo}: {etapas['fila']}")
+    try:
+        # Documento antecipado ao salvar e ainda em geração: aguarda o mesmo Future
+        futuro = pre_renderizador.em_andamento(chave) or pool_pdfs.enviar(tipo, *dados)
+        pdf = pool_pdfs.aguardar(
+            futuro, tempo_limite=tempo_limite, ao_progredir=lambda fracao, etapa: barra.progress(fracao, text=f"{rotulo}: {etapas[etapa]}")
         )
-        elements.append(rodape)
-        
-        # Construir PDF
-        doc.build(elements)
-        return pdf_path
-        
+    finally:
+        barra.empty()
+    cache_pdfs.guardar(chave, pdf)
+    return pdf
+
+def pdf_pronto(tipo, *dados):
+    """PDF já gerado (antecipado ao salvar ou pedido antes), sem gerar nada"""
+    return cache_pdfs.obter(chave_documento(tipo, VERSAO_LAYOUT_PDF, *argumentos_documento(tipo, *dados)))
+
+def gerar_pdf(orcamento):
+    """Gera o PDF de um orçamento (bytes) fora do thread do script"""
+    try:
+        return gerar_documento_pdf('orcamento', "Orçamento", orcamento)
+    except FilaCheia as e:
+        st.warning(f"⏳ {str(e)}")
+        return None
     except Exception as e:
         st.error(f"Erro ao gerar PDF: {str(e)}")
         return None
 
 def gerar_nota_fiscal(pedido, cliente):
-    """Gera nota fiscal/recibo para um pedido"""
+    """Gera a nota fiscal/recibo de um pedido (bytes) fora do thread do script.
+
+    Um pedido sem alterações devolve o mesmo documento do cache (segunda via
+    idêntica, com a data de emissão original).
+    """
     try:
-        # Criar arquivo temporário
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        pdf_path = temp_file.name
-        temp_file.close()
-        
-        # Criar documento
-        doc = SimpleDocTemplate(pdf_path, pagesize=A4, 
-                               rightMargin=72, leftMargin=72,
-                               topMargin=72, bottomMargin=72)
-        
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Estilos personalizados
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            alignment=TA_CENTER,
-            spaceAfter=12
-        )
-        
-        # Título
-        title = Paragraph(f"RECIBO / NOTA FISCAL", title_style)
-        elements.append(title)
-        elements.append(Spacer(1, 12))
-        
-        # Informações da empresa
-        empresa_info = [
-            ["Criatividade, Personalidade e muito Capricho!", ""],
-            ["DTF Pricing Calculator", ""],
-            [f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}", ""],
-            [f"Nº do Pedido: #{pedido.get('order_number', pedido.get('id', ''))}", ""]
-        ]
-        
-        empresa_table = Table(empresa_info, colWidths=[doc.width/2.0]*2)
-        empresa_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (0, 1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        
-        elements.append(empresa_table)
-        elements.append(Spacer(1, 20))
-        
-        # Dados do Cliente
-        cliente_data = [
-            ["DADOS DO CLIENTE", ""],
-            ["Cliente:", cliente.get('name', '') if cliente else ''],
-            ["Documento:", cliente.get('document', '') if cliente else ''],
-            ["Endereço:", cliente.get('address', '') if cliente else ''],
-            ["Telefone:", cliente.get('phone', '') if cliente else ''],
-            ["Email:", cliente.get('email', '') if cliente else ''],
-            ["Tipo de Entrega:", pedido.get('delivery_type', '')],
-            ["Prazo de Entrega:", pedido.get('delivery_deadline', '')]
-        ]
-        
-        cliente_table = Table(cliente_data, colWidths=[doc.width/3.0, doc.width*2/3.0])
-        cliente_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_ROXA)),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f5f5f5')),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('PADDING', (0, 1), (-1, -1), 6),
-        ]))
-        
-        elements.append(cliente_table)
-        elements.append(Spacer(1, 20))
-        
-        # Itens do Pedido
-        items_data = [["ITENS DO PEDIDO", "", "", ""], 
-                     ["Produto", "Quantidade", "Valor Unitário (R$)", "Valor Total (R$)"]]
-        
-        items = pedido.get('items', [])
-        if isinstance(items, str):
-            items = json.loads(items)
-        
-        for item in items:
-            item_total = float(item.get('valor_unitario', item.get('unit_price', 0))) * float(item.get('quantidade', item.get('quantity', 0)))
-            items_data.append([
-                item.get('nome', item.get('name', '')),
-                f"{item.get('quantidade', item.get('quantity', 0)):.0f}",
-                formatar_moeda(item.get('valor_unitario', item.get('unit_price', 0))),
-                formatar_moeda(item_total)
-            ])
-        
-        items_table = Table(items_data, colWidths=[doc.width*0.4, doc.width*0.2, doc.width*0.2, doc.width*0.2])
-        items_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_LARANJA)),
-            ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor(COR_AZUL_ARDOSIA)),
-            ('TEXTCOLOR', (0, 0), (-1, 1), colors.white),
-            ('ALIGN', (0, 0), (-1, 1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 1), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (0, 2), (-1, 2), 'CENTER'),
-            ('BACKGROUND', (0, 2), (-1, 2), colors.HexColor('#f9f9f9')),
-            ('FONTSIZE', (0, 2), (-1, 2), 10),
-            ('PADDING', (0, 2), (-1, 2), 8),
-        ]))
-        
-        elements.append(items_table)
-        elements.append(Spacer(1, 20))
-        
-        # Resumo do Pedido
-        resumo_data = [
-            ["RESUMO DO PEDIDO", ""],
-            ["Subtotal:", formatar_moeda(pedido.get('total_amount', 0))],
-            ["Status de Pagamento:", "PAGO" if pedido.get('payment_status') == 'paid' else "PENDENTE"],
-            ["Status de Entrega:", "ENTREGUE" if pedido.get('delivery_status') == 'delivered' else "EM PRODUÇÃO"]
-        ]
-        
-        if pedido.get('payment_method'):
-            resumo_data.insert(3, ["Forma de Pagamento:", pedido.get('payment_method')])
-        
-        resumo_table = Table(resumo_data, colWidths=[doc.width/2.0]*2)
-        resumo_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_VERDE)),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
-            ('FONTSIZE', (0, 1), (-1, -1), 11),
-            ('PADDING', (0, 1), (-1, -1), 8),
-        ]))
-        
-        elements.append(resumo_table)
-        
-        # Observações
-        if pedido.get('notes'):
-            elements.append(Spacer(1, 20))
-            obs_data = [
-                ["OBSERVAÇÕES"],
-                [pedido['notes']]
-            ]
-            
-            obs_table = Table(obs_data, colWidths=[doc.width])
-            obs_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_CINZA)),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (0, 1), (-1, 1), 'LEFT'),
-                ('FONTSIZE', (0, 1), (-1, 1), 10),
-                ('PADDING', (0, 1), (-1, 1), 8),
-                ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor('#f5f5f5')),
-            ]))
-            
-            elements.append(obs_table)
-        
-        # Rodapé
-        elements.append(Spacer(1, 30))
-        rodape = Paragraph(
-            "INFORMAÇÕES IMPORTANTES<br/>"
-            "1. Este documento serve como recibo/nota fiscal simplificada.<br/>"
-            "2. Guarde este comprovante para futuras referências.<br/>"
-            "3. Para dúvidas ou reclamações, entre em contato.<br/>"
-            "(75) 9155-5968 | @sejacapricho | sejacapricho.com.br<br/><br/>"
-            f"Emitido em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}",
-            ParagraphStyle(
-                'Rodape',
-                parent=styles['Normal'],
-                fontSize=9,
-                alignment=TA_CENTER,
-                textColor=colors.gray
-            )
-        )
-        elements.append(rodape)
-        
-        # Assinatura
-        elements.append(Spacer(1, 40))
-        assinatura_data = [
-            ["________________________________"],
-            ["Assinatura do Responsável"]
-        ]
-        
-        assinatura_table = Table(assinatura_data, colWidths=[doc.width])
-        assinatura_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ]))
-        elements.append(assinatura_table)
-        
-        # Construir PDF
-        doc.build(elements)
-        return pdf_path
-        
+        return gerar_documento_pdf('nota_fiscal', "Nota fiscal", pedido, cliente or {})
+    except FilaCheia as e:
+        st.warning(f"⏳ {str(e)}")
+        return None
     except Exception as e:
         st.error(f"Erro ao gerar nota fiscal: {str(e)}")
         return None
@@ -608,17 +308,30 @@ def mostrar_calculadora():
             with col_b:
                 incluir_custos_fixos = st.toggle("Incluir Custos Fixos", value=True)
             
+            # Arte (opcional) - detecta a área útil e preenche as dimensões
+            dpi_padrao = data['config'].get('artwork_default_dpi', 300)
+            with st.expander("🖼️ Arte da Estampa (preenche as dimensões)"):
+                col_arte1, col_arte2 = st.columns(2)
+                with col_arte1:
+                    arte_frente = st.file_uploader("Arte da Frente", type=TIPOS_ARTE, key="arte_frente_calc")
+                    analise_frente = aplicar_arte_nas_dimensoes(arte_frente, "frente_altura_calc", "frente_largura_calc", dpi_padrao)
+                with col_arte2:
+                    arte_costas = st.file_uploader("Arte das Costas", type=TIPOS_ARTE, key="arte_costas_calc")
+                    analise_costas = aplicar_arte_nas_dimensoes(arte_costas, "costas_altura_calc", "costas_largura_calc", dpi_padrao)
+            
             # Dimensões
             st.subheader("Dimensões (cm)")
+            for chave in ["frente_altura_calc", "frente_largura_calc", "costas_altura_calc", "costas_largura_calc"]:
+                st.session_state.setdefault(chave, 0.0)
             dim_cols = st.columns(4)
             with dim_cols[0]:
-                frente_altura = st.number_input("Altura Frente", min_value=0.0, value=0.0, step=0.5)
+                frente_altura = st.number_input("Altura Frente", min_value=0.0, step=0.5, key="frente_altura_calc")
             with dim_cols[1]:
-                frente_largura = st.number_input("Largura Frente", min_value=0.0, value=0.0, step=0.5)
+                frente_largura = st.number_input("Largura Frente", min_value=0.0, step=0.5, key="frente_largura_calc")
             with dim_cols[2]:
-                costas_altura = st.number_input("Altura Costas", min_value=0.0, value=0.0, step=0.5)
+                costas_altura = st.number_input("Altura Costas", min_value=0.0, step=0.5, key="costas_altura_calc")
             with dim_cols[3]:
-                costas_largura = st.number_input("Largura Costas", min_value=0.0, value=0.0, step=0.5)
+                costas_largura = st.number_input("Largura Costas", min_value=0.0, step=0.5, key="costas_largura_calc")
             
             # Quantidade e Margem
             qtd_cols = st.columns(2)
@@ -644,6 +357,12 @@ def mostrar_calculadora():
                     custo_cm2 = preco_metro / area_metro_linear
                     custo_dtf = area_total * custo_cm2
                 
+                # Tinta (pela cobertura real das artes enviadas)
+                custo_tinta = 0
+                if usa_dtf:
+                    custo_tinta = (custo_tinta_da_arte(analise_frente, frente_altura, frente_largura, data['config']) +
+                                   custo_tinta_da_arte(analise_costas, costas_altura, costas_largura, data['config']))
+                
                 # Custos fixos
                 custos_fixos = 0
                 if incluir_custos_fixos:
@@ -657,7 +376,7 @@ def mostrar_calculadora():
                                     data['config'].get('packaging_cost_value', 1.0))
                 
                 # Cálculo final
-                custo_unitario = produto_atual.get('custo', produto_atual.get('cost', 0)) + custo_dtf + custos_fixos
+                custo_unitario = produto_atual.get('custo', produto_atual.get('cost', 0)) + custo_dtf + custo_tinta + custos_fixos
                 preco_unitario = custo_unitario * (1 + margem / 100)
                 preco_total = preco_unitario * quantidade
                 
@@ -665,10 +384,19 @@ def mostrar_calculadora():
                 st.session_state.calculation_result = {
                     'produto': produto_atual.get('nome', produto_atual.get('name', '')),
                     'preco_unitario': preco_unitario,
+                    'custo_unitario': custo_unitario,
                     'quantidade': quantidade,
                     'preco_total': preco_total,
                     'area_total': area_total,
-                    'usa_dtf': usa_dtf
+                    'custo_tinta': custo_tinta,
+                    'usa_dtf': usa_dtf,
+                    'dimensoes': {
+                        'frente_altura': frente_altura,
+                        'frente_largura': frente_largura,
+                        'costas_altura': costas_altura,
+                        'costas_largura': costas_largura
+                    },
+                    'artes': ids_das_artes(analise_frente, analise_costas) if usa_dtf else {}
                 }
                 
                 st.success(f"Preço calculado: {formatar_moeda(preco_total)}")
@@ -689,6 +417,8 @@ def mostrar_calculadora():
             st.write(f"**Preço Unitário:** {formatar_moeda(result['preco_unitario'])}")
             st.write(f"**Quantidade:** {result['quantidade']}")
             st.write(f"**Área Total:** {result['area_total']:.2f} cm²")
+            if result.get('custo_tinta'):
+                st.write(f"**Tinta (por unidade):** {formatar_moeda(result['custo_tinta'])}")
             st.write(f"**DTF:** {'Sim' if result['usa_dtf'] else 'Não'}")
             
             # Botões para adicionar à seleção
@@ -698,8 +428,15 @@ def mostrar_calculadora():
                     novo_item = {
                         'nome': result['produto'],
                         'preco_unitario': result['preco_unitario'],
+                        'custo_unitario': result.get('custo_unitario'),
                         'quantidade': result['quantidade'],
-                        'preco_total': result['preco_total']
+                        'preco_total': result['preco_total'],
+                        'detalhes': {
+                            'usa_dtf': result['usa_dtf'],
+                            'area_total': result['area_total'],
+                            'dimensoes': result.get('dimensoes', {}),
+                            'artes': result.get('artes', {})
+                        }
                     }
                     st.session_state.selected_products.append(novo_item)
                     st.success("Produto adicionado à seleção!")
@@ -715,7 +452,7 @@ def mostrar_calculadora():
         # Lista de produtos selecionados
         if st.session_state.selected_products:
             st.subheader("Produtos Selecionados")
-            selected_df = pd.DataFrame(st.session_state.selected_products)
+            selected_df = pd.DataFrame(st.session_state.selected_products).drop(columns=['detalhes'], errors='ignore')
             st.dataframe(selected_df, use_container_width=True, hide_index=True)
             
             total_selecionado = sum(p['preco_total'] for p in st.session_state.selected_products)
@@ -764,7 +501,9 @@ def mostrar_produtos():
                 if st.button("Adicionar Produto", type="primary", use_container_width=True):
                     if nome.strip():
                         # Verificar se produto já existe
-                        produto_existente = db.query(Product).filter(Product.name.ilike(nome.strip())).first()
+                        produto_existente = db.query(Product).filter(
+                            func.lower(Product.name) == func.lower(nome.strip())
+                        ).first()
                         
                         current_user = get_current_user()
                         
@@ -860,7 +599,7 @@ def mostrar_orcamentos():
         st.metric("Total de Orçamentos", len(data['orcamentos']))
     with col_stats2:
         last_number = data['ultimo_numero_orcamento']
-        st.metric("Último Número", f"#{last_number:04d}")
+        st.metric("Último Número", f"#{last_number}" if last_number else "-")
     with col_stats3:
         total_valor = sum(o.get('total_amount', o.get('valor_total', 0)) for o in data['orcamentos'])
         st.metric("Valor Total", formatar_moeda(total_valor))
@@ -884,8 +623,6 @@ def mostrar_orcamentos():
                 with col_info:
                     # Determinar produto/itens
                     items = orcamento.get('items', [])
-                    if isinstance(items, str):
-                        items = json.loads(items)
                     
                     if items:
                         if len(items) > 1:
@@ -915,11 +652,8 @@ def mostrar_orcamentos():
                     
                     if st.button("PDF", key=f"pdf_{budget_num}"):
                         # Gerar PDF
-                        pdf_path = gerar_pdf(orcamento)
-                        if pdf_path:
-                            with open(pdf_path, "rb") as f:
-                                pdf_bytes = f.read()
-                            
+                        pdf_bytes = gerar_pdf(orcamento)
+                        if pdf_bytes:
                             st.download_button(
                                 label="Baixar PDF",
                                 data=pdf_bytes,
@@ -1066,7 +800,7 @@ def mostrar_criar_orcamento():
                     user = db.query(User).filter(User.id == current_user['id']).first()
                     
                     # Gerar número do orçamento
-                    ultimo_numero = db.query(Budget).count() + 1
+                    numero_orcamento = proximo_numero(db, 'orcamento')
                     
                     # Preparar itens para salvar
                     itens_para_salvar = []
@@ -1077,7 +811,9 @@ def mostrar_criar_orcamento():
                             itens_para_salvar.append({
                                 "nome": item['nome'],
                                 "quantidade": item['quantidade'],
-                                "valor_unitario": item['preco_unitario']
+                                "valor_unitario": item['preco_unitario'],
+                                "custo_unitario": item.get('custo_unitario'),
+                                "detalhes": item.get('detalhes', {})
                             })
                     
                     # Adicionar itens manuais
@@ -1090,22 +826,27 @@ def mostrar_criar_orcamento():
                             })
                     
                     novo_orcamento = Budget(
-                        budget_number=str(ultimo_numero).zfill(4),
+                        budget_number=numero_orcamento,
                         client_name=cliente.strip(),
                         address=endereco.strip(),
                         delivery_type=tipo_entrega,
                         sale_type=tipo_venda,
                         production_deadline=prazo_producao,
                         total_amount=total,
-                        items=json.dumps(itens_para_salvar),
+                        items=itens_para_salvar,
                         notes=observacoes.strip(),
                         user=user
                     )
                     
+                    gravar_itens(db, novo_orcamento)
                     db.add(novo_orcamento)
                     db.commit()
                     
-                    st.success(f"✅ Orçamento #{ultimo_numero:04d} salvo com sucesso!")
+                    # PDF gerado em segundo plano: o download já sai pronto na tela do orçamento
+                    orcamento_salvo = novo_orcamento.to_dict()
+                    pre_renderizador.agendar('orcamento', orcamento_salvo)
+                    
+                    st.success(f"✅ Orçamento #{numero_orcamento} salvo com sucesso!")
                     
                     # Limpar dados temporários
                     if 'selected_products' in st.session_state:
@@ -1113,20 +854,11 @@ def mostrar_criar_orcamento():
                     if 'manual_items' in st.session_state:
                         st.session_state.manual_items = []
                     
-                    # Gerar PDF se solicitado
+                    # PDF solicitado: abre o orçamento, onde o download aparece assim que ficar pronto
                     if save_pdf_clicked:
-                        pdf_path = gerar_pdf(novo_orcamento.to_dict())
-                        if pdf_path:
-                            with open(pdf_path, "rb") as f:
-                                pdf_bytes = f.read()
-                            
-                            st.download_button(
-                                label="📄 Baixar PDF",
-                                data=pdf_bytes,
-                                file_name=f"Orcamento_{ultimo_numero:04d}.pdf",
-                                mime="application/pdf",
-                                type="primary"
-                            )
+                        st.session_state.view_budget = orcamento_salvo
+                        st.session_state.current_page = "view_budget"
+                        st.rerun()
                     
                     # Opção para ir para a lista de orçamentos
                     if st.button("Ver Lista de Orçamentos"):
@@ -1166,8 +898,6 @@ def mostrar_ver_orcamento():
     # Itens
     st.subheader("Itens")
     items = orcamento.get('items', [])
-    if isinstance(items, str):
-        items = json.loads(items)
     
     if items:
         itens_data = []
@@ -1181,6 +911,7 @@ def mostrar_ver_orcamento():
         
         df = pd.DataFrame(itens_data)
         st.dataframe(df, use_container_width=True, hide_index=True)
+        mostrar_previas_artes(items)
     elif 'produto' in orcamento:
         st.write(f"**Produto:** {orcamento['produto']}")
         st.write(f"**Quantidade:** {orcamento.get('quantidade', 0)}")
@@ -1194,15 +925,26 @@ def mostrar_ver_orcamento():
         st.subheader("Observações")
         st.write(orcamento.get('observacoes') or orcamento.get('notes', ''))
     
+    # Prévia do documento (mesmo layout do PDF, sem gerar o PDF)
+    with st.expander("👁️ Pré-visualizar Orçamento"):
+        st.markdown(previa_orcamento(orcamento), unsafe_allow_html=True)
+    
     # Botões de ação
     col_btn1, col_btn2, col_btn3 = st.columns(3)
     with col_btn1:
-        if st.button("Gerar PDF", type="primary", use_container_width=True):
-            pdf_path = gerar_pdf(orcamento)
-            if pdf_path:
-                with open(pdf_path, "rb") as f:
-                    pdf_bytes = f.read()
-                
+        pdf_bytes = pdf_pronto('orcamento', orcamento)
+        if pdf_bytes:
+            st.download_button(
+                label="📄 Baixar PDF",
+                data=pdf_bytes,
+                file_name=f"Orcamento_{orcamento.get('budget_number', orcamento.get('numero', ''))}.pdf",
+                mime="application/pdf",
+                type="primary",
+                use_container_width=True
+            )
+        elif st.button("Gerar PDF", type="primary", use_container_width=True):
+            pdf_bytes = gerar_pdf(orcamento)
+            if pdf_bytes:
                 st.download_button(
                     label="Baixar PDF",
                     data=pdf_bytes,
@@ -1447,13 +1189,14 @@ def mostrar_ver_cliente():
     with tab2:
         st.subheader("Pedidos do Cliente")
         
-        # Filtrar pedidos deste cliente
-        pedidos_cliente = [p for p in data['pedidos'] if p.get('customer_id') == cliente['id']]
+        # Pedidos deste cliente, mais recente primeiro (índice customer_id, created_at)
+        db = SessionLocal()
+        try:
+            pedidos_cliente = [o.to_dict() for o in pedidos_do_cliente(db, cliente['id'])]
+        finally:
+            db.close()
         
         if pedidos_cliente:
-            # Ordenar por data (mais recente primeiro)
-            pedidos_cliente.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-            
             for pedido in pedidos_cliente:
                 cor = get_cor_status_pedido(pedido)
                 
@@ -1470,8 +1213,6 @@ def mostrar_ver_cliente():
                         
                         # Mostrar produtos
                         items = pedido.get('items', [])
-                        if isinstance(items, str):
-                            items = json.loads(items)
                         
                         if items:
                             produtos = ", ".join([item.get('nome', item.get('name', '')) for item in items[:3]])
@@ -1514,9 +1255,7 @@ def mostrar_ver_cliente():
     with tab3:
         st.subheader("Estatísticas do Cliente")
         
-        # Filtrar pedidos deste cliente
-        pedidos_cliente = [p for p in data['pedidos'] if p.get('customer_id') == cliente['id']]
-        
+        # pedidos_cliente: mesma consulta da aba de pedidos
         if pedidos_cliente:
             col_stat1, col_stat2, col_stat3 = st.columns(3)
             
@@ -1926,36 +1665,32 @@ def mostrar_pedidos():
     st.subheader("Lista de Pedidos")
     
     if data['pedidos']:
-        # Ordenar por data (mais recente primeiro)
-        pedidos_ordenados = sorted(data['pedidos'], key=lambda x: x.get('created_at', ''), reverse=True)
-        
-        # Aplicar filtros
-        pedidos_filtrados = []
-        for pedido in pedidos_ordenados:
-            # Filtro de status de pagamento
-            if "Todos" not in filtro_status:
-                status_pagamento = "Pago" if pedido.get('payment_status') == 'paid' else "Pendente"
-                if status_pagamento not in filtro_status:
-                    continue
-            
-            # Filtro de status de entrega
-            if "Todos" not in filtro_entrega:
-                status_entrega = "Entregue" if pedido.get('delivery_status') == 'delivered' else "Pendente"
-                if status_entrega not in filtro_entrega:
-                    continue
-            
-            # Filtro por cliente
-            if filtro_cliente != "Todos":
-                cliente = next((c for c in data['clientes'] if c['id'] == pedido.get('customer_id')), None)
-                if not cliente or cliente['name'] != filtro_cliente:
-                    continue
-            
-            pedidos_filtrados.append(pedido)
+        # Filtros aplicados no banco (índices de order_queries), mais recente primeiro
+        def _opcao(filtro, sim, nao):
+            # None quando "Todos" ou as duas opções estão marcadas
+            if "Todos" in filtro or (sim in filtro) == (nao in filtro):
+                return None
+            return sim in filtro
+        
+        pagos = _opcao(filtro_status, "Pago", "Pendente")
+        entregues = _opcao(filtro_entrega, "Entregue", "Pendente")
+        sem_opcao = (not filtro_status or not filtro_entrega)
+        cliente_id = None
+        if filtro_cliente != "Todos":
+            cliente_id = next((c['id'] for c in data['clientes'] if c['name'] == filtro_cliente), None)
+        
+        db = SessionLocal()
+        try:
+            lista_pedidos = [] if sem_opcao else [
+                o.to_dict() for o in pedidos_filtrados(db, pagos, entregues, cliente_id)
+            ]
+        finally:
+            db.close()
         
-        if not pedidos_filtrados:
+        if not lista_pedidos:
             st.info("Nenhum pedido corresponde aos filtros selecionados.")
         else:
-            for pedido in pedidos_filtrados:
+            for pedido in lista_pedidos:
                 cor = get_cor_status_pedido(pedido)
                 
                 with st.container():
@@ -1979,8 +1714,6 @@ def mostrar_pedidos():
                         
                         # Mostrar produtos
                         items = pedido.get('items', [])
-                        if isinstance(items, str):
-                            items = json.loads(items)
                         
                         if items:
                             produtos = ", ".join([item.get('nome', item.get('name', '')) for item in items[:2]])
@@ -2190,18 +1923,33 @@ def mostrar_novo_pedido():
                 
                 # Dimensões (somente se usa_dtf for True)
                 if usa_dtf:
+                    dpi_padrao = data['config'].get('artwork_default_dpi', 300)
+                    with st.expander("🖼️ Arte da Estampa (preenche as dimensões)"):
+                        col_arte1, col_arte2 = st.columns(2)
+                        with col_arte1:
+                            arte_frente = st.file_uploader("Arte da Frente", type=TIPOS_ARTE, key="arte_frente_pedido")
+                            analise_frente = aplicar_arte_nas_dimensoes(arte_frente, "frente_altura_pedido", "frente_largura_pedido", dpi_padrao)
+                        with col_arte2:
+                            arte_costas = st.file_uploader("Arte das Costas", type=TIPOS_ARTE, key="arte_costas_pedido")
+                            analise_costas = aplicar_arte_nas_dimensoes(arte_costas, "costas_altura_pedido", "costas_largura_pedido", dpi_padrao)
+                    
                     st.subheader("📏 Dimensões da Estampa (cm)")
+                    st.session_state.setdefault("frente_altura_pedido", 10.0)
+                    st.session_state.setdefault("frente_largura_pedido", 10.0)
+                    st.session_state.setdefault("costas_altura_pedido", 0.0)
+                    st.session_state.setdefault("costas_largura_pedido", 0.0)
                     dim_cols = st.columns(4)
                     with dim_cols[0]:
-                        frente_altura = st.number_input("Altura Frente", min_value=0.0, value=10.0, step=0.5, key="frente_altura_pedido")
+                        frente_altura = st.number_input("Altura Frente", min_value=0.0, step=0.5, key="frente_altura_pedido")
                     with dim_cols[1]:
-                        frente_largura = st.number_input("Largura Frente", min_value=0.0, value=10.0, step=0.5, key="frente_largura_pedido")
+                        frente_largura = st.number_input("Largura Frente", min_value=0.0, step=0.5, key="frente_largura_pedido")
                     with dim_cols[2]:
-                        costas_altura = st.number_input("Altura Costas", min_value=0.0, value=0.0, step=0.5, key="costas_altura_pedido")
+                        costas_altura = st.number_input("Altura Costas", min_value=0.0, step=0.5, key="costas_altura_pedido")
                     with dim_cols[3]:
-                        costas_largura = st.number_input("Largura Costas", min_value=0.0, value=0.0, step=0.5, key="costas_largura_pedido")
+                        costas_largura = st.number_input("Largura Costas", min_value=0.0, step=0.5, key="costas_largura_pedido")
                 else:
                     frente_altura = frente_largura = costas_altura = costas_largura = 0.0
+                    analise_frente = analise_costas = None
                 
                 # Quantidade e Margem
                 qtd_cols = st.columns(2)
@@ -2229,6 +1977,12 @@ def mostrar_novo_pedido():
                     custo_cm2 = preco_metro / area_metro_linear
                     custo_dtf = area_total * custo_cm2
                 
+                # Tinta (pela cobertura real das artes enviadas)
+                custo_tinta = 0
+                if usa_dtf:
+                    custo_tinta = (custo_tinta_da_arte(analise_frente, frente_altura, frente_largura, data['config']) +
+                                   custo_tinta_da_arte(analise_costas, costas_altura, costas_largura, data['config']))
+                
                 # Custos fixos
                 custos_fixos = 0
                 if incluir_custos_fixos:
@@ -2242,7 +1996,7 @@ def mostrar_novo_pedido():
                                     data['config'].get('packaging_cost_value', 1.0))
                 
                 # Cálculo final
-                custo_unitario = produto_atual.get('custo', produto_atual.get('cost', 0)) + custo_dtf + custos_fixos
+                custo_unitario = produto_atual.get('custo', produto_atual.get('cost', 0)) + custo_dtf + custo_tinta + custos_fixos
                 preco_unitario = custo_unitario * (1 + margem / 100)
                 preco_total = preco_unitario * quantidade
                 
@@ -2250,16 +2004,19 @@ def mostrar_novo_pedido():
                 st.session_state.calculo_atual = {
                     'produto': produto_atual['nome'],
                     'preco_unitario': preco_unitario,
+                    'custo_unitario': custo_unitario,
                     'quantidade': quantidade,
                     'preco_total': preco_total,
                     'area_total': area_total,
+                    'custo_tinta': custo_tinta,
                     'usa_dtf': usa_dtf,
                     'dimensoes': {
                         'frente_altura': frente_altura,
                         'frente_largura': frente_largura,
                         'costas_altura': costas_altura,
                         'costas_largura': costas_largura
-                    }
+                    },
+                    'artes': ids_das_artes(analise_frente, analise_costas)
                 }
                 st.success(f"Preço calculado: {formatar_moeda(preco_total)}")
             
@@ -2273,25 +2030,30 @@ def mostrar_novo_pedido():
                 st.write(f"**Quantidade:** {calc['quantidade']}")
                 if calc['usa_dtf']:
                     st.write(f"**Área Total:** {calc['area_total']:.2f} cm²")
+                    if calc.get('custo_tinta'):
+                        st.write(f"**Tinta (por unidade):** {formatar_moeda(calc['custo_tinta'])}")
                 
                 # Botão para adicionar ao pedido
                 if st.button("➕ Adicionar ao Pedido", type="primary", use_container_width=True, key="adicionar_calculo_pedido"):
                     novo_item = {
                         'nome': calc['produto'],
                         'preco_unitario': calc['preco_unitario'],
+                        'custo_unitario': calc.get('custo_unitario'),
                         'quantidade': calc['quantidade'],
                         'preco_total': calc['preco_total'],
                         'detalhes': {
                             'usa_dtf': calc['usa_dtf'],
                             'area_total': calc['area_total'],
-                            'dimensoes': calc['dimensoes']
+                            'dimensoes': calc['dimensoes'],
+                            'artes': calc.get('artes', {})
                         }
                     }
                     
                     # Verificar se item já existe
                     item_existente = None
                     for i, item in enumerate(st.session_state.pedido_itens_calculados):
-                        if item['nome'] == novo_item['nome'] and item['preco_unitario'] == novo_item['preco_unitario']:
+                        if (item['nome'] == novo_item['nome'] and item['preco_unitario'] == novo_item['preco_unitario'] and
+                                item['detalhes'].get('artes') == novo_item['detalhes']['artes']):
                             item_existente = i
                             break
                     
@@ -2389,7 +2151,7 @@ def mostrar_novo_pedido():
                     customer = db.query(Customer).filter(Customer.id == cliente['id']).first()
                     
                     # Gerar número do pedido
-                    ultimo_numero = db.query(Order).count() + 1
+                    numero_pedido = proximo_numero(db, 'pedido')
                     
                     # Preparar itens para salvar
                     itens_para_salvar = []
@@ -2397,15 +2159,17 @@ def mostrar_novo_pedido():
                         itens_para_salvar.append({
                             "nome": item['nome'],
                             "quantidade": item['quantidade'],
-                            "valor_unitario": item['preco_unitario']
+                            "valor_unitario": item['preco_unitario'],
+                            "custo_unitario": item.get('custo_unitario'),
+                            "detalhes": item.get('detalhes', {})
                         })
                     
                     novo_pedido = Order(
-                        order_number=str(ultimo_numero).zfill(4),
+                        order_number=numero_pedido,
                         customer=customer,
                         user=user,
                         total_amount=sum(item['preco_total'] for item in st.session_state.pedido_itens_calculados),
-                        items=json.dumps(itens_para_salvar),
+                        items=itens_para_salvar,
                         delivery_type=st.session_state.pedido_info['tipo_entrega'],
                         delivery_deadline=st.session_state.pedido_info['prazo_entrega'],
                         payment_method=st.session_state.pedido_info['forma_pagamento'] if st.session_state.pedido_info['forma_pagamento'] != "Não Definido" else "",
@@ -2414,10 +2178,11 @@ def mostrar_novo_pedido():
                         notes=st.session_state.pedido_info['observacoes'].strip()
                     )
                     
+                    gravar_itens(db, novo_pedido)
                     db.add(novo_pedido)
                     db.commit()
                     
-                    st.success(f"✅ Pedido #{ultimo_numero} salvo como rascunho!")
+                    st.success(f"✅ Pedido #{numero_pedido} salvo como rascunho!")
                     
                     # Limpar dados temporários, mas manter na mesma etapa
                     if 'calculo_atual' in st.session_state:
@@ -2538,22 +2303,24 @@ def mostrar_novo_pedido():
                     
                     customer = db.query(Customer).filter(Customer.id == cliente['id']).first()
                     
-                    ultimo_numero = db.query(Order).count() + 1
+                    numero_pedido = proximo_numero(db, 'pedido')
                     
                     itens_para_salvar = []
                     for item in st.session_state.pedido_itens_calculados:
                         itens_para_salvar.append({
                             "nome": item['nome'],
                             "quantidade": item['quantidade'],
-                            "valor_unitario": item['preco_unitario']
+                            "valor_unitario": item['preco_unitario'],
+                            "custo_unitario": item.get('custo_unitario'),
+                            "detalhes": item.get('detalhes', {})
                         })
                     
                     novo_pedido = Order(
-                        order_number=str(ultimo_numero).zfill(4),
+                        order_number=numero_pedido,
                         customer=customer,
                         user=user,
                         total_amount=total_geral,
-                        items=json.dumps(itens_para_salvar),
+                        items=itens_para_salvar,
                         delivery_type=st.session_state.pedido_info['tipo_entrega'],
                         delivery_deadline=st.session_state.pedido_info['prazo_entrega'],
                         payment_method=st.session_state.pedido_info['forma_pagamento'] if st.session_state.pedido_info['forma_pagamento'] != "Não Definido" else "",
@@ -2562,10 +2329,11 @@ def mostrar_novo_pedido():
                         notes=st.session_state.pedido_info['observacoes'].strip()
                     )
                     
+                    gravar_itens(db, novo_pedido)
                     db.add(novo_pedido)
                     db.commit()
                     
-                    st.success(f"✅ Pedido #{ultimo_numero} salvo como rascunho!")
+                    st.success(f"✅ Pedido #{numero_pedido} salvo como rascunho!")
                     
                     # Limpar e voltar à lista
                     st.session_state.current_page = "pedidos"
@@ -2587,22 +2355,24 @@ def mostrar_novo_pedido():
                     
                     customer = db.query(Customer).filter(Customer.id == cliente['id']).first()
                     
-                    ultimo_numero = db.query(Order).count() + 1
+                    numero_pedido = proximo_numero(db, 'pedido')
                     
                     itens_para_salvar = []
                     for item in st.session_state.pedido_itens_calculados:
                         itens_para_salvar.append({
                             "nome": item['nome'],
                             "quantidade": item['quantidade'],
-                            "valor_unitario": item['preco_unitario']
+                            "valor_unitario": item['preco_unitario'],
+                            "custo_unitario": item.get('custo_unitario'),
+                            "detalhes": item.get('detalhes', {})
                         })
                     
                     novo_pedido = Order(
-                        order_number=str(ultimo_numero).zfill(4),
+                        order_number=numero_pedido,
                         customer=customer,
                         user=user,
                         total_amount=total_geral,
-                        items=json.dumps(itens_para_salvar),
+                        items=itens_para_salvar,
                         delivery_type=st.session_state.pedido_info['tipo_entrega'],
                         delivery_deadline=st.session_state.pedido_info['prazo_entrega'],
                         payment_method=st.session_state.pedido_info['forma_pagamento'] if st.session_state.pedido_info['forma_pagamento'] != "Não Definido" else "",
@@ -2611,24 +2381,15 @@ def mostrar_novo_pedido():
                         notes=st.session_state.pedido_info['observacoes'].strip()
                     )
                     
+                    gravar_itens(db, novo_pedido)
                     db.add(novo_pedido)
                     db.commit()
                     
-                    st.success(f"✅ Pedido #{ultimo_numero} finalizado com sucesso!")
+                    st.success(f"✅ Pedido #{numero_pedido} finalizado com sucesso!")
                     
-                    # Gerar nota fiscal
-                    pdf_path = gerar_nota_fiscal(novo_pedido.to_dict(), cliente)
-                    if pdf_path:
-                        with open(pdf_path, "rb") as f:
-                            pdf_bytes = f.read()
-                        
-                        st.download_button(
-                            label="📄 Baixar Nota Fiscal",
-                            data=pdf_bytes,
-                            file_name=f"Nota_Pedido_{ultimo_numero}.pdf",
-                            mime="application/pdf",
-                            type="primary"
-                        )
+                    # Nota fiscal gerada em segundo plano: fica pronta na tela do pedido
+                    pre_renderizador.agendar('nota_fiscal', novo_pedido.to_dict(), customer)
+                    st.info("📄 A nota fiscal está sendo gerada e estará disponível na tela do pedido.")
                     
                     # Limpar todos os dados
                     st.session_state.pedido_etapa = 1
@@ -2706,8 +2467,6 @@ def mostrar_ver_pedido():
     # Itens
     st.subheader("Itens")
     items = pedido.get('items', [])
-    if isinstance(items, str):
-        items = json.loads(items)
     
     if items:
         itens_data = []
@@ -2721,6 +2480,7 @@ def mostrar_ver_pedido():
         
         df = pd.DataFrame(itens_data)
         st.dataframe(df, use_container_width=True, hide_index=True)
+        mostrar_previas_artes(items)
     
     # Total
     st.metric("Valor Total", formatar_moeda(pedido.get('total_amount', 0)))
@@ -2730,6 +2490,10 @@ def mostrar_ver_pedido():
         st.subheader("Observações")
         st.write(pedido['notes'])
     
+    # Prévia do recibo (mesmo layout do PDF, sem gerar o PDF)
+    with st.expander("👁️ Pré-visualizar Nota Fiscal"):
+        st.markdown(previa_nota_fiscal(pedido, cliente), unsafe_allow_html=True)
+    
     # Controles de status
     st.subheader("Atualizar Status")
     
@@ -2757,6 +2521,7 @@ def mostrar_ver_pedido():
                         st.success("✅ Pedido marcado como entregue!")
                         # Atualizar o pedido na session_state
                         st.session_state.view_pedido = order.to_dict()
+                        pre_renderizador.agendar('nota_fiscal', st.session_state.view_pedido, order.customer)
                         # Forçar recarregamento imediato
                         st.rerun()
                 except Exception as e:
@@ -2767,13 +2532,20 @@ def mostrar_ver_pedido():
             st.info("✅ Pedido já está entregue")
     
     with col_status_btn3:
-        if st.button("Gerar Nota Fiscal", type="secondary", use_container_width=True, key="gerar_nota"):
+        nota_pronta = pdf_pronto('nota_fiscal', pedido, cliente)
+        if nota_pronta:
+            st.download_button(
+                label="📄 Baixar Nota Fiscal",
+                data=nota_pronta,
+                file_name=f"Nota_Pedido_{pedido.get('order_number', pedido.get('id', ''))}.pdf",
+                mime="application/pdf",
+                use_container_width=True,
+                key="baixar_nota_pronta"
+            )
+        elif st.button("Gerar Nota Fiscal", type="secondary", use_container_width=True, key="gerar_nota"):
             # Gerar PDF do pedido
-            pdf_path = gerar_nota_fiscal(pedido, cliente)
-            if pdf_path:
-                with open(pdf_path, "rb") as f:
-                    pdf_bytes = f.read()
-                
+            pdf_bytes = gerar_nota_fiscal(pedido, cliente)
+            if pdf_bytes:
                 st.download_button(
                     label="📄 Baixar Nota Fiscal",
                     data=pdf_bytes,
@@ -2803,6 +2575,7 @@ def mostrar_ver_pedido():
                         db.commit()
                         # Atualizar session_state
                         st.session_state.view_pedido = order.to_dict()
+                        pre_renderizador.agendar('nota_fiscal', st.session_state.view_pedido, order.customer)
                         del st.session_state.pagar_pedido
                         st.success("✅ Pagamento confirmado!")
                         st.rerun()
@@ -2821,6 +2594,312 @@ def mostrar_ver_pedido():
         st.session_state.current_page = "pedidos"
         st.rerun()
 
+# --- TELA: PRODUÇÃO ---
+@st.cache_resource
+def obter_plano_impressao(largura_rolo, comprimento_corrida, espacamento, modo='retangulos', celula=0.5,
+                          dias_producao=5):
+    """Plano de corridas compartilhado entre as sessões (um por configuração de rolo)"""
+    return PlanoImpressao(largura_rolo, comprimento_corrida, espacamento, modo=modo, celula=celula,
+                          provedor_arte=ler_arte, dias_producao=dias_producao)
+
+@require_auth()
+def mostrar_producao():
+    st.title("🖨️ Produção - Lotes de Impressão")
+    
+    data = carregar_dados()
+    largura_rolo = data['config'].get('roll_width', 58.0)
+    comprimento_corrida = data['config'].get('print_run_length', 300.0)
+    espacamento = data['config'].get('print_gap', 1.0)
+    celula = data['config'].get('nesting_cell_size', 0.5)
+    dpi_folha = int(data['config'].get('print_sheet_dpi', 300))
+    dias_producao = int(float(data['config'].get('default_production_days', 5)))
+    
+    aninhar = st.toggle("Aninhamento por máscara (formas irregulares)", value=False,
+                        help="Usa o canal de transparência das artes para encaixar formas entre si. "
+                             "Peças sem arte cadastrada são tratadas como retângulos.")
+    modo = 'mascara' if aninhar else 'retangulos'
+    plano = obter_plano_impressao(largura_rolo, comprimento_corrida, espacamento, modo, celula, dias_producao)
+    
+    # Pedidos pagos e ainda não entregues entram na fila de impressão
+    db = SessionLocal()
+    try:
+        pedidos_fila = [o.to_dict() for o in fila_producao(db)]
+        # Estampas já lançadas no livro de consumo não voltam para o plano
+        impressas = pecas_impressas(db, {p['id'] for p in pedidos_fila})
+    finally:
+        db.close()
+    
+    clientes = {c['id']: c['name'] for c in data['clientes']}
+    
+    col_btn1, col_btn2 = st.columns([3, 1])
+    with col_btn2:
+        if st.button("🔄 Replanejar do Zero", use_container_width=True):
+            plano.replanejar(pedidos_fila, clientes, impressas)
+            st.success("Plano recalculado!")
+    
+    adicionados, removidos = plano.sincronizar(pedidos_fila, clientes, impressas)
+    with col_btn1:
+        st.caption(f"Rolo de {largura_rolo:.0f} cm | Corridas de {comprimento_corrida:.0f} cm | "
+                   f"Espaçamento de {espacamento:.1f} cm")
+        if adicionados or removidos:
+            st.caption(f"Plano atualizado: {adicionados} pedido(s) novo(s), {removidos} removido(s)")
+    
+    resumo = plano.resumo()
+    col_stats1, col_stats2, col_stats3, col_stats4 = st.columns(4)
+    with col_stats1:
+        st.metric("Pedidos na Fila", resumo['pedidos'])
+    with col_stats2:
+        st.metric("Corridas", resumo['corridas'])
+    with col_stats3:
+        st.metric("Filme Necessário", f"{resumo['comprimento_total'] / 100:.2f} m")
+    with col_stats4:
+        st.metric("Desperdício", f"{resumo['desperdicio'] * 100:.1f}%")
+    
+    if resumo['sem_dimensoes']:
+        st.info(f"ℹ️ {resumo['sem_dimensoes']} pedido(s) sem dimensões de estampa registradas não entraram no plano.")
+    if resumo['nao_cabem']:
+        st.warning(f"⚠️ {resumo['nao_cabem']} estampa(s) maiores que uma corrida precisam de conferência manual.")
+    
+    folhas = plano.folhas()
+    if not folhas:
+        st.info("Nenhum pedido pago aguardando impressão.")
+        return
+    
+    st.subheader("Folhas de Corrida")
+    for ordem, folha in enumerate(folhas, start=1):
+        prazo = folha['prazo'].strftime('%d/%m/%Y') if folha['prazo'] else '-'
+        titulo = (f"Lote {ordem} (corrida #{folha['numero']}) - "
+                  f"{folha['comprimento_usado']:.1f} cm - prazo {prazo}")
+        with st.expander(titulo, expanded=(ordem == 1)):
+            col_f1, col_f2, col_f3 = st.columns(3)
+            with col_f1:
+                st.metric("Comprimento Usado", f"{folha['comprimento_usado']:.1f} cm")
+            with col_f2:
+                st.metric("Área Impressa", f"{folha['area_pecas']:.0f} cm²")
+            with col_f3:
+                st.metric("Desperdício", f"{folha['desperdicio'] * 100:.1f}%")
+            st.write(f"**Pedidos:** {', '.join('#' + str(n) for n in folha['pedidos'])}")
+            st.dataframe(pd.DataFrame(folha['linhas']), use_container_width=True, hide_index=True)
+            
+            # Arquivo de impressão (renderizado em faixas, sem carregar o rolo inteiro)
+            col_arq1, col_arq2 = st.columns([1, 2])
+            with col_arq1:
+                formato = st.selectbox("Formato", ["PNG", "TIFF"], key=f"formato_folha_{folha['numero']}")
+            with col_arq2:
+                st.write("")
+                gerar = st.button("🖼️ Gerar Arquivo de Impressão", key=f"gerar_folha_{folha['numero']}",
+                                  use_container_width=True)
+            if gerar:
+                barra = st.progress(0.0, text="Renderizando faixas...")
+                try:
+                    with armazem_artefatos.novo_arquivo('folhas', sufixo=f".{formato.lower()}") as caminho:
+                        compor_folha(folha, caminho, formato, dpi=dpi_folha, provedor_arte=ler_arte,
+                                     progresso=lambda fracao: barra.progress(fracao, text="Renderizando faixas..."))
+                    with open(caminho, "rb") as f:
+                        st.download_button(
+                            label=f"📥 Baixar Folha ({formato})",
+                            data=f.read(),
+                            file_name=f"corrida_{folha['numero']}.{formato.lower()}",
+                            mime="image/png" if formato == "PNG" else "image/tiff",
+                            key=f"baixar_folha_{folha['numero']}"
+                        )
+                    armazem_artefatos.descartar(caminho)
+                except Exception as e:
+                    st.error(f"Erro ao gerar arquivo de impressão: {str(e)}")
+            
+            # Lançar no livro de consumo de filme e tirar as estampas da fila
+            if st.button("✅ Registrar Impressão", key=f"registrar_folha_{folha['numero']}",
+                         use_container_width=True):
+                db = SessionLocal()
+                try:
+                    gravadas = registrar_corrida(
+                        db, folha,
+                        data['config'].get('dtf_price_per_meter', 80.0),
+                        largura_rolo,
+                        data['config'].get('roll_height', 100),
+                        get_current_user()['id']
+                    )
+                    db.commit()
+                    impressas = pecas_impressas(db, {p['id'] for p in pedidos_fila})
+                    plano.replanejar(pedidos_fila, clientes, impressas)
+                    st.success(f"✅ {gravadas} estampa(s) registradas no consumo de filme!")
+                    st.rerun()
+                except Exception as e:
+                    db.rollback()
+                    st.error(f"Erro ao registrar impressão: {str(e)}")
+                finally:
+                    db.close()
+
+# --- TELA: CONSUMO DE FILME ---
+@require_auth()
+def mostrar_consumo_filme():
+    st.title("📈 Consumo de Filme")
+    
+    col_periodo1, col_periodo2 = st.columns(2)
+    with col_periodo1:
+        inicio = st.date_input("De", value=datetime.now().date() - timedelta(days=30), key="consumo_inicio")
+    with col_periodo2:
+        fim = st.date_input("Até", value=datetime.now().date(), key="consumo_fim")
+    
+    db = SessionLocal()
+    try:
+        resumo = resumo_consumo(db, inicio, fim)
+        por_dia = consumo_por_dia(db, inicio, fim)
+        por_produto = consumo_por_produto(db, inicio, fim)
+    finally:
+        db.close()
+    
+    if not resumo['estampas']:
+        st.info("Nenhuma impressão registrada no período. Registre as corridas na tela de Produção.")
+        return
+    
+    col_stats1, col_stats2, col_stats3, col_stats4 = st.columns(4)
+    with col_stats1:
+        st.metric("Filme Consumido", f"{resumo['metros']:.2f} m")
+    with col_stats2:
+        st.metric("Metros por Dia", f"{resumo['metros_por_dia']:.2f} m")
+    with col_stats3:
+        st.metric("Desperdício", f"{resumo['desperdicio'] * 100:.1f}%")
+    with col_stats4:
+        st.metric("Vazamento de Custo", formatar_moeda(resumo['vazamento']),
+                  help="Custo do filme consumido menos o custo de filme cobrado pela fórmula de área")
+    
+    area_cobrada = resumo['area_cobrada']
+    if area_cobrada > 0:
+        st.caption(f"Filme consumido / área cobrada: {resumo['area_filme'] / area_cobrada:.2f}x - "
+                   f"use este fator para ajustar Largura/Altura do Rolo na precificação.")
+    
+    st.subheader("Por Dia")
+    df_dia = pd.DataFrame([{
+        "Data": d['data'].strftime('%d/%m/%Y'),
+        "Estampas": d['estampas'],
+        "Metros": round(d['metros'], 2),
+        "Desperdício %": round(d['desperdicio'] * 100, 1),
+        "Custo Cobrado": formatar_moeda(d['custo_cobrado']),
+        "Custo do Filme": formatar_moeda(d['custo_filme']),
+        "Vazamento": formatar_moeda(d['vazamento'])
+    } for d in por_dia])
+    st.bar_chart(pd.DataFrame({'Metros': [d['metros'] for d in por_dia]},
+                              index=[d['data'] for d in por_dia]))
+    st.dataframe(df_dia, use_container_width=True, hide_index=True)
+    
+    st.subheader("Por Produto")
+    df_produto = pd.DataFrame([{
+        "Produto": p['produto'],
+        "Estampas": p['estampas'],
+        "Metros": round(p['metros'], 2),
+        "Desperdício %": round(p['desperdicio'] * 100, 1),
+        "Custo Cobrado": formatar_moeda(p['custo_cobrado']),
+        "Custo do Filme": formatar_moeda(p['custo_filme']),
+        "Vazamento": formatar_moeda(p['vazamento'])
+    } for p in por_produto])
+    st.dataframe(df_produto, use_container_width=True, hide_index=True)
+
+# --- TELA: EXPORTAR PDFs ---
+@require_auth()
+def mostrar_exportar_pdfs():
+    st.title("🗂️ Exportar PDFs")
+    st.write("Gera um arquivo ZIP com todos os orçamentos ou notas fiscais do período.")
+    
+    rotulo_tipo = st.radio("Documentos", list(TIPOS_EXPORTACAO.values()), horizontal=True)
+    tipo = next(t for t, rotulo in TIPOS_EXPORTACAO.items() if rotulo == rotulo_tipo)
+    
+    col_periodo1, col_periodo2 = st.columns(2)
+    with col_periodo1:
+        inicio = st.date_input("De", value=datetime.now().date().replace(day=1), key="exportar_inicio")
+    with col_periodo2:
+        fim = st.date_input("Até", value=datetime.now().date(), key="exportar_fim")
+    
+    filtros = {'inicio': inicio, 'fim': fim}
+    if tipo == 'nota_fiscal':
+        col_status1, col_status2 = st.columns(2)
+        with col_status1:
+            pagamento = st.multiselect("Pagamento", ["Pago", "Pendente"], default=["Pago"])
+            filtros['status_pagamento'] = [{"Pago": "paid", "Pendente": "pending"}[s] for s in pagamento]
+        with col_status2:
+            entrega = st.multiselect("Entrega", ["Em Produção", "Entregue"])
+            filtros['status_entrega'] = [{"Em Produção": "production", "Entregue": "delivered"}[s] for s in entrega]
+    
+    db = SessionLocal()
+    try:
+        total = contar_documentos(db, tipo, **filtros)
+    finally:
+        db.close()
+    st.metric("Documentos Selecionados", total)
+    
+    if st.button("📦 Gerar ZIP", type="primary", disabled=total == 0):
+        barra = st.progress(0.0, text=f"0 de {total} documentos...")
+        db = SessionLocal()
+        try:
+            with armazem_artefatos.novo_arquivo('exportacoes', sufixo=".zip") as caminho:
+                gravados, erros = exportar_zip(
+                    caminho, tipo, listar_documentos(db, tipo, **filtros), total=total,
+                    ao_progredir=lambda feitos, total: barra.progress(
+                        min(1.0, feitos / total) if total else 1.0, text=f"{feitos} de {total} documentos..."
+                    )
+                )
+            barra.empty()
+            if erros:
+                st.warning(f"⚠️ {len(erros)} documento(s) não puderam ser gerados (ver ERROS.txt no ZIP).")
+            st.success(f"✅ {gravados} documento(s) exportados!")
+            with open(caminho, "rb") as f:
+                st.download_button(
+                    label="📥 Baixar ZIP",
+                    data=f.read(),
+                    file_name=f"{tipo}_{inicio.strftime('%Y%m%d')}_{fim.strftime('%Y%m%d')}.zip",
+                    mime="application/zip"
+                )
+            armazem_artefatos.descartar(caminho)
+        except Exception as e:
+            st.error(f"Erro ao exportar: {str(e)}")
+        finally:
+            db.close()
+
+# --- TELA: RELATÓRIO MENSAL ---
+@require_auth()
+def mostrar_relatorio_mensal():
+    st.title("📑 Relatório Mensal de Vendas")
+    st.write("Totais do mês por dia, produto, cliente e forma de pagamento, com a lista de pedidos.")
+    
+    hoje = datetime.now().date()
+    col_mes1, col_mes2 = st.columns(2)
+    with col_mes1:
+        nome_mes = st.selectbox("Mês", NOMES_MESES, index=hoje.month - 1)
+    with col_mes2:
+        ano = st.number_input("Ano", min_value=2000, max_value=hoje.year + 1, value=hoje.year, step=1)
+    mes = NOMES_MESES.index(nome_mes) + 1
+    
+    db = SessionLocal()
+    try:
+        assinatura = assinatura_mes(db, int(ano), mes)
+    finally:
+        db.close()
+    
+    col_stats1, col_stats2 = st.columns(2)
+    with col_stats1:
+        st.metric("Pedidos no Mês", assinatura['pedidos'])
+    with col_stats2:
+        st.metric("Faturamento", formatar_moeda(assinatura['total']))
+    
+    if st.button("📑 Gerar Relatório", type="primary", disabled=assinatura['pedidos'] == 0):
+        try:
+            # Meses grandes levam mais que um recibo: tempo limite maior
+            pdf_bytes = gerar_documento_pdf('relatorio_mensal', "Relatório", assinatura,
+                                            tempo_limite=max(TEMPO_LIMITE_S, 300))
+        except FilaCheia as e:
+            st.warning(f"⏳ {str(e)}")
+            pdf_bytes = None
+        except Exception as e:
+            st.error(f"Erro ao gerar relatório: {str(e)}")
+            pdf_bytes = None
+        if pdf_bytes:
+            st.download_button(
+                label="📥 Baixar Relatório",
+                data=pdf_bytes,
+                file_name=f"Relatorio_Vendas_{int(ano)}_{mes:02d}.pdf",
+                mime="application/pdf"
+            )
+
 # --- TELA: CONFIGURAÇÕES ---
 @require_auth()
 def mostrar_configuracoes():
@@ -2853,6 +2932,50 @@ def mostrar_configuracoes():
                                         value=data['config'].get('roll_height', 100), 
                                         min_value=0.0, step=0.1, key="altura_rolo")
         
+        # Lotes de impressão
+        st.subheader("Lotes de Impressão")
+        col_lote1, col_lote2 = st.columns(2)
+        
+        with col_lote1:
+            comprimento_corrida = st.number_input("Comprimento da Corrida (cm)", 
+                                                value=data['config'].get('print_run_length', 300.0), 
+                                                min_value=1.0, step=10.0, key="comprimento_corrida")
+        
+        with col_lote2:
+            espacamento_estampas = st.number_input("Espaçamento entre Estampas (cm)", 
+                                                 value=data['config'].get('print_gap', 1.0), 
+                                                 min_value=0.0, step=0.1, key="espacamento_estampas")
+        
+        col_lote3, col_lote4 = st.columns(2)
+        
+        with col_lote3:
+            celula_aninhamento = st.number_input("Resolução do Aninhamento por Máscara (cm por célula)", 
+                                               value=data['config'].get('nesting_cell_size', 0.5), 
+                                               min_value=0.1, step=0.1, key="celula_aninhamento")
+        
+        with col_lote4:
+            dpi_artes = st.number_input("DPI Padrão das Artes (sem metadado)", 
+                                      value=data['config'].get('artwork_default_dpi', 300.0), 
+                                      min_value=1.0, step=1.0, key="dpi_artes")
+        
+        dpi_folha = st.number_input("DPI do Arquivo de Impressão (folha da corrida)", 
+                                  value=data['config'].get('print_sheet_dpi', 300.0), 
+                                  min_value=72.0, step=1.0, key="dpi_folha")
+        
+        # Tinta (custo proporcional à cobertura da arte)
+        st.subheader("Custo de Tinta")
+        col_tinta1, col_tinta2 = st.columns(2)
+        
+        with col_tinta1:
+            custo_tinta_cmyk = st.number_input("Tinta CMYK por Canal (R$/m² a 100%)", 
+                                             value=data['config'].get('ink_cost_cmyk_m2', 0.0), 
+                                             min_value=0.0, step=0.1, key="custo_tinta_cmyk")
+        
+        with col_tinta2:
+            custo_tinta_branco = st.number_input("Tinta Branca de Base (R$/m²)", 
+                                               value=data['config'].get('ink_cost_white_m2', 0.0), 
+                                               min_value=0.0, step=0.1, key="custo_tinta_branco")
+        
         # Rótulos Personalizados e Custos Fixos
         st.subheader("Rótulos Personalizados e Custos Fixos")
         
@@ -2887,9 +3010,21 @@ def mostrar_configuracoes():
         
         with col_gen2:
             default_production_days = st.number_input("Dias Padrão de Produção", 
-                                                    value=data['config'].get('default_production_days', 5), 
+                                                    value=int(data['config'].get('default_production_days', 5)), 
                                                     min_value=1, step=1, key="default_production_days")
         
+        # Pool de conexões (lido ao iniciar o processo; variáveis de ambiente têm prioridade)
+        st.subheader("Banco de Dados")
+        st.caption("Valem a partir do próximo reinício do aplicativo. As variáveis de ambiente "
+                   + ", ".join(variavel for _, variavel, _, _, _ in CONFIGURACOES_POOL) + " têm prioridade.")
+        valores_pool = {}
+        colunas_pool = st.columns(len(CONFIGURACOES_POOL))
+        for coluna, (chave, _, padrao, minimo, descricao) in zip(colunas_pool, CONFIGURACOES_POOL):
+            with coluna:
+                valor_atual = max(minimo, int(float(data['config'].get(chave, padrao))))
+                valores_pool[chave] = st.number_input(descricao, value=valor_atual,
+                                                      min_value=minimo, step=1, key=chave)
+        
         # Botão salvar
         if st.button("Salvar Todas as Configurações", type="primary", use_container_width=True):
             try:
@@ -2898,6 +3033,13 @@ def mostrar_configuracoes():
                     'dtf_price_per_meter': preco_metro,
                     'roll_width': largura_rolo,
                     'roll_height': altura_rolo,
+                    'print_run_length': comprimento_corrida,
+                    'print_gap': espacamento_estampas,
+                    'nesting_cell_size': celula_aninhamento,
+                    'artwork_default_dpi': dpi_artes,
+                    'print_sheet_dpi': dpi_folha,
+                    'ink_cost_cmyk_m2': custo_tinta_cmyk,
+                    'ink_cost_white_m2': custo_tinta_branco,
                     'energy_cost_label': label_energia,
                     'transport_cost_label': label_transporte,
                     'packaging_cost_label': label_embalagem,
@@ -2905,15 +3047,19 @@ def mostrar_configuracoes():
                     'transport_cost_value': valor_transporte,
                     'packaging_cost_value': valor_embalagem,
                     'default_margin': default_margin,
-                    'default_production_days': default_production_days
+                    'default_production_days': default_production_days,
+                    **valores_pool
                 }
                 
                 for key, value in configs_to_update.items():
                     config_item = db.query(SystemConfig).filter(SystemConfig.key == key).first()
                     if config_item:
                         config_item.value = str(value)
-                        if key in ['dtf_price_per_meter', 'roll_width', 'roll_height', 'energy_cost_value', 
-                                  'transport_cost_value', 'packaging_cost_value', 'default_margin']:
+                        if key in ['dtf_price_per_meter', 'roll_width', 'roll_height', 'print_run_length', 'print_gap',
+                                  'nesting_cell_size', 'artwork_default_dpi', 'print_sheet_dpi', 'ink_cost_cmyk_m2',
+                                  'ink_cost_white_m2', 'energy_cost_value',
+                                  'transport_cost_value', 'packaging_cost_value', 'default_margin'] \
+                                or key in valores_pool:
                             config_item.value_type = 'number'
                         else:
                             config_item.value_type = 'string'
@@ -2939,6 +3085,49 @@ def mostrar_configuracoes():
             except Exception as e:
                 db.rollback()
                 st.error(f"Erro ao salvar configurações: {str(e)}")
+        
+        # Arquivos gerados (PDFs em cache, exportações, folhas de impressão)
+        st.subheader("Arquivos Gerados")
+        uso = armazem_artefatos.estatisticas()
+        col_arq1, col_arq2, col_arq3, col_arq4 = st.columns(4)
+        with col_arq1:
+            st.metric("Arquivos", uso['itens'])
+        with col_arq2:
+            st.metric("Espaço Usado", f"{uso['bytes'] / 1024 / 1024:.1f} de {uso['limite_bytes'] / 1024 / 1024:.0f} MB")
+        with col_arq3:
+            st.metric("Expirados", uso['expirados'], help=f"Validade: {uso['validade_s'] / 3600:.0f} h sem uso")
+        with col_arq4:
+            st.metric("Despejados pelo Limite", uso['despejados'])
+        if uso['por_categoria']:
+            st.dataframe(pd.DataFrame([
+                {'Categoria': categoria, 'Arquivos': itens, 'MB': round(tamanho / 1024 / 1024, 2)}
+                for categoria, (itens, tamanho) in sorted(uso['por_categoria'].items())
+            ]), use_container_width=True, hide_index=True)
+        if st.button("🧹 Limpar Expirados Agora"):
+            expirados, despejados = armazem_artefatos.varrer()
+            st.success(f"✅ {expirados} arquivo(s) expirados e {despejados} acima do limite removidos.")
+        
+        # Métricas do pool (desde o início do processo)
+        st.subheader("Conexões do Banco")
+        pool = metricas_pool.estatisticas()
+        col_pool1, col_pool2, col_pool3, col_pool4 = st.columns(4)
+        with col_pool1:
+            if 'limite' in pool:
+                st.metric("Em Uso", f"{pool['em_uso']} de {pool['limite']}",
+                          help=f"Pool: {pool['tamanho']} + até {pool['limite'] - pool['tamanho']} extras; "
+                               f"{pool['livres']} livres, {pool['overflow']} extras abertas agora")
+            else:
+                st.metric("Em Uso", pool['em_uso'], help="SQLite: uma conexão nova por uso, sem pool")
+        with col_pool2:
+            st.metric("Pico em Uso", pool['pico_em_uso'])
+        with col_pool3:
+            st.metric("Espera p95", f"{pool['espera_p95_ms']:.1f} ms",
+                      help=f"Média {pool['espera_media_ms']:.1f} ms, máxima {pool['espera_maxima_ms']:.1f} ms "
+                           f"em {pool['checkouts']} retiradas")
+        with col_pool4:
+            st.metric("Tempo Esgotado", pool['timeouts'],
+                      help="Pedidos de conexão que passaram do tempo limite do pool")
+        st.caption(f"Conexões abertas: {pool['conexoes_criadas']} · invalidadas: {pool['invalidadas']}")
     finally:
         db.close()
 
@@ -3070,7 +3259,11 @@ def main():
             "👥 Clientes": "clientes",
             "🏭 Fornecedores": "fornecedores",
             "🛒 Pedidos": "pedidos",
+            "🖨️ Produção": "producao",
+            "📈 Consumo de Filme": "consumo",
             "📋 Orçamentos": "orcamentos",
+            "📑 Relatório Mensal": "relatorio",
+            "🗂️ Exportar PDFs": "exportar",
             "⚙️ Configurações": "settings",
             "👤 Minha Conta": "account"
         }
@@ -3091,23 +3284,13 @@ def main():
         # Dashboard rápido (pendências)
         data = carregar_dados()
         
-        # Contar pedidos pendentes
-        pedidos_pendentes = []
-        pedidos_producao = []
-        for pedido in data['pedidos']:
-            if pedido.get('payment_status') != 'paid':
-                created_at = pedido.get('created_at')
-                if created_at:
-                    try:
-                        data_criacao = datetime.fromisoformat(created_at)
-                        if (datetime.now() - data_criacao) > timedelta(hours=24):
-                            pedidos_pendentes.append(pedido)
-                    except:
-                        pass
-            
-            # Pedidos pagos mas não entregues
-            if pedido.get('payment_status') == 'paid' and pedido.get('delivery_status') != 'delivered':
-                pedidos_producao.append(pedido)
+        # Pendentes há mais de 24h e pagos mas não entregues (índices parciais)
+        db = SessionLocal()
+        try:
+            pedidos_pendentes = [o.to_dict() for o in pedidos_atrasados(db)]
+            pedidos_producao = [o.to_dict() for o in fila_producao(db)]
+        finally:
+            db.close()
         
         if pedidos_pendentes or pedidos_producao:
             st.subheader("📊 Dashboard Rápido")
@@ -3165,12 +3348,20 @@ def main():
         mostrar_novo_pedido()
     elif page == "view_pedido":
         mostrar_ver_pedido()
+    elif page == "producao":
+        mostrar_producao()
+    elif page == "consumo":
+        mostrar_consumo_filme()
     elif page == "orcamentos":
         mostrar_orcamentos()
     elif page == "create_budget":
         mostrar_criar_orcamento()
     elif page == "view_budget":
         mostrar_ver_orcamento()
+    elif page == "exportar":
+        mostrar_exportar_pdfs()
+    elif page == "relatorio":
+        mostrar_relatorio_mensal()
     elif page == "settings":
         mostrar_configuracoes()
     elif page == "account":
@@ -0,0 +1,260 @@
+"""
+Armazém dos arquivos gerados pelo sistema (PDFs, ZIPs, folhas de impressão)
+
+Todos os arquivos ficam em um único diretório, separados por categoria, com
+limite total de bytes, validade (TTL contada a partir do último uso) e
+despejo do menos usado (LRU) quando o limite é ultrapassado. Uma thread de
+varredura em segundo plano confere o diretório periodicamente: remove o que
+expirou, restos de processos anteriores e arquivos temporários abandonados.
+
+Layout em disco: <ARTIFACT_DIR>/<categoria>/<nome> (mtime = último uso)
+"""
+
+import os
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DIRETORIO_ARTEFATOS = os.getenv("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "dtf_artefatos"))
+LIMITE_BYTES = int(float(os.getenv("ARTIFACT_MAX_MB", "512")) * 1024 * 1024)
+VALIDADE_S = float(os.getenv("ARTIFACT_TTL_HOURS", "24")) * 3600
+INTERVALO_VARREDURA_S = float(os.getenv("ARTIFACT_SWEEP_SECONDS", "300"))
+
+
+class ArmazemArtefatos:
+    """Diretório de arquivos gerados com limite de tamanho, TTL e LRU"""
+
+    def __init__(self, diretorio=DIRETORIO_ARTEFATOS, limite_bytes=LIMITE_BYTES, validade_s=VALIDADE_S,
+                 intervalo_varredura_s=INTERVALO_VARREDURA_S):
+        self.diretorio = diretorio
+        self.limite_bytes = limite_bytes
+        self.validade_s = validade_s
+        self.intervalo_varredura_s = intervalo_varredura_s
+        self._indice = OrderedDict()  # caminho -> (tamanho, último uso), do menos para o mais usado
+        self._bytes = 0
+        self._em_uso = set()  # arquivos sendo escritos agora (a varredura não mexe)
+        self._lock = threading.Lock()
+        self._varredura = None
+        self._parar = threading.Event()
+        self._indexado = False
+        self.gravados = 0
+        self.acertos = 0
+        self.faltas = 0
+        self.expirados = 0
+        self.despejados = 0
+        self.ultima_varredura = None
+
+    def caminho(self, categoria, nome):
+        return os.path.join(self.diretorio, categoria, nome)
+
+    # --- índice ---
+
+    def _registrar(self, caminho, tamanho, uso):
+        """Inclui/atualiza o arquivo no índice e devolve os caminhos despejados pelo limite"""
+        despejar = []
+        with self._lock:
+            anterior = self._indice.pop(caminho, None)
+            if anterior:
+                self._bytes -= anterior[0]
+            self._indice[caminho] = (tamanho, uso)
+            self._bytes += tamanho
+            while self._bytes > self.limite_bytes and len(self._indice) > 1:
+                antigo, (tamanho_antigo, _) = self._indice.popitem(last=False)
+                self._bytes -= tamanho_antigo
+                self.despejados += 1
+                despejar.append(antigo)
+        return despejar
+
+    def _esquecer(self, caminho):
+        with self._lock:
+            anterior = self._indice.pop(caminho, None)
+            if anterior:
+                self._bytes -= anterior[0]
+
+    @staticmethod
+    def _apagar(caminhos):
+        for caminho in caminhos:
+            try:
+                os.unlink(caminho)
+            except OSError:
+                pass
+
+    def _preparar(self):
+        """Na primeira utilização: indexa o que sobrou no disco e inicia a varredura"""
+        if not self._indexado:
+            self._indexado = True
+            self.varrer()
+        self.iniciar_varredura()
+
+    # --- arquivos com nome (reaproveitáveis) ---
+
+    def guardar(self, categoria, nome, dados):
+        """Grava o arquivo de forma atômica e o registra no armazém"""
+        self._preparar()
+        caminho = self.caminho(categoria, nome)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(dados)
+        os.replace(temporario, caminho)
+        with self._lock:
+            self.gravados += 1
+        self._apagar(self._registrar(caminho, len(dados), time.time()))
+        return caminho
+
+    def ler(self, categoria, nome):
+        """Conteúdo do arquivo (renovando o último uso) ou None se não existir/expirou"""
+        self._preparar()
+        caminho = self.caminho(categoria, nome)
+        agora = time.time()
+        try:
+            if agora - os.stat(caminho).st_mtime > self.validade_s:
+                self._esquecer(caminho)
+                self._apagar([caminho])
+                with self._lock:
+                    self.expirados += 1
+                    self.faltas += 1
+                return None
+            with open(caminho, 'rb') as arquivo:
+                dados = arquivo.read()
+            os.utime(caminho, (agora, agora))
+        except OSError:
+            with self._lock:
+                self.faltas += 1
+            return None
+        with self._lock:
+            self.acertos += 1
+        self._apagar(self._registrar(caminho, len(dados), agora))
+        return dados
+
+    def existe(self, categoria, nome):
+        return os.path.exists(self.caminho(categoria, nome))
+
+    # --- arquivos de uso único (downloads) ---
+
+    @contextmanager
+    def novo_arquivo(self, categoria, sufixo=''):
+        """Caminho para um arquivo novo dentro do armazém.
+
+        Ao sair do bloco o arquivo é registrado (conta no limite e expira
+        pelo TTL mesmo se nunca for descartado); se o bloco falhar, ele é
+        apagado. Quem já serviu o arquivo pode chamar descartar().
+        """
+        self._preparar()
+        pasta = os.path.join(self.diretorio, categoria)
+        os.makedirs(pasta, exist_ok=True)
+        descritor, caminho = tempfile.mkstemp(dir=pasta, suffix=sufixo)
+        os.close(descritor)
+        with self._lock:
+            self._em_uso.add(caminho)
+        try:
+            yield caminho
+        except BaseException:
+            self._apagar([caminho])
+            raise
+        finally:
+            with self._lock:
+                self._em_uso.discard(caminho)
+        try:
+            tamanho = os.path.getsize(caminho)
+        except OSError:
+            return
+        with self._lock:
+            self.gravados += 1
+        self._apagar([c for c in self._registrar(caminho, tamanho, time.time()) if c != caminho])
+
+    def descartar(self, caminho):
+        self._esquecer(caminho)
+        self._apagar([caminho])
+
+    # --- varredura ---
+
+    def varrer(self):
+        """Confere o diretório: remove expirados e temporários abandonados e aplica o limite.
+
+        O disco é a fonte da verdade (o índice é refeito a cada varredura),
+        então arquivos deixados por outros processos também entram na conta.
+        Retorna (expirados, despejados).
+        """
+        agora = time.time()
+        arquivos = []
+        expirados = []
+        with self._lock:
+            em_uso = set(self._em_uso)
+        for raiz, _, nomes in os.walk(self.diretorio):
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                if caminho in em_uso:
+                    continue
+                try:
+                    info = os.stat(caminho)
+                except OSError:
+                    continue
+                if agora - info.st_mtime > self.validade_s:
+                    expirados.append(caminho)
+                else:
+                    arquivos.append((info.st_mtime, info.st_size, caminho))
+        self._apagar(expirados)
+
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        despejados = []
+        arquivos.sort()
+        while total > self.limite_bytes and len(arquivos) > 1:
+            _, tamanho, caminho = arquivos.pop(0)
+            total -= tamanho
+            despejados.append(caminho)
+        self._apagar(despejados)
+
+        with self._lock:
+            self._indice = OrderedDict((caminho, (tamanho, uso)) for uso, tamanho, caminho in arquivos)
+            self._bytes = total
+            self.expirados += len(expirados)
+            self.despejados += len(despejados)
+            self.ultima_varredura = agora
+        return len(expirados), len(despejados)
+
+    def _laco_varredura(self):
+        while not self._parar.wait(self.intervalo_varredura_s):
+            try:
+                self.varrer()
+            except Exception as e:
+                print(f"⚠️ Armazém de arquivos: erro na varredura: {e}")
+
+    def iniciar_varredura(self):
+        with self._lock:
+            if self._varredura is not None and self._varredura.is_alive():
+                return
+            self._parar.clear()
+            self._varredura = threading.Thread(target=self._laco_varredura, name="varredura-artefatos",
+                                               daemon=True)
+            self._varredura.start()
+
+    def parar_varredura(self):
+        self._parar.set()
+
+    def estatisticas(self):
+        with self._lock:
+            por_categoria = {}
+            for caminho, (tamanho, _) in self._indice.items():
+                categoria = os.path.basename(os.path.dirname(caminho))
+                itens, total = por_categoria.get(categoria, (0, 0))
+                por_categoria[categoria] = (itens + 1, total + tamanho)
+            return {
+                'itens': len(self._indice),
+                'bytes': self._bytes,
+                'limite_bytes': self.limite_bytes,
+                'validade_s': self.validade_s,
+                'por_categoria': por_categoria,
+                'gravados': self.gravados,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'expirados': self.expirados,
+                'despejados': self.despejados,
+                'ultima_varredura': self.ultima_varredura,
+            }
+
+
+# Instância única por processo (compartilhada entre as sessões do Streamlit)
+armazem_artefatos = ArmazemArtefatos()
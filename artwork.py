@@ -0,0 +1,220 @@
+"""
+Análise de artes enviadas para impressão DTF
+
+Detecta a área útil (pixels não transparentes) da arte, converte para
+centímetros a partir do DPI gravado no arquivo e estima a cobertura de
+tinta (CMYK e base branca) para precificação.
+"""
+
+import io
+import os
+import math
+import hashlib
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+DPI_PADRAO = 300
+LADO_MAX_ANALISE = 2048  # maior lado (px) usado na análise
+LADO_MAX_COBERTURA = 512  # maior lado (px) usado na estimativa de tinta
+# Maior arte aceita (~10.000 x 12.000 px). PNG não tem decodificação em escala
+# reduzida: o arquivo é decodificado inteiro no modo original (até 4 bytes/px
+# em RGBA, ~480 MB no limite) e reduzido em faixas, sem uma segunda cópia em
+# tamanho cheio. ARTWORK_MAX_PIXELS ajusta o limite à memória do servidor.
+LIMITE_PIXELS = int(os.getenv("ARTWORK_MAX_PIXELS", 120_000_000))
+ALTURA_FAIXA_REDUCAO = 512  # linhas do original convertidas/reduzidas por vez
+LIMIAR_ALFA = 8
+CM_POR_POLEGADA = 2.54
+MAX_RESULTADOS_CACHE = 256
+
+_resultados = OrderedDict()
+_resultados_lock = threading.Lock()
+
+
+def hash_conteudo(dados):
+    """SHA-256 do conteúdo do arquivo"""
+    return hashlib.sha256(dados).hexdigest()
+
+
+def _em_cache(chave, calcular):
+    with _resultados_lock:
+        if chave in _resultados:
+            _resultados.move_to_end(chave)
+            return _resultados[chave]
+    resultado = calcular()
+    with _resultados_lock:
+        _resultados[chave] = resultado
+        while len(_resultados) > MAX_RESULTADOS_CACHE:
+            _resultados.popitem(last=False)
+    return resultado
+
+
+def _ler_dpi(info, dpi_padrao):
+    dpi = info.get('dpi')
+    try:
+        dpi_x, dpi_y = float(dpi[0]), float(dpi[1])
+    except (TypeError, ValueError, IndexError):
+        return float(dpi_padrao), float(dpi_padrao)
+    if dpi_x <= 1 or dpi_y <= 1:
+        return float(dpi_padrao), float(dpi_padrao)
+    return dpi_x, dpi_y
+
+
+def _reduzir_em_faixas(imagem, modo, fator):
+    """Converte para `modo` e reduz por `fator`, uma faixa de linhas por vez
+
+    Só a imagem decodificada fica em tamanho cheio na memória: cada faixa é
+    convertida (ex.: paleta -> RGBA) e reduzida antes da próxima.
+    """
+    if fator == 1:
+        return imagem if imagem.mode == modo else imagem.convert(modo)
+    imagem.load()
+    largura, altura = imagem.size
+    faixa = max(1, ALTURA_FAIXA_REDUCAO // fator) * fator
+    reduzida = Image.new(modo, (math.ceil(largura / fator), math.ceil(altura / fator)))
+    for y in range(0, altura, faixa):
+        trecho = imagem.crop((0, y, largura, min(altura, y + faixa)))
+        if trecho.mode != modo:
+            trecho = trecho.convert(modo)
+        reduzida.paste(trecho.reduce(fator), (0, y // fator))
+    return reduzida
+
+
+def abrir_reduzida(dados, lado_max=LADO_MAX_ANALISE):
+    """Abre a imagem já reduzida para análise.
+
+    JPEG usa decodificação em escala reduzida (draft, direto no DCT). PNG e
+    demais formatos não permitem decodificar em resolução menor: são lidos
+    uma única vez e reduzidos em faixas logo em seguida, e o resultado fica
+    em cache pelo hash do conteúdo. Acima de LIMITE_PIXELS a arte é recusada
+    (ValueError) antes de decodificar. Retorna (imagem_reduzida,
+    tamanho_original, info).
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        try:
+            imagem = Image.open(io.BytesIO(dados))
+        except Image.DecompressionBombError as e:
+            raise ValueError(f"Imagem muito grande: {e}")
+        largura, altura = imagem.size
+        if largura * altura > LIMITE_PIXELS:
+            imagem.close()
+            raise ValueError(f"Imagem muito grande ({largura}x{altura} px, máximo {LIMITE_PIXELS:,} px)")
+
+        info = dict(imagem.info)
+        fator = max(1, math.ceil(max(largura, altura) / lado_max))
+        if fator > 1 and imagem.format == 'JPEG':
+            imagem.draft(imagem.mode, (largura // fator, altura // fator))
+
+        if imagem.mode == 'P' and 'transparency' in info:
+            modo = 'RGBA'
+        elif imagem.mode not in ('RGB', 'RGBA', 'L', 'LA', 'CMYK'):
+            modo = 'RGBA' if 'A' in imagem.getbands() else 'RGB'
+        else:
+            modo = imagem.mode
+        imagem = _reduzir_em_faixas(imagem, modo, max(1, math.ceil(max(imagem.size) / lado_max)))
+    return imagem, (largura, altura), info
+
+
+def detectar_area_impressao(dados, dpi_padrao=DPI_PADRAO):
+    """Retângulo mínimo com tinta (alfa > 0) e suas dimensões em cm.
+
+    O recorte é calculado na imagem reduzida e convertido de volta para
+    pixels do original com arredondamento para fora (nunca corta a arte).
+    """
+    analise = _analisar(dados)
+    dpi_x, dpi_y = _ler_dpi(analise['info'], dpi_padrao)
+    largura_px, altura_px = analise['largura_px'], analise['altura_px']
+    resultado = {
+        'vazia': analise['bbox'] is None,
+        'largura_px': largura_px,
+        'altura_px': altura_px,
+        'dpi': (dpi_x, dpi_y),
+        'bbox': analise['bbox'],
+        'largura_cm': 0.0,
+        'altura_cm': 0.0,
+        'largura_total_cm': largura_px / dpi_x * CM_POR_POLEGADA,
+        'altura_total_cm': altura_px / dpi_y * CM_POR_POLEGADA,
+        'cobertura': analise['cobertura'],
+    }
+    if analise['bbox']:
+        esquerda, topo, direita, base = analise['bbox']
+        resultado['largura_cm'] = (direita - esquerda) / dpi_x * CM_POR_POLEGADA
+        resultado['altura_cm'] = (base - topo) / dpi_y * CM_POR_POLEGADA
+    return resultado
+
+
+def analisar_cobertura(dados):
+    """Cobertura de tinta da arte dentro da área útil.
+
+    Retorna a fração média de cada canal (C, M, Y, K, ponderada pelo alfa)
+    e a fração da área que recebe base branca (todo pixel com tinta).
+    """
+    return _analisar(dados)['cobertura']
+
+
+def calcular_custo_tinta(cobertura, area_cm2, custo_cmyk_m2, custo_branco_m2):
+    """Custo de tinta da estampa: canais coloridos + base branca"""
+    if not cobertura or area_cm2 <= 0:
+        return 0.0
+    area_m2 = area_cm2 / 10000.0
+    soma_cmyk = sum(cobertura[canal] for canal in ('c', 'm', 'y', 'k'))
+    return area_m2 * (soma_cmyk * custo_cmyk_m2 + cobertura['branco'] * custo_branco_m2)
+
+
+def _analisar(dados):
+    """Análise (em cache pelo hash do conteúdo) feita com uma única decodificação"""
+    return _em_cache(('analise', hash_conteudo(dados)), lambda: _analisar_imagem(dados))
+
+
+def _analisar_imagem(dados):
+    imagem, (largura_px, altura_px), info = abrir_reduzida(dados)
+    rgba = np.asarray(imagem.convert('RGBA'))
+    ocupado = rgba[..., 3] >= LIMIAR_ALFA
+
+    linhas = np.flatnonzero(ocupado.any(axis=1))
+    colunas = np.flatnonzero(ocupado.any(axis=0))
+    analise = {
+        'largura_px': largura_px,
+        'altura_px': altura_px,
+        'info': {'dpi': info.get('dpi')},
+        'bbox': None,
+        'cobertura': None,
+    }
+    if linhas.size == 0:
+        return analise
+
+    escala_x = largura_px / imagem.width
+    escala_y = altura_px / imagem.height
+    analise['bbox'] = (
+        max(0, int(math.floor(colunas[0] * escala_x))),
+        max(0, int(math.floor(linhas[0] * escala_y))),
+        min(largura_px, int(math.ceil((colunas[-1] + 1) * escala_x))),
+        min(altura_px, int(math.ceil((linhas[-1] + 1) * escala_y))),
+    )
+
+    recorte = rgba[linhas[0]:linhas[-1] + 1, colunas[0]:colunas[-1] + 1]
+    passo = max(1, math.ceil(max(recorte.shape[:2]) / LADO_MAX_COBERTURA))
+    recorte = recorte[::passo, ::passo].astype(np.float32) / 255.0
+    analise['cobertura'] = _cobertura_cmyk(recorte)
+    return analise
+
+
+def _cobertura_cmyk(rgba):
+    """Frações de cobertura C, M, Y, K e branco (conversão RGB -> CMYK simples)"""
+    rgb, alfa = rgba[..., :3], rgba[..., 3]
+    k = 1.0 - rgb.max(axis=2)
+    divisor = np.where(k < 1.0, 1.0 - k, 1.0)
+    c = (1.0 - rgb[..., 0] - k) / divisor
+    m = (1.0 - rgb[..., 1] - k) / divisor
+    y = (1.0 - rgb[..., 2] - k) / divisor
+    return {
+        'c': float((c * alfa).mean()),
+        'm': float((m * alfa).mean()),
+        'y': float((y * alfa).mean()),
+        'k': float((k * alfa).mean()),
+        'branco': float((alfa >= LIMIAR_ALFA / 255.0).mean()),
+    }
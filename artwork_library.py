@@ -0,0 +1,124 @@
+"""
+Biblioteca de artes endereçada por conteúdo
+
+Cada arte é identificada pelo SHA-256 do arquivo: o mesmo arquivo enviado
+várias vezes é gravado uma única vez. Na entrada são calculados, uma vez só,
+os metadados (área útil, DPI, cobertura de tinta) e as miniaturas em várias
+resoluções, para que as telas mostrem prévias sem decodificar o original.
+
+Layout em disco: <ARTWORK_DIR>/<id[:2]>/<id>/original e miniatura_<lado>.png
+"""
+
+import io
+import os
+import tempfile
+
+from PIL import Image
+from sqlalchemy.exc import IntegrityError
+
+from config import config
+from models import SessionLocal, Artwork
+from artwork import abrir_reduzida, detectar_area_impressao, hash_conteudo, DPI_PADRAO
+
+TAMANHOS_MINIATURA = (128, 512)
+
+
+def _diretorio(arte_id):
+    return os.path.join(config.ARTWORK_DIR, arte_id[:2], arte_id)
+
+
+def _gravar_atomico(caminho, dados):
+    """Grava em arquivo temporário e renomeia (leitores nunca veem arquivo parcial)"""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'wb') as arquivo:
+            arquivo.write(dados)
+        os.replace(temporario, caminho)
+    except Exception:
+        if os.path.exists(temporario):
+            os.unlink(temporario)
+        raise
+
+
+def _gerar_miniaturas(arte_id, dados):
+    """Miniaturas PNG (com transparência) a partir de uma única decodificação reduzida"""
+    imagem, _, _ = abrir_reduzida(dados, max(TAMANHOS_MINIATURA))
+    imagem = imagem.convert('RGBA')
+    for lado in sorted(TAMANHOS_MINIATURA, reverse=True):
+        imagem.thumbnail((lado, lado), Image.LANCZOS)
+        buffer = io.BytesIO()
+        imagem.save(buffer, 'PNG', optimize=True)
+        _gravar_atomico(os.path.join(_diretorio(arte_id), f"miniatura_{lado}.png"), buffer.getvalue())
+
+
+def ingerir_arte(dados, nome_arquivo, user_id, dpi_padrao=DPI_PADRAO):
+    """Armazena a arte (se ainda não existir) e retorna seus metadados"""
+    arte_id = hash_conteudo(dados)
+    caminho = os.path.join(_diretorio(arte_id), 'original')
+    if not os.path.exists(caminho):
+        _gravar_atomico(caminho, dados)
+    if not all(os.path.exists(os.path.join(_diretorio(arte_id), f"miniatura_{lado}.png"))
+               for lado in TAMANHOS_MINIATURA):
+        _gerar_miniaturas(arte_id, dados)
+
+    db = SessionLocal()
+    try:
+        arte = db.query(Artwork).filter(Artwork.id == arte_id).first()
+        if not arte:
+            area = detectar_area_impressao(dados, dpi_padrao)
+            with Image.open(io.BytesIO(dados)) as imagem:
+                formato = imagem.format
+            arte = Artwork(
+                id=arte_id,
+                filename=nome_arquivo,
+                file_format=formato,
+                size_bytes=len(dados),
+                width_px=area['largura_px'],
+                height_px=area['altura_px'],
+                dpi=area['dpi'][0],
+                bbox=list(area['bbox']) if area['bbox'] else None,
+                print_width_cm=area['largura_cm'],
+                print_height_cm=area['altura_cm'],
+                coverage=area['cobertura'],
+                user_id=user_id
+            )
+            db.add(arte)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Mesma arte gravada por outra sessão ao mesmo tempo
+                db.rollback()
+                arte = db.query(Artwork).filter(Artwork.id == arte_id).first()
+        return arte.to_dict()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def ler_arte(arte_id):
+    """Conteúdo original da arte (ou None se não estiver na biblioteca)"""
+    if not arte_id:
+        return None
+    caminho = os.path.join(_diretorio(arte_id), 'original')
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'rb') as arquivo:
+        return arquivo.read()
+
+
+def ler_miniatura(arte_id, lado=TAMANHOS_MINIATURA[0]):
+    """Miniatura PNG já pronta; regenera só se o arquivo tiver sido perdido"""
+    if not arte_id:
+        return None
+    lado = min(TAMANHOS_MINIATURA, key=lambda t: (t < lado, abs(t - lado)))
+    caminho = os.path.join(_diretorio(arte_id), f"miniatura_{lado}.png")
+    if not os.path.exists(caminho):
+        dados = ler_arte(arte_id)
+        if dados is None:
+            return None
+        _gerar_miniaturas(arte_id, dados)
+    with open(caminho, 'rb') as arquivo:
+        return arquivo.read()
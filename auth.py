@@ -3,7 +3,7 @@ from datetime import datetime, timedelta
 from typing import Optional
 import jwt
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, func
 from models import User, SessionLocal
 import sys
 import os
@@ -43,11 +43,11 @@ class AuthSystem:
             if not validate_email(email):
                 return False, "Email inválido"
             
-            # Verificar se o usuário já existe
+            # Verificar se o usuário já existe (igualdade em lower(): usa os índices uq_users_*_lower)
             existing_user = session.query(User).filter(
                 or_(
-                    User.username.ilike(username),
-                    User.email.ilike(email)
+                    func.lower(User.username) == func.lower(username),
+                    func.lower(User.email) == func.lower(email)
                 )
             ).first()
             
@@ -90,8 +90,8 @@ class AuthSystem:
             
             user = session.query(User).filter(
                 or_(
-                    User.username.ilike(username_input),
-                    User.email.ilike(username_input)
+                    func.lower(User.username) == func.lower(username_input),
+                    func.lower(User.email) == func.lower(username_input)
                 ),
                 User.is_active == True
             ).first()
@@ -0,0 +1,371 @@
+"""
+Planejador de lotes de impressão DTF
+
+Agrupa as estampas dos pedidos pagos e ainda não entregues em corridas de
+rolo (trechos de comprimento configurável), ordenadas pelo prazo de entrega
+e encaixadas em prateleiras para reduzir o desperdício de filme.
+"""
+
+import re
+import threading
+from datetime import datetime, timedelta
+
+DIAS_PADRAO_PRODUCAO = 5  # sem a configuração default_production_days
+
+
+def _para_data(valor):
+    """Converte string ISO/datetime em datetime (ou None)"""
+    if isinstance(valor, datetime):
+        return valor
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(str(valor))
+    except ValueError:
+        return None
+
+
+def _somar_dias_uteis(inicio, dias):
+    """Soma dias úteis (segunda a sexta) a uma data"""
+    data = inicio
+    while dias > 0:
+        data += timedelta(days=1)
+        if data.weekday() < 5:
+            dias -= 1
+    return data
+
+
+def calcular_prazo_limite(pedido, dias_padrao=DIAS_PADRAO_PRODUCAO):
+    """Interpreta o prazo de entrega (texto livre) e retorna a data limite"""
+    criado_em = _para_data(pedido.get('created_at')) or datetime.now()
+    prazo = str(pedido.get('delivery_deadline') or '').strip().lower()
+
+    data_explicita = re.search(r'(\d{1,2})/(\d{1,2})/(\d{2,4})', prazo)
+    if data_explicita:
+        dia, mes, ano = (int(g) for g in data_explicita.groups())
+        if ano < 100:
+            ano += 2000
+        try:
+            return datetime(ano, mes, dia, 23, 59)
+        except ValueError:
+            pass
+
+    dias = re.search(r'(\d+)\s*dia', prazo)
+    if dias:
+        if 'úte' in prazo or 'ute' in prazo:
+            return _somar_dias_uteis(criado_em, int(dias.group(1)))
+        return criado_em + timedelta(days=int(dias.group(1)))
+
+    return _somar_dias_uteis(criado_em, int(dias_padrao))
+
+
+def extrair_pecas(pedido, cliente_nome="", dias_padrao=DIAS_PADRAO_PRODUCAO):
+    """Gera uma peça (retângulo a imprimir) por lado e por unidade de cada item DTF"""
+    items = pedido.get('items', [])
+
+    prazo = pedido.get('prazo_limite') or calcular_prazo_limite(pedido, dias_padrao)
+    pecas = []
+    for indice, item in enumerate(items or []):
+        detalhes = item.get('detalhes') or {}
+        if not detalhes.get('usa_dtf', True):
+            continue
+        dimensoes = detalhes.get('dimensoes') or {}
+        artes = detalhes.get('artes') or {}
+        lados = [
+            ('Frente', dimensoes.get('frente_largura', 0), dimensoes.get('frente_altura', 0)),
+            ('Costas', dimensoes.get('costas_largura', 0), dimensoes.get('costas_altura', 0)),
+        ]
+        quantidade = int(float(item.get('quantidade', item.get('quantity', 0)) or 0))
+        for lado, largura, altura in lados:
+            largura, altura = float(largura or 0), float(altura or 0)
+            if largura <= 0 or altura <= 0:
+                continue
+            for unidade in range(quantidade):
+                pecas.append({
+                    'pedido_id': pedido.get('id'),
+                    'order_number': pedido.get('order_number', ''),
+                    'cliente': cliente_nome,
+                    'produto': item.get('nome', item.get('name', '')),
+                    'item_indice': indice,
+                    'unidade': unidade + 1,
+                    'lado': lado,
+                    'largura': largura,
+                    'altura': altura,
+                    'prazo': prazo,
+                    'arte_id': artes.get(lado.lower()),
+                })
+    return pecas
+
+
+def chave_peca(peca):
+    """Identifica uma estampa: pedido, item, lado e unidade"""
+    return (peca['pedido_id'], peca['item_indice'], peca['lado'], peca['unidade'])
+
+
+def _peca_da_posicao(posicao):
+    """Peça como saiu de extrair_pecas, sem posição nem rotação"""
+    peca = {k: v for k, v in posicao.items() if k not in ('x', 'y', 'girada')}
+    if posicao['girada']:
+        peca['largura'], peca['altura'] = posicao['altura'], posicao['largura']
+    return peca
+
+
+class CorridaRolo:
+    """Trecho de rolo com prateleiras de estampas (encaixe por prateleiras)"""
+
+    def __init__(self, numero, largura, comprimento, espacamento=1.0):
+        self.numero = numero
+        self.largura = float(largura)
+        self.comprimento = float(comprimento)
+        self.espacamento = float(espacamento)
+        self.prateleiras = []  # {'y', 'altura', 'x_livre'}
+        self.posicoes = []
+
+    @property
+    def comprimento_usado(self):
+        if not self.prateleiras:
+            return 0.0
+        ultima = self.prateleiras[-1]
+        return ultima['y'] + ultima['altura']
+
+    @property
+    def area_pecas(self):
+        return sum(p.get('area', p['largura'] * p['altura']) for p in self.posicoes)
+
+    @property
+    def prazo(self):
+        return min((p['prazo'] for p in self.posicoes), default=None)
+
+    @property
+    def desperdicio(self):
+        """Fração do filme usado que não recebe estampa"""
+        area_usada = self.largura * self.comprimento_usado
+        if area_usada <= 0:
+            return 0.0
+        return max(0.0, 1 - self.area_pecas / area_usada)
+
+    def _orientacoes(self, peca):
+        largura, altura = peca['largura'], peca['altura']
+        opcoes = [(largura, altura, False)]
+        if largura != altura:
+            opcoes.append((altura, largura, True))
+        return [o for o in opcoes if o[0] <= self.largura]
+
+    def encaixar(self, peca):
+        """Tenta posicionar a peça; retorna True se coube nesta corrida"""
+        orientacoes = self._orientacoes(peca)
+        if not orientacoes:
+            return False
+
+        # 1. Prateleira existente que desperdice menos altura
+        melhor = None
+        for prateleira in self.prateleiras:
+            for largura, altura, girada in orientacoes:
+                cabe_largura = prateleira['x_livre'] + largura <= self.largura
+                if cabe_largura and altura <= prateleira['altura']:
+                    sobra = prateleira['altura'] - altura
+                    if melhor is None or sobra < melhor[0]:
+                        melhor = (sobra, prateleira, largura, altura, girada)
+        if melhor:
+            _, prateleira, largura, altura, girada = melhor
+            self._registrar(peca, prateleira, largura, altura, girada)
+            return True
+
+        # 2. Nova prateleira com a orientação mais baixa
+        largura, altura, girada = min(orientacoes, key=lambda o: o[1])
+        y = self.comprimento_usado + (self.espacamento if self.prateleiras else 0.0)
+        if y + altura > self.comprimento:
+            return False
+        prateleira = {'y': y, 'altura': altura, 'x_livre': 0.0}
+        self.prateleiras.append(prateleira)
+        self._registrar(peca, prateleira, largura, altura, girada)
+        return True
+
+    def _registrar(self, peca, prateleira, largura, altura, girada):
+        posicao = dict(peca)
+        posicao.update({
+            'x': prateleira['x_livre'],
+            'y': prateleira['y'],
+            'largura': largura,
+            'altura': altura,
+            'girada': girada,
+        })
+        prateleira['x_livre'] += largura + self.espacamento
+        self.posicoes.append(posicao)
+
+    def remover_pedido(self, pedido_id):
+        """Remove as peças de um pedido e reencaixa as restantes do zero
+
+        As prateleiras são refeitas na ordem original de chegada, então o
+        espaço liberado volta a ser usado e o comprimento encolhe. Retorna as
+        peças que não couberam de novo (o encaixe guloso não garante o mesmo
+        resultado com menos peças) para o plano levar a outra corrida.
+        """
+        restantes = [p for p in self.posicoes if p['pedido_id'] != pedido_id]
+        if len(restantes) == len(self.posicoes):
+            return []
+        self.prateleiras = []
+        self.posicoes = []
+        return [peca for peca in map(_peca_da_posicao, restantes) if not self.encaixar(peca)]
+
+    def folha(self):
+        """Folha de corrida: posições e resumo da corrida"""
+        linhas = []
+        for p in sorted(self.posicoes, key=lambda p: (p['y'], p['x'])):
+            linhas.append({
+                "Pedido": f"#{p['order_number']}",
+                "Cliente": p['cliente'],
+                "Produto": p['produto'],
+                "Lado": p['lado'],
+                "Un.": p['unidade'],
+                "X (cm)": round(p['x'], 1),
+                "Y (cm)": round(p['y'], 1),
+                "Largura (cm)": round(p['largura'], 1),
+                "Altura (cm)": round(p['altura'], 1),
+                "Girada": "Sim" if p['girada'] else "Não",
+            })
+        return {
+            'numero': self.numero,
+            'prazo': self.prazo,
+            'pedidos': sorted({p['order_number'] for p in self.posicoes}),
+            'comprimento_usado': self.comprimento_usado,
+            'area_pecas': self.area_pecas,
+            'desperdicio': self.desperdicio,
+            'largura': self.largura,
+            'linhas': linhas,
+            # Posições para a composição da folha de impressão (sem campos internos)
+            'posicoes': [{k: v for k, v in p.items() if not k.startswith('_')} for p in self.posicoes],
+        }
+
+
+class PlanoImpressao:
+    """Plano incremental de corridas de rolo para os pedidos em produção"""
+
+    def __init__(self, largura_rolo, comprimento_corrida, espacamento=1.0,
+                 modo='retangulos', celula=0.5, provedor_arte=None,
+                 dias_producao=DIAS_PADRAO_PRODUCAO):
+        self.largura_rolo = float(largura_rolo)
+        self.comprimento_corrida = float(comprimento_corrida)
+        self.espacamento = float(espacamento)
+        # 'retangulos' (prateleiras) ou 'mascara' (aninhamento pelo canal alfa)
+        self.modo = modo
+        self.celula = float(celula)
+        self.provedor_arte = provedor_arte
+        self.dias_producao = int(dias_producao)  # prazo de pedidos sem prazo de entrega
+        self.corridas = []
+        self.pedidos = {}  # pedido_id -> prazo limite
+        self.sem_dimensoes = set()
+        self.nao_cabem = []
+        self.impressas = set()  # chaves das estampas já impressas (livro de consumo)
+        self.concluidos = set()  # pedidos com todas as estampas impressas
+        self._proximo_numero = 1
+        self._lock = threading.Lock()
+
+    def _nova_corrida(self):
+        if self.modo == 'mascara':
+            from nesting import CorridaMascara
+            corrida = CorridaMascara(self._proximo_numero, self.largura_rolo,
+                                     self.comprimento_corrida, self.espacamento,
+                                     celula=self.celula, provedor_arte=self.provedor_arte)
+        else:
+            corrida = CorridaRolo(self._proximo_numero, self.largura_rolo,
+                                  self.comprimento_corrida, self.espacamento)
+        self._proximo_numero += 1
+        self.corridas.append(corrida)
+        return corrida
+
+    def _encaixar_pedido(self, pedido, cliente_nome):
+        pecas = extrair_pecas(pedido, cliente_nome, self.dias_producao)
+        if not pecas:
+            self.pedidos[pedido['id']] = pedido.get('prazo_limite')
+            self.sem_dimensoes.add(pedido['id'])
+            return
+        pecas = [p for p in pecas if chave_peca(p) not in self.impressas]
+        if not pecas:
+            self.concluidos.add(pedido['id'])
+            return
+        self.pedidos[pedido['id']] = pedido.get('prazo_limite')
+
+        # Peças mais altas primeiro: prateleiras mais cheias
+        for peca in sorted(pecas, key=lambda p: max(p['largura'], p['altura']), reverse=True):
+            self._encaixar_peca(peca)
+
+    def _encaixar_peca(self, peca):
+        if any(corrida.encaixar(peca) for corrida in self.corridas):
+            return
+        corrida = self._nova_corrida()
+        if not corrida.encaixar(peca):
+            # Maior que uma corrida inteira: fica para conferência manual
+            self.corridas.remove(corrida)
+            self._proximo_numero -= 1
+            self.nao_cabem.append(peca)
+
+    def _remover_pedido(self, pedido_id):
+        self.pedidos.pop(pedido_id, None)
+        self.sem_dimensoes.discard(pedido_id)
+        self.nao_cabem = [p for p in self.nao_cabem if p['pedido_id'] != pedido_id]
+        sobras = []
+        for corrida in self.corridas:
+            sobras.extend(corrida.remover_pedido(pedido_id))
+        self.corridas = [c for c in self.corridas if c.posicoes]
+        for peca in sobras:
+            self._encaixar_peca(peca)
+
+    def sincronizar(self, pedidos, clientes=None, impressas=None):
+        """Atualiza o plano de forma incremental.
+
+        Pedidos que saíram da fila são removidos (só as corridas que tinham
+        peças deles são reorganizadas) e apenas os pedidos novos são
+        encaixados; as demais corridas não são recalculadas.
+        Estampas em `impressas` (chave_peca) não entram no plano.
+        Retorna (adicionados, removidos).
+        """
+        clientes = clientes or {}
+        with self._lock:
+            if impressas:
+                self.impressas |= set(impressas)
+            ids_atuais = {p['id'] for p in pedidos}
+            self.concluidos &= ids_atuais
+            removidos = [pid for pid in self.pedidos if pid not in ids_atuais]
+            for pedido_id in removidos:
+                self._remover_pedido(pedido_id)
+
+            novos = [dict(p) for p in pedidos
+                     if p['id'] not in self.pedidos and p['id'] not in self.concluidos]
+            for pedido in novos:
+                pedido['prazo_limite'] = calcular_prazo_limite(pedido, self.dias_producao)
+            novos.sort(key=lambda p: p['prazo_limite'])
+            for pedido in novos:
+                self._encaixar_pedido(pedido, clientes.get(pedido.get('customer_id'), ''))
+            return len(novos), len(removidos)
+
+    def replanejar(self, pedidos, clientes=None, impressas=None):
+        """Descarta o plano atual e recalcula todas as corridas"""
+        with self._lock:
+            self.corridas = []
+            self.pedidos = {}
+            self.sem_dimensoes = set()
+            self.nao_cabem = []
+            self.concluidos = set()
+            self._proximo_numero = 1
+        return self.sincronizar(pedidos, clientes, impressas)
+
+    def folhas(self):
+        """Folhas de corrida ordenadas pelo prazo mais urgente"""
+        with self._lock:
+            corridas = sorted(self.corridas, key=lambda c: (c.prazo or datetime.max, c.numero))
+            return [c.folha() for c in corridas]
+
+    def resumo(self):
+        with self._lock:
+            comprimento = sum(c.comprimento_usado for c in self.corridas)
+            area_pecas = sum(c.area_pecas for c in self.corridas)
+            area_usada = comprimento * self.largura_rolo
+            return {
+                'corridas': len(self.corridas),
+                'pedidos': len(self.pedidos),
+                'comprimento_total': comprimento,
+                'desperdicio': (1 - area_pecas / area_usada) if area_usada > 0 else 0.0,
+                'sem_dimensoes': len(self.sem_dimensoes),
+                'nao_cabem': len(self.nao_cabem),
+            }
@@ -12,6 +12,9 @@ class SystemConfig:
     JWT_ALGORITHM = "HS256"
     JWT_EXPIRATION_HOURS = 24
 
+    # Diretório da biblioteca de artes (arquivos endereçados por SHA-256)
+    ARTWORK_DIR = os.getenv("ARTWORK_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "artworks"))
+
     SQLALCHEMY_DATABASE_URI = ""
 
     if DATABASE_URL:
@@ -0,0 +1,183 @@
+"""
+Pool de conexões do banco: configuração e métricas
+
+Tamanho, overflow, tempo limite de espera, reciclagem e statement_timeout
+vêm, nesta ordem de prioridade, das variáveis de ambiente (DB_POOL_SIZE,
+DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_STATEMENT_TIMEOUT_MS),
+da tabela system_configs (db_pool_size, ...) e dos padrões abaixo. O engine
+é criado na importação de models, então mudanças valem ao reiniciar o
+processo. As migrações (schema_migrations) desligam o statement_timeout nas
+próprias conexões.
+
+As métricas saem dos eventos do pool (connect, checkout, checkin,
+invalidate) registrados no engine; o tempo de espera por uma conexão e os
+estouros do tempo limite são medidos no próprio QueuePool (não há evento
+para eles). Com SQLite (NullPool, uma conexão nova por uso) não há limite
+nem espera: só as contagens.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.pool import NullPool, QueuePool
+
+# (chave em system_configs, variável de ambiente, padrão, mínimo, descrição)
+CONFIGURACOES_POOL = [
+    ('db_pool_size', 'DB_POOL_SIZE', 10, 1, 'Conexões mantidas abertas no pool'),
+    ('db_max_overflow', 'DB_MAX_OVERFLOW', 20, 0, 'Conexões extras permitidas nos picos'),
+    ('db_pool_timeout', 'DB_POOL_TIMEOUT', 30, 1, 'Espera máxima por uma conexão livre (s)'),
+    ('db_pool_recycle', 'DB_POOL_RECYCLE', 3600, 1, 'Reabrir conexões com mais de N segundos'),
+    ('db_statement_timeout_ms', 'DB_STATEMENT_TIMEOUT_MS', 0, 0,
+     'Tempo máximo de cada comando SQL no PostgreSQL (ms, 0 = sem limite)'),
+]
+
+AMOSTRAS_ESPERA = 1000
+
+
+def ler_configuracao_pool(url):
+    """Valores efetivos do pool: ambiente > system_configs > padrão (nunca abaixo do mínimo)"""
+    valores = {chave: padrao for chave, _, padrao, _, _ in CONFIGURACOES_POOL}
+    chaves = list(valores)
+    try:
+        # Engine descartável: o definitivo ainda não existe
+        provisorio = create_engine(url, poolclass=NullPool)
+        try:
+            with provisorio.connect() as conexao:
+                linhas = conexao.execute(text(
+                    "SELECT key, value FROM system_configs WHERE key IN ("
+                    + ", ".join(f":c{i}" for i in range(len(chaves))) + ")"
+                ), {f"c{i}": chave for i, chave in enumerate(chaves)}).all()
+        finally:
+            provisorio.dispose()
+        for chave, valor in linhas:
+            valores[chave] = int(float(valor))
+    except Exception:
+        pass  # banco novo (sem system_configs) ou fora do ar: padrões
+    for chave, variavel, _, minimo, _ in CONFIGURACOES_POOL:
+        if os.getenv(variavel):
+            valores[chave] = int(float(os.getenv(variavel)))
+        valores[chave] = max(minimo, valores[chave])
+    return valores
+
+
+class MetricasPool:
+    """Contadores do pool alimentados pelos eventos do engine"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._esperas = deque(maxlen=AMOSTRAS_ESPERA)
+        self.pool = None
+        self.configuracao = {}
+        self.conexoes_criadas = 0
+        self.checkouts = 0
+        self.em_uso = 0
+        self.pico_em_uso = 0
+        self.invalidadas = 0
+        self.timeouts = 0
+        self.espera_total_s = 0.0
+        self.espera_maxima_s = 0.0
+
+    def registrar(self, engine, configuracao):
+        self.pool = engine.pool
+        self.configuracao = configuracao
+        event.listen(engine, 'connect', self._ao_conectar)
+        event.listen(engine, 'checkout', self._ao_retirar)
+        event.listen(engine, 'checkin', self._ao_devolver)
+        event.listen(engine, 'invalidate', self._ao_invalidar)
+
+    def _ao_conectar(self, conexao_dbapi, registro):
+        with self._lock:
+            self.conexoes_criadas += 1
+
+    def _ao_retirar(self, conexao_dbapi, registro, proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.em_uso += 1
+            self.pico_em_uso = max(self.pico_em_uso, self.em_uso)
+
+    def _ao_devolver(self, conexao_dbapi, registro):
+        with self._lock:
+            self.em_uso = max(0, self.em_uso - 1)
+
+    def _ao_invalidar(self, conexao_dbapi, registro, excecao):
+        with self._lock:
+            self.invalidadas += 1
+
+    def medir_espera(self, segundos, estourou=False):
+        with self._lock:
+            self._esperas.append(segundos)
+            self.espera_total_s += segundos
+            self.espera_maxima_s = max(self.espera_maxima_s, segundos)
+            if estourou:
+                self.timeouts += 1
+
+    def estatisticas(self):
+        with self._lock:
+            esperas = sorted(self._esperas)
+            medidas = len(esperas)
+            resultado = {
+                'conexoes_criadas': self.conexoes_criadas,
+                'checkouts': self.checkouts,
+                'em_uso': self.em_uso,
+                'pico_em_uso': self.pico_em_uso,
+                'invalidadas': self.invalidadas,
+                'timeouts': self.timeouts,
+                'espera_media_ms': (sum(esperas) / medidas * 1000) if medidas else 0.0,
+                'espera_p95_ms': esperas[min(medidas - 1, int(medidas * 0.95))] * 1000 if medidas else 0.0,
+                'espera_maxima_ms': self.espera_maxima_s * 1000,
+                'configuracao': dict(self.configuracao),
+            }
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            resultado.update({
+                'tamanho': pool.size(),
+                'livres': pool.checkedin(),
+                'overflow': max(0, pool.overflow()),
+                'limite': pool.size() + self.configuracao.get('db_max_overflow', 0),
+            })
+        return resultado
+
+
+# Instância única por processo
+metricas_pool = MetricasPool()
+
+
+class QueuePoolMedido(QueuePool):
+    """QueuePool que mede a espera por uma conexão e conta os estouros do tempo limite
+
+    A medida cobre o checkout inteiro: fila do pool, abertura de conexão nova
+    e o pre_ping.
+    """
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super().connect()
+        except exc.TimeoutError:
+            metricas_pool.medir_espera(time.perf_counter() - inicio, estourou=True)
+            raise
+        metricas_pool.medir_espera(time.perf_counter() - inicio)
+        return conexao
+
+
+def criar_engine(url):
+    """Engine da aplicação com o pool configurado e as métricas registradas"""
+    configuracao = ler_configuracao_pool(url)
+    argumentos = {'pool_pre_ping': True, 'pool_recycle': configuracao['db_pool_recycle']}
+    if not url.startswith('sqlite'):
+        argumentos.update(
+            poolclass=QueuePoolMedido,
+            pool_size=configuracao['db_pool_size'],
+            max_overflow=configuracao['db_max_overflow'],
+            pool_timeout=configuracao['db_pool_timeout'],
+        )
+        if url.startswith('postgresql') and configuracao['db_statement_timeout_ms'] > 0:
+            argumentos['connect_args'] = {
+                'options': f"-c statement_timeout={configuracao['db_statement_timeout_ms']}"
+            }
+    engine = create_engine(url, **argumentos)
+    metricas_pool.registrar(engine, configuracao)
+    return engine
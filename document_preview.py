@@ -0,0 +1,135 @@
+"""
+Pré-visualização em HTML de orçamentos e recibos
+
+Usa os mesmos layouts dos PDFs (layout_orcamento/layout_nota_fiscal), então
+a prévia mostra exatamente as seções e valores do documento, mas é só
+montagem de texto: leva milissegundos e não passa pelo ReportLab. O PDF só
+é gerado quando alguém pede o download.
+"""
+
+import io
+import os
+import base64
+import threading
+from html import escape
+
+from pdf_documents import (
+    layout_orcamento, layout_nota_fiscal, formatar_moeda,
+    RODAPE_ORCAMENTO, RODAPE_NOTA_FISCAL, LOGOS_DOCUMENTOS, DIRETORIO_IMAGENS,
+    COR_ROXA, COR_AZUL_ARDOSIA, COR_LARANJA, COR_VERDE, COR_CINZA,
+)
+
+LARGURA_LOGO_PX = 300
+
+RODAPES = {
+    'orcamento': RODAPE_ORCAMENTO,
+    'nota_fiscal': RODAPE_NOTA_FISCAL,
+}
+
+_logos = {}
+_lock_logos = threading.Lock()
+
+
+def _logo_data_uri(tipo):
+    """Logo do documento reduzido em PNG base64 (preparado uma vez por processo)"""
+    if tipo not in _logos:
+        with _lock_logos:
+            if tipo not in _logos:
+                uri = None
+                caminho = os.path.join(DIRETORIO_IMAGENS, LOGOS_DOCUMENTOS.get(tipo, ''))
+                if os.path.isfile(caminho):
+                    try:
+                        from PIL import Image
+                        with Image.open(caminho) as imagem:
+                            imagem.thumbnail((LARGURA_LOGO_PX, LARGURA_LOGO_PX))
+                            buffer = io.BytesIO()
+                            imagem.save(buffer, format='PNG', optimize=True)
+                        uri = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
+                    except Exception as e:
+                        print(f"⚠️ Logo da pré-visualização não pôde ser carregado: {e}")
+                _logos[tipo] = uri
+    return _logos[tipo]
+
+
+def _titulo_secao(texto, cor, colunas=1):
+    return (f'<tr><th colspan="{colunas}" style="background:{cor};color:#fff;text-align:center;'
+            f'padding:6px;border:1px solid #000">{escape(str(texto))}</th></tr>')
+
+
+def _celula(texto, alinhamento='left', negrito=False):
+    peso = 'font-weight:bold;' if negrito else ''
+    return (f'<td style="text-align:{alinhamento};{peso}padding:4px 8px;border:1px solid #000">'
+            f'{escape(str(texto if texto is not None else ""))}</td>')
+
+
+def previa_html(layout):
+    """HTML do documento a partir do layout (ver pdf_documents.layout_*)"""
+    tabela = 'style="width:100%;border-collapse:collapse;margin:12px 0;font-size:13px"'
+    partes = ['<div style="background:#fff;color:#000;padding:24px;border-radius:6px;'
+              'font-family:Helvetica,Arial,sans-serif;max-width:760px">']
+
+    logo = _logo_data_uri(layout['tipo'])
+    if logo:
+        partes.append(f'<div style="text-align:center"><img src="{logo}" style="width:200px"></div>')
+    partes.append(f'<h3 style="text-align:center;color:#000;margin:12px 0">{escape(layout["titulo"])}</h3>')
+    partes.append('<div style="text-align:center;font-size:13px"><b>Criatividade, Personalidade e muito '
+                  'Capricho!</b><br><b>DTF Pricing Calculator</b>')
+    for linha in layout['cabecalho']:
+        partes.append(f'<br>{escape(linha)}')
+    partes.append('</div>')
+
+    # Cliente
+    partes.append(f'<table {tabela}>')
+    partes.append(_titulo_secao("DADOS DO CLIENTE", COR_ROXA, 2))
+    for rotulo, valor in layout['cliente']:
+        partes.append(f'<tr style="background:#f5f5f5">{_celula(rotulo)}{_celula(valor)}</tr>')
+    partes.append('</table>')
+
+    # Itens
+    partes.append(f'<table {tabela}>')
+    partes.append(_titulo_secao(layout['titulo_itens'], COR_LARANJA, 4))
+    partes.append(f'<tr style="background:{COR_AZUL_ARDOSIA};color:#fff">'
+                  + ''.join(_celula(c, 'center', True) for c in
+                            ("Produto", "Quantidade", "Valor Unitário (R$)", "Valor Total (R$)"))
+                  + '</tr>')
+    for nome, quantidade, unitario, total in layout['itens']:
+        partes.append('<tr>' + _celula(nome) + _celula(f"{quantidade:.0f}", 'center')
+                      + _celula(formatar_moeda(unitario), 'right') + _celula(formatar_moeda(total), 'right')
+                      + '</tr>')
+    partes.append('</table>')
+
+    # Resumo
+    partes.append(f'<table {tabela}>')
+    partes.append(_titulo_secao(layout['titulo_resumo'], COR_VERDE, 2))
+    for rotulo, valor in layout['resumo']:
+        partes.append(f'<tr>{_celula(rotulo)}{_celula(valor, "right", True)}</tr>')
+    partes.append('</table>')
+
+    if layout.get('observacoes'):
+        partes.append(f'<table {tabela}>')
+        partes.append(_titulo_secao("OBSERVAÇÕES", COR_CINZA))
+        partes.append(f'<tr style="background:#f5f5f5">{_celula(layout["observacoes"])}</tr>')
+        partes.append('</table>')
+
+    # O rodapé já vem com <br/> entre as linhas (mesmo texto do PDF)
+    linhas_rodape = RODAPES[layout['tipo']].split('<br/>')
+    partes.append('<div style="text-align:center;color:#808080;font-size:11px;margin-top:20px">'
+                  + '<br>'.join(escape(linha) for linha in linhas_rodape))
+    if layout.get('emissao'):
+        partes.append(f'<br><br>Emitido em: {escape(layout["emissao"])}')
+    partes.append('</div>')
+
+    if layout.get('assinatura'):
+        partes.append('<div style="text-align:center;font-size:13px;margin-top:32px">'
+                      '________________________________<br>Assinatura do Responsável</div>')
+
+    partes.append('</div>')
+    return ''.join(partes)
+
+
+def previa_orcamento(orcamento):
+    return previa_html(layout_orcamento(orcamento))
+
+
+def previa_nota_fiscal(pedido, cliente):
+    return previa_html(layout_nota_fiscal(pedido, cliente))
@@ -0,0 +1,130 @@
+"""
+Livro de consumo de filme DTF
+
+Registra, para cada estampa impressa, a área cobrada pela calculadora, a
+área efetivamente estampada e a parcela do filme consumido na corrida. Os
+indicadores (desperdício, metros por dia, vazamento de custo) são
+calculados no banco com agregações SQL por data e por produto.
+"""
+
+from datetime import date
+
+from sqlalchemy import func
+
+from models import FilmConsumption
+from batch_planner import chave_peca
+
+
+def pecas_impressas(db, pedido_ids):
+    """Chaves das estampas já registradas para os pedidos informados"""
+    if not pedido_ids:
+        return set()
+    linhas = db.query(FilmConsumption.order_id, FilmConsumption.item_index,
+                      FilmConsumption.side, FilmConsumption.unit).filter(
+        FilmConsumption.order_id.in_(list(pedido_ids))
+    ).all()
+    return {tuple(linha) for linha in linhas}
+
+
+def registrar_corrida(db, folha, preco_metro, largura_rolo, altura_rolo, user_id, data=None):
+    """Lança no livro as estampas de uma folha de corrida (ver CorridaRolo.folha).
+
+    O filme usado na corrida (comprimento x largura do rolo) é rateado entre
+    as estampas proporcionalmente à área cobrada de cada uma. Estampas já
+    registradas são ignoradas. Retorna a quantidade de linhas gravadas.
+    """
+    posicoes = folha['posicoes']
+    area_cobrada_total = sum(p['largura'] * p['altura'] for p in posicoes)
+    if area_cobrada_total <= 0:
+        return 0
+
+    custo_cm2 = preco_metro / (largura_rolo * altura_rolo) if largura_rolo and altura_rolo else 0.0
+    comprimento = folha['comprimento_usado']
+    area_filme = comprimento * folha['largura']
+    ja_registradas = pecas_impressas(db, {p['pedido_id'] for p in posicoes})
+
+    gravadas = 0
+    for p in posicoes:
+        if chave_peca(p) in ja_registradas:
+            continue
+        area_cobrada = p['largura'] * p['altura']
+        fracao = area_cobrada / area_cobrada_total
+        db.add(FilmConsumption(
+            printed_on=data or date.today(),
+            run_number=folha['numero'],
+            order_id=p['pedido_id'],
+            order_number=p['order_number'],
+            product_name=p['produto'],
+            item_index=p['item_indice'],
+            side=p['lado'],
+            unit=p['unidade'],
+            charged_area_cm2=area_cobrada,
+            printed_area_cm2=p.get('area', area_cobrada),
+            film_area_cm2=area_filme * fracao,
+            film_length_cm=comprimento * fracao,
+            charged_cost=area_cobrada * custo_cm2,
+            film_cost=area_filme * fracao * custo_cm2,
+            user_id=user_id
+        ))
+        gravadas += 1
+    return gravadas
+
+
+def _agregados():
+    return (
+        func.count(FilmConsumption.id).label('estampas'),
+        func.sum(FilmConsumption.charged_area_cm2).label('area_cobrada'),
+        func.sum(FilmConsumption.printed_area_cm2).label('area_impressa'),
+        func.sum(FilmConsumption.film_area_cm2).label('area_filme'),
+        func.sum(FilmConsumption.film_length_cm).label('comprimento'),
+        func.sum(FilmConsumption.charged_cost).label('custo_cobrado'),
+        func.sum(FilmConsumption.film_cost).label('custo_filme'),
+    )
+
+
+def _indicadores(linha):
+    area_filme = linha.area_filme or 0.0
+    return {
+        'estampas': linha.estampas or 0,
+        'area_cobrada': linha.area_cobrada or 0.0,
+        'area_impressa': linha.area_impressa or 0.0,
+        'area_filme': area_filme,
+        'metros': (linha.comprimento or 0.0) / 100,
+        'desperdicio': 1 - (linha.area_impressa or 0.0) / area_filme if area_filme > 0 else 0.0,
+        'custo_cobrado': linha.custo_cobrado or 0.0,
+        'custo_filme': linha.custo_filme or 0.0,
+        'vazamento': (linha.custo_filme or 0.0) - (linha.custo_cobrado or 0.0),
+    }
+
+
+def _periodo(consulta, inicio, fim):
+    if inicio:
+        consulta = consulta.filter(FilmConsumption.printed_on >= inicio)
+    if fim:
+        consulta = consulta.filter(FilmConsumption.printed_on <= fim)
+    return consulta
+
+
+def resumo_consumo(db, inicio=None, fim=None):
+    """Totais do período"""
+    linha = _periodo(db.query(*_agregados()), inicio, fim).one()
+    resumo = _indicadores(linha)
+    dias = _periodo(db.query(func.count(func.distinct(FilmConsumption.printed_on))), inicio, fim).scalar() or 0
+    resumo['dias'] = dias
+    resumo['metros_por_dia'] = resumo['metros'] / dias if dias else 0.0
+    return resumo
+
+
+def consumo_por_dia(db, inicio=None, fim=None):
+    """Indicadores agrupados por data de impressão"""
+    consulta = _periodo(db.query(FilmConsumption.printed_on, *_agregados()), inicio, fim)
+    linhas = consulta.group_by(FilmConsumption.printed_on).order_by(FilmConsumption.printed_on).all()
+    return [dict(_indicadores(l), data=l.printed_on) for l in linhas]
+
+
+def consumo_por_produto(db, inicio=None, fim=None):
+    """Indicadores agrupados por produto, do maior vazamento para o menor"""
+    consulta = _periodo(db.query(FilmConsumption.product_name, *_agregados()), inicio, fim)
+    linhas = consulta.group_by(FilmConsumption.product_name).all()
+    resultado = [dict(_indicadores(l), produto=l.product_name) for l in linhas]
+    return sorted(resultado, key=lambda r: r['vazamento'], reverse=True)
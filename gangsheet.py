@@ -0,0 +1,304 @@
+"""
+Composição da folha de impressão (gang sheet) de uma corrida de rolo
+
+A folha é renderizada em faixas horizontais: cada faixa recebe apenas as
+artes que a interceptam e é comprimida e gravada assim que fica pronta, de
+modo que a memória usada depende da altura da faixa e não do comprimento
+do rolo. As faixas são renderizadas em paralelo e gravadas em ordem, em
+PNG (um IDAT por faixa) ou TIFF (uma strip deflate por faixa).
+"""
+
+import io
+import os
+import math
+import struct
+import threading
+import warnings
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from artwork import LIMIAR_ALFA, LIMITE_PIXELS
+
+DPI_FOLHA = 300
+ALTURA_FAIXA_PX = 512
+MAX_PIXELS_CACHE_ARTES = 64_000_000  # ~256 MB em RGBA
+NIVEL_COMPRESSAO = 6
+CM_POR_POLEGADA = 2.54
+COR_CONTORNO = (128, 128, 128, 255)  # peças sem arte: só o contorno
+FORMATOS = ('PNG', 'TIFF')
+
+_ADLER_BASE = 65521
+
+
+def cm_para_px(cm, dpi):
+    return int(round(float(cm) / CM_POR_POLEGADA * dpi))
+
+
+def _adler32_combinar(adler1, adler2, tamanho2):
+    """Adler-32 de A+B a partir de adler(A), adler(B) e len(B) (adler32_combine do zlib)"""
+    resto = tamanho2 % _ADLER_BASE
+    soma1 = adler1 & 0xFFFF
+    soma2 = (resto * soma1) % _ADLER_BASE
+    soma1 += (adler2 & 0xFFFF) + _ADLER_BASE - 1
+    soma2 += ((adler1 >> 16) & 0xFFFF) + ((adler2 >> 16) & 0xFFFF) + _ADLER_BASE - resto
+    if soma1 >= _ADLER_BASE:
+        soma1 -= _ADLER_BASE
+    if soma1 >= _ADLER_BASE:
+        soma1 -= _ADLER_BASE
+    if soma2 >= _ADLER_BASE << 1:
+        soma2 -= _ADLER_BASE << 1
+    if soma2 >= _ADLER_BASE:
+        soma2 -= _ADLER_BASE
+    return soma1 | (soma2 << 16)
+
+
+class _CacheArtes:
+    """Artes recortadas, giradas e redimensionadas, limitadas pelo total de pixels"""
+
+    def __init__(self, provedor_arte, limite_pixels=MAX_PIXELS_CACHE_ARTES):
+        self.provedor_arte = provedor_arte
+        self.limite_pixels = limite_pixels
+        self._itens = OrderedDict()
+        self._pixels = 0
+        self._lock = threading.Lock()
+        self._locks_chave = {}
+
+    def obter(self, arte_id, largura, altura, girada):
+        if not arte_id or not self.provedor_arte:
+            return None
+        chave = (arte_id, largura, altura, girada)
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave]
+            lock_chave = self._locks_chave.setdefault(chave, threading.Lock())
+
+        # Uma decodificação por arte mesmo com várias faixas pedindo ao mesmo tempo
+        with lock_chave:
+            with self._lock:
+                if chave in self._itens:
+                    return self._itens[chave]
+            imagem = self._preparar(arte_id, largura, altura, girada)
+            with self._lock:
+                self._locks_chave.pop(chave, None)
+                if imagem is None:
+                    return None
+                self._itens[chave] = imagem
+                self._pixels += largura * altura
+                while self._pixels > self.limite_pixels and len(self._itens) > 1:
+                    _, antiga = self._itens.popitem(last=False)
+                    self._pixels -= antiga.width * antiga.height
+            return imagem
+
+    def _preparar(self, arte_id, largura, altura, girada):
+        dados = self.provedor_arte(arte_id)
+        if not dados:
+            return None
+        tamanho = (altura, largura) if girada else (largura, altura)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(dados)) as original:
+                if original.width * original.height > LIMITE_PIXELS:
+                    raise ValueError(f"Arte {arte_id} muito grande ({original.width}x{original.height} px)")
+                original.draft('RGB', tamanho)
+                imagem = original.convert('RGBA')
+
+        # Mesmo recorte da análise da arte: só a área com tinta
+        caixa = imagem.getchannel('A').point(lambda a: 255 if a >= LIMIAR_ALFA else 0).getbbox()
+        if caixa is None:
+            return None
+        imagem = imagem.crop(caixa)
+        if girada:
+            imagem = imagem.transpose(Image.Transpose.ROTATE_90)
+        return imagem.resize((largura, altura), Image.LANCZOS)
+
+
+class CompositorFolha:
+    """Renderiza a folha de uma corrida em faixas e grava em PNG ou TIFF"""
+
+    def __init__(self, posicoes, largura_cm, comprimento_cm, dpi=DPI_FOLHA,
+                 provedor_arte=None, altura_faixa=ALTURA_FAIXA_PX, trabalhadores=None):
+        self.dpi = int(dpi)
+        self.largura_px = max(1, cm_para_px(largura_cm, self.dpi))
+        self.altura_px = max(1, cm_para_px(comprimento_cm, self.dpi))
+        self.altura_faixa = max(1, int(altura_faixa))
+        self.total_faixas = math.ceil(self.altura_px / self.altura_faixa)
+        self.trabalhadores = trabalhadores or min(8, os.cpu_count() or 1)
+        self.artes = _CacheArtes(provedor_arte)
+        self.contorno = max(2, self.dpi // 100)
+
+        # Índice faixa -> peças que a interceptam
+        self.pecas_por_faixa = [[] for _ in range(self.total_faixas)]
+        for posicao in posicoes:
+            x, y = cm_para_px(posicao['x'], self.dpi), cm_para_px(posicao['y'], self.dpi)
+            largura = cm_para_px(posicao['largura'], self.dpi)
+            altura = cm_para_px(posicao['altura'], self.dpi)
+            if largura <= 0 or altura <= 0 or x >= self.largura_px or y >= self.altura_px:
+                continue
+            peca = {
+                'x': x, 'y': y, 'largura': largura, 'altura': altura,
+                'girada': bool(posicao.get('girada')),
+                'arte_id': posicao.get('arte_id'),
+            }
+            primeira = y // self.altura_faixa
+            ultima = min(self.total_faixas - 1, (y + altura - 1) // self.altura_faixa)
+            for indice in range(primeira, ultima + 1):
+                self.pecas_por_faixa[indice].append(peca)
+
+    def _limites(self, indice):
+        topo = indice * self.altura_faixa
+        return topo, min(topo + self.altura_faixa, self.altura_px)
+
+    def renderizar_faixa(self, indice):
+        """Imagem RGBA da faixa com as artes (ou contornos) que a interceptam"""
+        topo, base = self._limites(indice)
+        faixa = Image.new('RGBA', (self.largura_px, base - topo), (0, 0, 0, 0))
+        desenho = None
+        for peca in self.pecas_por_faixa[indice]:
+            x, y = peca['x'], peca['y']
+            largura = min(peca['largura'], self.largura_px - x)
+            arte = self.artes.obter(peca['arte_id'], peca['largura'], peca['altura'], peca['girada'])
+            if arte is None:
+                desenho = desenho or ImageDraw.Draw(faixa)
+                desenho.rectangle((x, y - topo, x + largura - 1, y + peca['altura'] - 1 - topo),
+                                  outline=COR_CONTORNO, width=self.contorno)
+                continue
+            recorte = arte.crop((0, max(0, topo - y), largura, min(peca['altura'], base - y)))
+            faixa.alpha_composite(recorte, (x, max(0, y - topo)))
+        return faixa
+
+    # --- PNG ---
+    def _faixa_png(self, indice):
+        """Linhas filtradas (filtro 0) comprimidas como trecho de um stream deflate"""
+        faixa = np.asarray(self.renderizar_faixa(indice))
+        linhas = np.zeros((faixa.shape[0], self.largura_px * 4 + 1), dtype=np.uint8)
+        linhas[:, 1:] = faixa.reshape(faixa.shape[0], -1)
+        bruto = linhas.tobytes()
+        compressor = zlib.compressobj(NIVEL_COMPRESSAO, zlib.DEFLATED, -15)
+        # Z_FULL_FLUSH alinha em byte e zera o dicionário: as faixas concatenam
+        dados = compressor.compress(bruto) + compressor.flush(zlib.Z_FULL_FLUSH)
+        return dados, zlib.adler32(bruto), len(bruto)
+
+    def _gravar_png(self, arquivo, progresso):
+        def chunk(tipo, dados):
+            arquivo.write(struct.pack('>I', len(dados)) + tipo + dados +
+                          struct.pack('>I', zlib.crc32(tipo + dados) & 0xFFFFFFFF))
+
+        arquivo.write(b'\x89PNG\r\n\x1a\n')
+        chunk(b'IHDR', struct.pack('>IIBBBBB', self.largura_px, self.altura_px, 8, 6, 0, 0, 0))
+        pixels_por_metro = int(round(self.dpi / 0.0254))
+        chunk(b'pHYs', struct.pack('>IIB', pixels_por_metro, pixels_por_metro, 1))
+
+        adler = 1
+        primeiro = True
+        for dados, adler_faixa, tamanho in self._em_ordem(self._faixa_png, progresso):
+            adler = _adler32_combinar(adler, adler_faixa, tamanho)
+            chunk(b'IDAT', (b'\x78\x9c' if primeiro else b'') + dados)
+            primeiro = False
+        final = zlib.compressobj(NIVEL_COMPRESSAO, zlib.DEFLATED, -15).flush(zlib.Z_FINISH)
+        chunk(b'IDAT', final + struct.pack('>I', adler))
+        chunk(b'IEND', b'')
+
+    # --- TIFF ---
+    def _faixa_tiff(self, indice):
+        faixa = self.renderizar_faixa(indice)
+        return zlib.compress(faixa.tobytes(), NIVEL_COMPRESSAO)
+
+    def _gravar_tiff(self, arquivo, progresso):
+        inicio = arquivo.tell()
+        arquivo.write(b'II*\x00' + struct.pack('<I', 0))  # IFD gravado no fim
+
+        offsets, tamanhos = [], []
+        for dados in self._em_ordem(self._faixa_tiff, progresso):
+            offsets.append(arquivo.tell() - inicio)
+            tamanhos.append(len(dados))
+            arquivo.write(dados)
+
+        # Valores que não cabem na entrada do IFD vão logo antes dele
+        def extra(dados):
+            if arquivo.tell() % 2:
+                arquivo.write(b'\x00')
+            posicao = arquivo.tell() - inicio
+            arquivo.write(dados)
+            return posicao
+
+        bits = extra(struct.pack('<4H', 8, 8, 8, 8))
+        resolucao = extra(struct.pack('<II', self.dpi, 1))
+        if len(offsets) > 1:
+            valor_offsets = extra(struct.pack(f'<{len(offsets)}I', *offsets))
+            valor_tamanhos = extra(struct.pack(f'<{len(tamanhos)}I', *tamanhos))
+        else:
+            valor_offsets, valor_tamanhos = offsets[0], tamanhos[0]
+
+        curto, longo, racional = 3, 4, 5
+        entradas = [
+            (256, longo, 1, self.largura_px),
+            (257, longo, 1, self.altura_px),
+            (258, curto, 4, bits),
+            (259, curto, 1, 8),  # Adobe Deflate
+            (262, curto, 1, 2),  # RGB
+            (273, longo, len(offsets), valor_offsets),
+            (277, curto, 1, 4),
+            (278, longo, 1, self.altura_faixa),
+            (279, longo, len(tamanhos), valor_tamanhos),
+            (282, racional, 1, resolucao),
+            (283, racional, 1, resolucao),
+            (284, curto, 1, 1),
+            (296, curto, 1, 2),  # polegadas
+            (338, curto, 1, 2),  # alfa não associado
+        ]
+        if arquivo.tell() % 2:
+            arquivo.write(b'\x00')
+        ifd = arquivo.tell() - inicio
+        arquivo.write(struct.pack('<H', len(entradas)))
+        for tag, tipo, quantidade, valor in entradas:
+            if tipo == curto and quantidade == 1:
+                arquivo.write(struct.pack('<HHIHH', tag, tipo, quantidade, valor, 0))
+            else:
+                arquivo.write(struct.pack('<HHII', tag, tipo, quantidade, valor))
+        arquivo.write(struct.pack('<I', 0))
+
+        fim = arquivo.tell()
+        arquivo.seek(inicio + 4)
+        arquivo.write(struct.pack('<I', ifd))
+        arquivo.seek(fim)
+
+    def _em_ordem(self, processar, progresso=None):
+        """Processa as faixas em paralelo e entrega em ordem, com poucas em memória"""
+        limite = self.trabalhadores * 2
+        with ThreadPoolExecutor(max_workers=self.trabalhadores) as executor:
+            pendentes = deque()
+            proxima = 0
+            for concluidas in range(self.total_faixas):
+                while proxima < self.total_faixas and len(pendentes) < limite:
+                    pendentes.append(executor.submit(processar, proxima))
+                    proxima += 1
+                yield pendentes.popleft().result()
+                if progresso:
+                    progresso((concluidas + 1) / self.total_faixas)
+
+    def gravar(self, destino, formato='PNG', progresso=None):
+        """Grava a folha em um caminho ou arquivo binário (com seek, no caso do TIFF)"""
+        formato = formato.upper()
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato não suportado: {formato}")
+        gravar = self._gravar_png if formato == 'PNG' else self._gravar_tiff
+        if isinstance(destino, (str, os.PathLike)):
+            with open(destino, 'wb') as arquivo:
+                gravar(arquivo, progresso)
+        else:
+            gravar(destino, progresso)
+        return destino
+
+
+def compor_folha(folha, destino, formato='PNG', dpi=DPI_FOLHA, provedor_arte=None,
+                 altura_faixa=ALTURA_FAIXA_PX, trabalhadores=None, progresso=None):
+    """Gera o arquivo de impressão de uma folha de corrida (ver CorridaRolo.folha)"""
+    compositor = CompositorFolha(folha['posicoes'], folha['largura'], folha['comprimento_usado'],
+                                 dpi=dpi, provedor_arte=provedor_arte,
+                                 altura_faixa=altura_faixa, trabalhadores=trabalhadores)
+    return compositor.gravar(destino, formato, progresso)
@@ -1,6 +1,8 @@
 from models import init_db
+from schema_migrations import migrar
 
 if __name__ == "__main__":
     print("🔄 Inicializando banco de dados...")
+    migrar()
     init_db()
     print("✅ Banco de dados inicializado com sucesso!")
@@ -0,0 +1,84 @@
+"""
+Migração dos itens de pedidos/orçamentos para JSON de verdade
+
+Até aqui os itens eram gravados com json.dumps() em uma coluna JSON, ou
+seja, o banco guardava um texto JSON contendo o JSON dos itens. Esta
+migração (idempotente, executada por schema_migrations ou com
+python items_migration.py):
+
+1. desfaz a codificação dupla em lotes (uma transação por lote);
+2. no PostgreSQL, converte a coluna para JSONB (o índice GIN fica com as
+   migrações de índices).
+"""
+
+import json
+
+from sqlalchemy import select, text, update, func
+
+from models import engine, Order, Budget
+
+TAMANHO_LOTE = 1000
+TABELAS = (Order.__table__, Budget.__table__)
+
+
+def _tipo_coluna(conexao, tabela):
+    return conexao.execute(text(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_name = :tabela AND column_name = 'items'"
+    ), {'tabela': tabela}).scalar()
+
+
+def _migrar_postgres(tabela, lote):
+    nome = tabela.name
+    corrigidos = 0
+    with engine.begin() as conexao:
+        tipo = 'jsonb' if _tipo_coluna(conexao, nome) == 'jsonb' else 'json'
+    # 1. Texto JSON -> estrutura (#>> '{}' extrai o texto do escalar)
+    while True:
+        with engine.begin() as conexao:
+            alterados = conexao.execute(text(
+                f"UPDATE {nome} SET items = (items #>> '{{}}')::{tipo} WHERE id IN ("
+                f"SELECT id FROM {nome} WHERE {tipo}_typeof(items) = 'string' ORDER BY id LIMIT :lote)"
+            ), {'lote': lote}).rowcount
+        corrigidos += alterados
+        if not alterados:
+            break
+    # 2. JSON -> JSONB (reescreve a tabela uma vez)
+    if tipo == 'json':
+        with engine.begin() as conexao:
+            conexao.execute(text("SET LOCAL statement_timeout = 0"))
+            conexao.execute(text(f"ALTER TABLE {nome} ALTER COLUMN items TYPE jsonb USING items::jsonb"))
+    return corrigidos
+
+
+def _migrar_generico(tabela, lote):
+    """SQLite: json_type() encontra as linhas gravadas como texto JSON"""
+    corrigidos = 0
+    while True:
+        with engine.begin() as conexao:
+            linhas = conexao.execute(
+                select(tabela.c.id, tabela.c['items'])
+                .where(func.json_type(tabela.c['items']) == 'text')
+                .order_by(tabela.c.id).limit(lote)
+            ).all()
+            for id_, items in linhas:
+                try:
+                    while isinstance(items, str):
+                        items = json.loads(items)
+                except ValueError:
+                    items = []
+                conexao.execute(update(tabela).where(tabela.c.id == id_).values(items=items))
+        corrigidos += len(linhas)
+        if len(linhas) < lote:
+            return corrigidos
+
+
+def migrar_itens(lote=TAMANHO_LOTE):
+    """Executa a migração nas tabelas de pedidos e orçamentos; retorna {tabela: linhas corrigidas}"""
+    migrar = _migrar_postgres if engine.dialect.name == 'postgresql' else _migrar_generico
+    return {tabela.name: migrar(tabela, lote) for tabela in TABELAS}
+
+
+if __name__ == "__main__":
+    for tabela, corrigidos in migrar_itens().items():
+        print(f"✅ {tabela}: {corrigidos} registro(s) convertidos")
@@ -0,0 +1,116 @@
+"""
+Itens de pedidos e orçamentos em tabelas normalizadas
+
+Order.items/Budget.items continuam sendo a fonte do documento (PDF, telas);
+order_items/budget_items repetem cada item em uma linha, com o produto
+(product_id), quantidade, preço e custo unitários e a data do cabeçalho,
+indexadas por (product_id, created_at). Assim perguntas por produto viram
+SQL com índice em vez de carregar e interpretar o JSON de todos os pedidos.
+
+As linhas são gravadas na mesma transação do pedido/orçamento
+(gravar_itens) e as já existentes são preenchidas em lotes a partir do JSON
+(preencher_itens, também executável: python line_items.py).
+"""
+
+from datetime import datetime
+
+from models import SessionLocal, Order, Budget, OrderItem, BudgetItem, Product
+
+TAMANHO_LOTE = 500
+
+TABELAS = {
+    'pedido': (Order, OrderItem, 'order'),
+    'orcamento': (Budget, BudgetItem, 'budget'),
+}
+
+
+def _lista_itens(items):
+    return items if isinstance(items, list) else []
+
+
+def _numero(valor):
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _produtos_por_nome(db, nomes):
+    """id dos produtos cadastrados com esses nomes (uma consulta por lote)"""
+    nomes = {nome for nome in nomes if nome}
+    if not nomes:
+        return {}
+    return dict(db.query(Product.name, Product.id).filter(Product.name.in_(list(nomes))).all())
+
+
+def _linhas(cabecalho, itens, produtos, classe_item, **chave):
+    linhas = []
+    for posicao, item in enumerate(itens):
+        if not isinstance(item, dict):
+            continue
+        nome = str(item.get('nome', item.get('name', '')) or '')
+        quantidade = _numero(item.get('quantidade', item.get('quantity', 0)))
+        unitario = _numero(item.get('valor_unitario', item.get('unit_price', item.get('preco_unitario', 0))))
+        custo = item.get('custo_unitario', item.get('unit_cost'))
+        linhas.append(classe_item(
+            position=posicao,
+            product_id=produtos.get(nome),
+            product_name=nome[:100],
+            quantity=quantidade,
+            unit_price=unitario,
+            unit_cost=_numero(custo) if custo is not None else None,
+            total=quantidade * unitario,
+            created_at=cabecalho.created_at or datetime.now(),
+            **chave
+        ))
+    return linhas
+
+
+def gravar_itens(db, cabecalho):
+    """Cria as linhas de itens do pedido/orçamento na sessão (gravadas no mesmo commit)"""
+    classe_item = OrderItem if isinstance(cabecalho, Order) else BudgetItem
+    if cabecalho.created_at is None:
+        cabecalho.created_at = datetime.now()
+    itens = _lista_itens(cabecalho.items)
+    produtos = _produtos_por_nome(db, (str(i.get('nome', i.get('name', '')) or '') for i in itens
+                                       if isinstance(i, dict)))
+    cabecalho.line_items = _linhas(cabecalho, itens, produtos, classe_item)
+
+
+def preencher_itens(db, tipo, lote=TAMANHO_LOTE):
+    """Cria as linhas dos pedidos/orçamentos que ainda não têm, em lotes (commit por lote).
+
+    Percorre os cabeçalhos por id (sem OFFSET), então pode ser interrompido
+    e executado de novo. Retorna a quantidade de cabeçalhos preenchidos.
+    """
+    modelo, classe_item, relacao = TABELAS[tipo]
+    chave = getattr(classe_item, f"{relacao}_id")
+    ultimo_id = 0
+    preenchidos = 0
+    while True:
+        cabecalhos = db.query(modelo).filter(
+            modelo.id > ultimo_id,
+            ~db.query(classe_item.id).filter(chave == modelo.id).exists()
+        ).order_by(modelo.id).limit(lote).all()
+        if not cabecalhos:
+            return preenchidos
+        itens = {c.id: _lista_itens(c.items) for c in cabecalhos}
+        produtos = _produtos_por_nome(db, (str(i.get('nome', i.get('name', '')) or '')
+                                           for lista in itens.values() for i in lista if isinstance(i, dict)))
+        for cabecalho in cabecalhos:
+            db.add_all(_linhas(cabecalho, itens[cabecalho.id], produtos, classe_item,
+                               **{f"{relacao}_id": cabecalho.id}))
+        ultimo_id = cabecalhos[-1].id
+        preenchidos += len(cabecalhos)
+        db.commit()
+        db.expunge_all()
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        for tipo in TABELAS:
+            print(f"🔄 Preenchendo itens ({tipo})...")
+            print(f"✅ {preencher_itens(db, tipo)} registro(s) preenchidos")
+    finally:
+        db.close()
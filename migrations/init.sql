@@ -1,119 +0,0 @@
--- Tabela de usuários
-CREATE TABLE IF NOT EXISTS users (
-    id SERIAL PRIMARY KEY,
-    username VARCHAR(50) UNIQUE NOT NULL,
-    email VARCHAR(100) UNIQUE NOT NULL,
-    password_hash VARCHAR(255) NOT NULL,
-    full_name VARCHAR(100),
-    is_active BOOLEAN DEFAULT TRUE,
-    is_admin BOOLEAN DEFAULT FALSE,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
--- Tabela de produtos
-CREATE TABLE IF NOT EXISTS products (
-    id SERIAL PRIMARY KEY,
-    name VARCHAR(100) NOT NULL,
-    cost DECIMAL(10,2) DEFAULT 0.00,
-    energy_cost DECIMAL(10,2) DEFAULT 0.00,
-    transport_cost DECIMAL(10,2) DEFAULT 0.00,
-    packaging_cost DECIMAL(10,2) DEFAULT 0.00,
-    uses_dtf BOOLEAN DEFAULT TRUE,
-    is_active BOOLEAN DEFAULT TRUE,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
--- Tabela de clientes
-CREATE TABLE IF NOT EXISTS customers (
-    id SERIAL PRIMARY KEY,
-    name VARCHAR(100) NOT NULL,
-    document_type VARCHAR(10),
-    document VARCHAR(20),
-    address TEXT,
-    zip_code VARCHAR(10),
-    city VARCHAR(50),
-    state VARCHAR(2),
-    phone VARCHAR(20),
-    email VARCHAR(100),
-    notes TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    user_id INTEGER REFERENCES users(id)
-);
-
--- Tabela de fornecedores
-CREATE TABLE IF NOT EXISTS suppliers (
-    id SERIAL PRIMARY KEY,
-    name VARCHAR(100) NOT NULL,
-    trade_name VARCHAR(100),
-    supplier_type VARCHAR(50),
-    document_type VARCHAR(10),
-    document VARCHAR(20),
-    address TEXT,
-    phone VARCHAR(20),
-    email VARCHAR(100),
-    notes TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    user_id INTEGER REFERENCES users(id)
-);
-
--- Tabela de pedidos
-CREATE TABLE IF NOT EXISTS orders (
-    id SERIAL PRIMARY KEY,
-    order_number VARCHAR(20) UNIQUE,
-    customer_id INTEGER REFERENCES customers(id),
-    user_id INTEGER REFERENCES users(id),
-    total_amount DECIMAL(10,2) DEFAULT 0.00,
-    items JSONB,
-    delivery_type VARCHAR(50),
-    delivery_deadline VARCHAR(50),
-    payment_method VARCHAR(50),
-    payment_status VARCHAR(20) DEFAULT 'pending',
-    delivery_status VARCHAR(20) DEFAULT 'production',
-    notes TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    paid_at TIMESTAMP,
-    delivered_at TIMESTAMP
-);
-
--- Tabela de orçamentos
-CREATE TABLE IF NOT EXISTS budgets (
-    id SERIAL PRIMARY KEY,
-    budget_number VARCHAR(20) UNIQUE,
-    client_name VARCHAR(100),
-    address TEXT,
-    delivery_type VARCHAR(50),
-    sale_type VARCHAR(50),
-    production_deadline VARCHAR(50),
-    total_amount DECIMAL(10,2) DEFAULT 0.00,
-    items JSONB,
-    notes TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    user_id INTEGER REFERENCES users(id)
-);
-
--- Tabela de configurações do sistema
-CREATE TABLE IF NOT EXISTS system_config (
-    id SERIAL PRIMARY KEY,
-    key VARCHAR(50) UNIQUE NOT NULL,
-    value TEXT,
-    value_type VARCHAR(20),
-    category VARCHAR(50),
-    description TEXT,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
--- Índices para melhor performance
-CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
-CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
-CREATE INDEX IF NOT EXISTS idx_customers_name ON customers(name);
-CREATE INDEX IF NOT EXISTS idx_customers_user_id ON customers(user_id);
-CREATE INDEX IF NOT EXISTS idx_orders_customer_id ON orders(customer_id);
-CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders(user_id);
-CREATE INDEX IF NOT EXISTS idx_orders_payment_status ON orders(payment_status);
-CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at);
-
--- Inserir usuário admin padrão (senha: admin123)
-INSERT INTO users (username, email, password_hash, full_name, is_admin) 
-VALUES ('admin', 'admin@sejacapricho.com.br', '$2b$12$LQv3c1yqBWVHxkd0g6hQ8e9rGdHjKl8p8n8J8n8J8n8J8n8J8n8J8n', 'Administrador', TRUE)
-ON CONFLICT (username) DO NOTHING;
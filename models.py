@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, Text, DateTime, JSON, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Float, Boolean, Text, DateTime, JSON, ForeignKey, Date, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.types import Numeric
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 import sys
@@ -9,17 +10,17 @@ import json
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from config import config
+from db_pool import criar_engine, CONFIGURACOES_POOL
 
-# Configurar engine do banco de dados
-engine = create_engine(
-    config.SQLALCHEMY_DATABASE_URI,
-    pool_pre_ping=True,
-    pool_recycle=3600
-)
+# Configurar engine do banco de dados (pool configurável e com métricas: ver db_pool)
+engine = criar_engine(config.SQLALCHEMY_DATABASE_URI)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Itens de pedidos/orçamentos: JSONB no PostgreSQL (indexável com GIN), JSON nos demais
+ItensJSON = JSON().with_variant(JSONB(), 'postgresql')
+
 # --- MODELOS ---
 
 class User(Base):
@@ -208,7 +209,7 @@ class Order(Base):
     id = Column(Integer, primary_key=True)
     order_number = Column(String(20), unique=True, nullable=False)
     total_amount = Column(Numeric(10, 2), nullable=False)
-    items = Column(JSON)  # Lista de itens em JSON
+    items = Column(ItensJSON)  # Lista de itens (gravar a lista, não json.dumps)
     delivery_type = Column(String(50))  # Pronta Entrega, Sob Encomenda
     delivery_deadline = Column(String(50))
     delivery_status = Column(String(20), default='production')  # production, delivered
@@ -227,6 +228,9 @@ class Order(Base):
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     user = relationship("User", back_populates="orders")
     
+    line_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan",
+                              order_by="OrderItem.position")
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -256,7 +260,7 @@ class Budget(Base):
     sale_type = Column(String(50))  # Revenda, Personalizado
     production_deadline = Column(String(50))
     total_amount = Column(Numeric(10, 2), nullable=False)
-    items = Column(JSON)  # Lista de itens em JSON
+    items = Column(ItensJSON)  # Lista de itens (gravar a lista, não json.dumps)
     notes = Column(Text)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
@@ -265,6 +269,9 @@ class Budget(Base):
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     user = relationship("User", back_populates="budgets")
     
+    line_items = relationship("BudgetItem", back_populates="budget", cascade="all, delete-orphan",
+                              order_by="BudgetItem.position")
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -289,16 +296,154 @@ class Budget(Base):
             'data': self.created_at.strftime('%d/%m/%Y') if self.created_at else None
         }
 
+class OrderItem(Base):
+    """Item de pedido normalizado (espelho de Order.items, para consultas por produto)"""
+    __tablename__ = 'order_items'
+    __table_args__ = (
+        UniqueConstraint('order_id', 'position', name='uq_order_items_position'),
+        Index('ix_order_items_product_created', 'product_id', 'created_at'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey('orders.id'), nullable=False, index=True)
+    position = Column(Integer, nullable=False)  # posição do item em Order.items
+    product_id = Column(Integer, ForeignKey('products.id'), index=True)  # vazio para itens avulsos
+    product_name = Column(String(100), nullable=False)
+    quantity = Column(Float, nullable=False, default=0.0)
+    unit_price = Column(Numeric(10, 2), nullable=False, default=0.0)
+    unit_cost = Column(Numeric(10, 2))  # custo calculado na venda (vazio se não registrado)
+    total = Column(Numeric(12, 2), nullable=False, default=0.0)
+    created_at = Column(DateTime, nullable=False, index=True)  # data do pedido
+    
+    order = relationship("Order", back_populates="line_items")
+    product = relationship("Product")
+
+class BudgetItem(Base):
+    """Item de orçamento normalizado (espelho de Budget.items)"""
+    __tablename__ = 'budget_items'
+    __table_args__ = (
+        UniqueConstraint('budget_id', 'position', name='uq_budget_items_position'),
+        Index('ix_budget_items_product_created', 'product_id', 'created_at'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    budget_id = Column(Integer, ForeignKey('budgets.id'), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    product_id = Column(Integer, ForeignKey('products.id'), index=True)
+    product_name = Column(String(100), nullable=False)
+    quantity = Column(Float, nullable=False, default=0.0)
+    unit_price = Column(Numeric(10, 2), nullable=False, default=0.0)
+    unit_cost = Column(Numeric(10, 2))
+    total = Column(Numeric(12, 2), nullable=False, default=0.0)
+    created_at = Column(DateTime, nullable=False, index=True)
+    
+    budget = relationship("Budget", back_populates="line_items")
+    product = relationship("Product")
+
+class Artwork(Base):
+    __tablename__ = 'artworks'
+    
+    id = Column(String(64), primary_key=True)  # SHA-256 do conteúdo
+    filename = Column(String(255))
+    file_format = Column(String(10))
+    size_bytes = Column(Integer)
+    width_px = Column(Integer)
+    height_px = Column(Integer)
+    dpi = Column(Float)
+    bbox = Column(JSON)  # Área com tinta em pixels: [esquerda, topo, direita, base]
+    print_width_cm = Column(Float)
+    print_height_cm = Column(Float)
+    coverage = Column(JSON)  # Cobertura de tinta: c, m, y, k, branco
+    created_at = Column(DateTime, default=datetime.now)
+    
+    # Relacionamentos
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'file_format': self.file_format,
+            'size_bytes': self.size_bytes,
+            'width_px': self.width_px,
+            'height_px': self.height_px,
+            'dpi': self.dpi,
+            'bbox': self.bbox,
+            'print_width_cm': self.print_width_cm,
+            'print_height_cm': self.print_height_cm,
+            'coverage': self.coverage,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class FilmConsumption(Base):
+    """Consumo de filme por estampa impressa (uma linha por peça da corrida)"""
+    __tablename__ = 'film_consumption'
+    __table_args__ = (
+        UniqueConstraint('order_id', 'item_index', 'side', 'unit', name='uq_film_consumption_piece'),
+        Index('ix_film_consumption_date_product', 'printed_on', 'product_name'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    printed_on = Column(Date, nullable=False, index=True)
+    run_number = Column(Integer)
+    order_number = Column(String(20))
+    product_name = Column(String(100), index=True)
+    item_index = Column(Integer, nullable=False)
+    side = Column(String(10), nullable=False)  # Frente, Costas
+    unit = Column(Integer, nullable=False)
+    charged_area_cm2 = Column(Float, default=0.0)  # Área cobrada pela calculadora
+    printed_area_cm2 = Column(Float, default=0.0)  # Área efetivamente estampada
+    film_area_cm2 = Column(Float, default=0.0)  # Parcela do filme consumido na corrida
+    film_length_cm = Column(Float, default=0.0)
+    charged_cost = Column(Float, default=0.0)
+    film_cost = Column(Float, default=0.0)
+    created_at = Column(DateTime, default=datetime.now)
+    
+    # Relacionamentos
+    order_id = Column(Integer, ForeignKey('orders.id'), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'printed_on': self.printed_on.isoformat() if self.printed_on else None,
+            'run_number': self.run_number,
+            'order_id': self.order_id,
+            'order_number': self.order_number,
+            'product_name': self.product_name,
+            'item_index': self.item_index,
+            'side': self.side,
+            'unit': self.unit,
+            'charged_area_cm2': self.charged_area_cm2,
+            'printed_area_cm2': self.printed_area_cm2,
+            'film_area_cm2': self.film_area_cm2,
+            'film_length_cm': self.film_length_cm,
+            'charged_cost': self.charged_cost,
+            'film_cost': self.film_cost,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class NumberSequence(Base):
+    """Contador da numeração de pedidos/orçamentos (bancos sem SEQUENCE, ex.: SQLite)"""
+    __tablename__ = 'number_sequences'
+    
+    name = Column(String(50), primary_key=True)  # ex.: pedido, orcamento_2026
+    value = Column(Integer, nullable=False, default=0)  # último número entregue
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
 # Adicionar relacionamentos ausentes no User
 User.products = relationship("Product", back_populates="user", cascade="all, delete-orphan")
 
 # --- INICIALIZAÇÃO ---
 
 def init_db():
-    """Inicializa o banco de dados e cria tabelas"""
+    """Grava os dados padrão (configurações e admin).
+
+    O esquema (tabelas e índices) é responsabilidade de schema_migrations,
+    que deve rodar antes: python schema_migrations.py
+    """
     try:
-        print("🔄 Criando tabelas do banco de dados...")
-        Base.metadata.create_all(bind=engine)
+        print("🔄 Gravando dados padrão do banco de dados...")
         db = SessionLocal()
 
         from sqlalchemy import inspect
@@ -308,6 +453,13 @@ def init_db():
             ('dtf_price_per_meter', '80.0', 'number', 'dtf', 'Preço do DTF por metro linear'),
             ('roll_width', '58.0', 'number', 'dtf', 'Largura do rolo de DTF (cm)'),
             ('roll_height', '100.0', 'number', 'dtf', 'Altura do rolo de DTF (cm)'),
+            ('print_run_length', '300.0', 'number', 'dtf', 'Comprimento de cada corrida de impressão (cm)'),
+            ('print_gap', '1.0', 'number', 'dtf', 'Espaçamento entre estampas no rolo (cm)'),
+            ('nesting_cell_size', '0.5', 'number', 'dtf', 'Tamanho da célula do aninhamento por máscara (cm)'),
+            ('artwork_default_dpi', '300', 'number', 'dtf', 'DPI assumido para artes sem metadado de resolução'),
+            ('print_sheet_dpi', '300', 'number', 'dtf', 'Resolução do arquivo de impressão gerado para cada corrida'),
+            ('ink_cost_cmyk_m2', '0.0', 'number', 'dtf', 'Custo de tinta por canal CMYK em 100% de cobertura (R$/m²)'),
+            ('ink_cost_white_m2', '0.0', 'number', 'dtf', 'Custo da tinta branca de base (R$/m²)'),
             ('energy_cost_label', 'Energia (R$)', 'string', 'labels', 'Rótulo para custo de energia'),
             ('transport_cost_label', 'Transporte (R$)', 'string', 'labels', 'Rótulo para custo de transporte'),
             ('packaging_cost_label', 'Embalagem (R$)', 'string', 'labels', 'Rótulo para custo de embalagem'),
@@ -315,8 +467,10 @@ def init_db():
             ('transport_cost_value', '2.0', 'number', 'fixed_costs', 'Valor padrão para custo de transporte'),
             ('packaging_cost_value', '1.0', 'number', 'fixed_costs', 'Valor padrão para custo de embalagem'),
             ('default_margin', '50.0', 'number', 'pricing', 'Margem padrão em porcentagem'),
-            ('default_production_days', '5', 'number', 'general', 'Dias padrão para produção')
-        ]
+            ('default_production_days', '5', 'number', 'general', 'Dias padrão para produção'),
+            ('number_year_prefix', 'false', 'boolean', 'general', 'Numerar pedidos e orçamentos por ano (ex.: 2026-0001)')
+        ] + [(key, str(padrao), 'number', 'database', description)
+             for key, _, padrao, _, description in CONFIGURACOES_POOL]
         
         for key, value, value_type, category, description in default_configs:
             existing = db.query(SystemConfig).filter(SystemConfig.key == key).first()
@@ -349,6 +503,7 @@ def init_db():
                 print("⚠️ Não foi possível criar usuário admin - módulo security não encontrado")
         
         db.commit()
+        
         print("✅ Banco de dados inicializado com sucesso!")
         
     except Exception as e:
@@ -0,0 +1,204 @@
+"""
+Aninhamento de estampas por máscara de transparência (modo raster)
+
+Cada arte vira um bitmap de ocupação reduzido (a partir do canal alfa) e é
+posicionada no raster da corrida com busca de colisão via FFT, permitindo
+que formas irregulares (logos redondos, letterings) se encaixem entre si.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from batch_planner import CorridaRolo
+
+CELULA_PADRAO_CM = 0.5
+LIMIAR_ALFA = 8  # alfa (0-255) a partir do qual o pixel conta como tinta
+MAX_FORMAS_CACHE = 512
+
+# Cache de formas por hash da arte: máscaras, rotações e espectros FFT
+_cache_formas = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_obter(chave, criar):
+    with _cache_lock:
+        if chave in _cache_formas:
+            _cache_formas.move_to_end(chave)
+            return _cache_formas[chave]
+    valor = criar()
+    with _cache_lock:
+        _cache_formas[chave] = valor
+        while len(_cache_formas) > MAX_FORMAS_CACHE:
+            _cache_formas.popitem(last=False)
+    return valor
+
+
+def mascara_de_imagem(dados, colunas, linhas):
+    """Bitmap de ocupação (linhas x colunas) a partir do canal alfa da imagem
+
+    A peça mede a área com tinta (artwork.detectar_area_impressao), e a folha
+    de impressão cola a arte recortada nessa área: a máscara é recortada da
+    mesma forma antes de reduzida, sem as margens transparentes. Arte sem
+    tinta ocupa o retângulo inteiro.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(dados)) as imagem:
+        imagem.draft('RGBA', (colunas * 4, linhas * 4))
+        if 'A' not in imagem.getbands() and 'transparency' not in imagem.info:
+            return np.ones((linhas, colunas), dtype=bool)
+        alfa = imagem.convert('RGBA').getchannel('A')
+    caixa = alfa.point(lambda a: 255 if a >= LIMIAR_ALFA else 0).getbbox()
+    if caixa is None:
+        return np.ones((linhas, colunas), dtype=bool)
+    # BOX = média da célula; qualquer tinta na célula a torna ocupada
+    reduzida = alfa.crop(caixa).resize((colunas, linhas), Image.BOX)
+    return np.asarray(reduzida) >= LIMIAR_ALFA
+
+
+def dilatar(mascara, raio):
+    """Dilatação binária por um disco de raio (em células), só com NumPy"""
+    if raio <= 0:
+        return mascara
+    linhas, colunas = mascara.shape
+    resultado = np.zeros((linhas + 2 * raio, colunas + 2 * raio), dtype=bool)
+    for dy in range(-raio, raio + 1):
+        for dx in range(-raio, raio + 1):
+            if dy * dy + dx * dx > raio * raio:
+                continue
+            resultado[raio + dy:raio + dy + linhas, raio + dx:raio + dx + colunas] |= mascara
+    return resultado
+
+
+class FormaRaster:
+    """Máscara de uma peça e suas rotações, com espectros calculados sob demanda"""
+
+    def __init__(self, mascara):
+        self.rotacoes = [mascara, np.ascontiguousarray(np.rot90(mascara))]
+        self.areas = [int(mascara.sum())] * 2
+        self._espectros = {}
+
+    def espectro(self, rotacao, formato):
+        """FFT conjugada da máscara no tamanho do raster da corrida"""
+        chave = (rotacao, formato)
+        if chave not in self._espectros:
+            self._espectros[chave] = np.conj(np.fft.rfft2(
+                self.rotacoes[rotacao].astype(np.float32), s=formato))
+        return self._espectros[chave]
+
+
+def obter_forma(peca, celula, provedor_arte=None):
+    """Forma raster da peça (em cache pelo hash da arte e pelas dimensões)"""
+    colunas = max(1, int(np.ceil(peca['largura'] / celula)))
+    linhas = max(1, int(np.ceil(peca['altura'] / celula)))
+    arte_id = peca.get('arte_id')
+
+    if arte_id and provedor_arte:
+        def criar():
+            dados = provedor_arte(arte_id)
+            if not dados:
+                return FormaRaster(np.ones((linhas, colunas), dtype=bool))
+            return FormaRaster(mascara_de_imagem(dados, colunas, linhas))
+        return _cache_obter((arte_id, colunas, linhas), criar)
+
+    return _cache_obter(('retangulo', colunas, linhas),
+                        lambda: FormaRaster(np.ones((linhas, colunas), dtype=bool)))
+
+
+class CorridaMascara(CorridaRolo):
+    """Corrida de rolo com encaixe por máscara (colisão por correlação FFT)"""
+
+    def __init__(self, numero, largura, comprimento, espacamento=1.0,
+                 celula=CELULA_PADRAO_CM, provedor_arte=None):
+        super().__init__(numero, largura, comprimento, espacamento)
+        self.celula = float(celula)
+        self.provedor_arte = provedor_arte
+        self.formato = (int(comprimento // self.celula), int(largura // self.celula))
+        self.raio_espacamento = int(np.ceil(self.espacamento / self.celula))
+        self.ocupacao = np.zeros(self.formato, dtype=np.float32)
+        self._comprimento_usado = 0.0
+
+    @property
+    def comprimento_usado(self):
+        return self._comprimento_usado
+
+    def _posicoes_livres(self, forma, rotacao):
+        mascara = forma.rotacoes[rotacao]
+        linhas, colunas = mascara.shape
+        total_linhas, total_colunas = self.formato
+        if linhas > total_linhas or colunas > total_colunas:
+            return None
+        if not self.ocupacao.any():
+            return np.ones((total_linhas - linhas + 1, total_colunas - colunas + 1), dtype=bool)
+        sobreposicao = np.fft.irfft2(np.fft.rfft2(self.ocupacao) * forma.espectro(rotacao, self.formato),
+                                     s=self.formato)
+        return sobreposicao[:total_linhas - linhas + 1, :total_colunas - colunas + 1] < 0.5
+
+    def encaixar(self, peca):
+        """Posiciona a peça no ponto livre mais próximo do início do rolo"""
+        forma = obter_forma(peca, self.celula, self.provedor_arte)
+
+        melhor = None
+        for rotacao in (0, 1):
+            livres = self._posicoes_livres(forma, rotacao)
+            if livres is None or not livres.any():
+                continue
+            linhas_livres = np.flatnonzero(livres.any(axis=1))
+            y = int(linhas_livres[0])
+            x = int(np.flatnonzero(livres[y])[0])
+            fim = y + forma.rotacoes[rotacao].shape[0]
+            if melhor is None or (fim, x) < (melhor[0], melhor[2]):
+                melhor = (fim, y, x, rotacao)
+        if melhor is None:
+            return False
+
+        fim, y, x, rotacao = melhor
+        mascara = forma.rotacoes[rotacao]
+        self._ocupar(mascara, y, x)
+
+        posicao = dict(peca)
+        girada = rotacao == 1
+        posicao.update({
+            'x': x * self.celula,
+            'y': y * self.celula,
+            'largura': peca['altura'] if girada else peca['largura'],
+            'altura': peca['largura'] if girada else peca['altura'],
+            'girada': girada,
+            'area': forma.areas[rotacao] * self.celula ** 2,
+            '_celula': (y, x, rotacao),
+            '_forma': forma,
+        })
+        self.posicoes.append(posicao)
+        self._comprimento_usado = max(self._comprimento_usado, fim * self.celula)
+        return True
+
+    def _ocupar(self, mascara, y, x):
+        dilatada = dilatar(mascara, self.raio_espacamento)
+        raio = self.raio_espacamento
+        total_linhas, total_colunas = self.formato
+        y0, x0 = y - raio, x - raio
+        cy0, cx0 = max(0, -y0), max(0, -x0)
+        y0, x0 = max(0, y0), max(0, x0)
+        y1 = min(total_linhas, y0 + dilatada.shape[0] - cy0)
+        x1 = min(total_colunas, x0 + dilatada.shape[1] - cx0)
+        trecho = dilatada[cy0:cy0 + (y1 - y0), cx0:cx0 + (x1 - x0)]
+        self.ocupacao[y0:y1, x0:x1] = np.maximum(self.ocupacao[y0:y1, x0:x1], trecho)
+
+    def remover_pedido(self, pedido_id):
+        """Remove as peças do pedido e libera o espaço no raster
+
+        As demais peças ficam onde estão: os buracos do raster são ocupados
+        pelos próximos encaixes (sempre do início do rolo). Nada sobra.
+        """
+        self.posicoes = [p for p in self.posicoes if p['pedido_id'] != pedido_id]
+        self.ocupacao[:] = 0
+        self._comprimento_usado = 0.0
+        for posicao in self.posicoes:
+            y, x, rotacao = posicao['_celula']
+            mascara = posicao['_forma'].rotacoes[rotacao]
+            self._ocupar(mascara, y, x)
+            self._comprimento_usado = max(self._comprimento_usado, (y + mascara.shape[0]) * self.celula)
+        return []
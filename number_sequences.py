@@ -0,0 +1,117 @@
+"""
+Numeração atômica de pedidos e orçamentos
+
+Substitui o count() + 1, que varria a tabela, repetia números quando dois
+usuários salvavam ao mesmo tempo e reaproveitava números após exclusões.
+
+- PostgreSQL: cada série é uma SEQUENCE. nextval() é atômico e O(1) e não
+  trava nada até o commit; números de transações desfeitas são pulados
+  (série sempre crescente, com possíveis lacunas).
+- Demais bancos (SQLite): cada série é uma linha de number_sequences
+  incrementada com UPDATE, que trava a linha até o commit. A numeração fica
+  sem lacunas (um número de transação desfeita volta a ser usado).
+
+Cada série começa depois do maior número já gravado (inclusive os gerados
+pelo count() + 1). Com o prefixo por ano (configuração number_year_prefix)
+cada ano tem a própria série: 2026-0001, 2026-0002...
+"""
+
+from datetime import datetime
+
+from sqlalchemy import select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from models import Order, Budget, NumberSequence, SystemConfig
+
+SERIES = {
+    'pedido': Order.order_number,
+    'orcamento': Budget.budget_number,
+}
+DIGITOS = 4
+
+_sequencias_criadas = set()
+
+
+def formatar_numero(numero, ano=None):
+    return f"{ano}-{numero:0{DIGITOS}d}" if ano else f"{numero:0{DIGITOS}d}"
+
+
+def _nome_serie(tipo, ano):
+    return f"{tipo}_{ano}" if ano else tipo
+
+
+def _postgres(db):
+    return db.get_bind().dialect.name == 'postgresql'
+
+
+def _maior_existente(conexao, tipo, ano):
+    """Maior número já gravado na série (lido só quando a série é criada)"""
+    coluna = SERIES[tipo]
+    prefixo = f"{ano}-" if ano else ''
+    consulta = select(coluna)
+    if ano:
+        consulta = consulta.where(coluna.like(f"{prefixo}%"))
+    maior = 0
+    for (numero,) in conexao.execute(consulta):
+        resto = (numero or '')[len(prefixo):]
+        if resto.isdigit():
+            maior = max(maior, int(resto))
+    return maior
+
+
+def _reservar_postgres(db, tipo, quantidade, ano):
+    sequencia = f"seq_numero_{_nome_serie(tipo, ano)}"
+    if sequencia not in _sequencias_criadas:
+        # Conexão própria: a criação não depende do commit de quem pediu o número
+        try:
+            with db.get_bind().begin() as conexao:
+                inicio = _maior_existente(conexao, tipo, ano) + 1
+                conexao.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {sequencia} START WITH {inicio}"))
+        except IntegrityError:
+            pass  # criada ao mesmo tempo por outro processo
+        _sequencias_criadas.add(sequencia)
+    linhas = db.execute(text(f"SELECT nextval('{sequencia}') FROM generate_series(1, :quantidade)"),
+                        {'quantidade': quantidade})
+    return sorted(linha[0] for linha in linhas)
+
+
+def _reservar_contador(db, tipo, quantidade, ano):
+    nome = _nome_serie(tipo, ano)
+    incremento = update(NumberSequence).where(NumberSequence.name == nome).values(
+        value=NumberSequence.value + quantidade, updated_at=datetime.now()
+    ).execution_options(synchronize_session=False)
+    if db.execute(incremento).rowcount == 0:
+        db.execute(sqlite_insert(NumberSequence).values(
+            name=nome, value=_maior_existente(db, tipo, ano), updated_at=datetime.now()
+        ).on_conflict_do_nothing())
+        db.execute(incremento)
+    ultimo = db.query(NumberSequence.value).filter(NumberSequence.name == nome).scalar()
+    return list(range(ultimo - quantidade + 1, ultimo + 1))
+
+
+def reservar(db, tipo, quantidade=1, ano=None):
+    """Reserva `quantidade` números inteiros da série, em ordem crescente"""
+    if tipo not in SERIES:
+        raise ValueError(f"Série de numeração desconhecida: {tipo}")
+    if quantidade < 1:
+        return []
+    if _postgres(db):
+        return _reservar_postgres(db, tipo, quantidade, ano)
+    return _reservar_contador(db, tipo, quantidade, ano)
+
+
+def prefixo_por_ano(db):
+    configuracao = db.query(SystemConfig).filter(SystemConfig.key == 'number_year_prefix').first()
+    return bool(configuracao and configuracao.get_value())
+
+
+def reservar_numeros(db, tipo, quantidade, data=None):
+    """Números já formatados para uma importação em lote (uma ida ao banco)"""
+    ano = (data or datetime.now()).year if prefixo_por_ano(db) else None
+    return [formatar_numero(numero, ano) for numero in reservar(db, tipo, quantidade, ano)]
+
+
+def proximo_numero(db, tipo, data=None):
+    """Próximo número formatado da série (ex.: 0042 ou 2026-0042)"""
+    return reservar_numeros(db, tipo, 1, data)[0]
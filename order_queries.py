@@ -0,0 +1,202 @@
+"""
+Consultas de pedidos usadas pelo painel, pela lista de pedidos e pela produção
+
+Os filtros rodam no banco, com predicados escritos para casar com os índices
+da migração 6 (schema_migrations):
+
+- ix_orders_unpaid_created: (created_at) WHERE payment_status <> 'paid'
+  pendentes e atrasados (> 24h), do mais recente para o mais antigo;
+- ix_orders_production_queue: (created_at) WHERE payment_status = 'paid'
+  AND delivery_status <> 'delivered': fila de produção;
+- ix_orders_customer_created: (customer_id, created_at DESC): pedidos de um
+  cliente já ordenados;
+- ix_orders_status_created: (payment_status, delivery_status, created_at
+  DESC): filtros de status da tela de pedidos.
+
+Os status entram como literais no SQL (PAGO, ENTREGUE): um índice parcial só
+é usado quando o planejador consegue provar a condição do índice, o que não
+acontece com parâmetros (?/%s).
+
+verificar_planos() roda EXPLAIN em cada consulta e aponta as que leem a
+tabela inteira (Seq Scan, ou um índice completo percorrido sem condição);
+python order_queries.py --semear 50000 faz a verificação com pedidos
+fictícios em uma transação desfeita no final (código de saída 1 se alguma
+consulta varrer a tabela).
+"""
+
+import sys
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import literal_column, insert, text
+
+from models import SessionLocal, Order, Customer, User
+
+PAGO = literal_column("'paid'")
+ENTREGUE = literal_column("'delivered'")
+HORAS_ATRASO = 24
+
+
+def pedidos_atrasados(db, horas=HORAS_ATRASO, agora=None):
+    """Não pagos há mais de `horas`"""
+    limite = (agora or datetime.now()) - timedelta(hours=horas)
+    return db.query(Order).filter(
+        Order.payment_status != PAGO,
+        Order.created_at < limite
+    ).order_by(Order.created_at.desc())
+
+
+def fila_producao(db):
+    """Pagos e ainda não entregues, na ordem de chegada"""
+    return db.query(Order).filter(
+        Order.payment_status == PAGO,
+        Order.delivery_status != ENTREGUE
+    ).order_by(Order.created_at)
+
+
+def pedidos_do_cliente(db, cliente_id):
+    return db.query(Order).filter(Order.customer_id == cliente_id).order_by(Order.created_at.desc())
+
+
+def pedidos_filtrados(db, pagos=None, entregues=None, cliente_id=None):
+    """Lista de pedidos mais recentes primeiro.
+
+    pagos/entregues: True (só pagos/entregues), False (só pendentes) ou None
+    (todos).
+    """
+    consulta = db.query(Order)
+    if pagos is not None:
+        consulta = consulta.filter(Order.payment_status == PAGO if pagos else Order.payment_status != PAGO)
+    if entregues is not None:
+        consulta = consulta.filter(Order.delivery_status == ENTREGUE if entregues
+                                   else Order.delivery_status != ENTREGUE)
+    if cliente_id is not None:
+        consulta = consulta.filter(Order.customer_id == cliente_id)
+    return consulta.order_by(Order.created_at.desc())
+
+
+# --- VERIFICAÇÃO DOS PLANOS ---
+
+def consultas_verificadas(db, cliente_id=1):
+    """As consultas quentes, com o nome mostrado no relatório"""
+    return {
+        'pedidos atrasados': pedidos_atrasados(db),
+        'fila de produção': fila_producao(db),
+        'pedidos do cliente': pedidos_do_cliente(db, cliente_id),
+        'filtro: pendentes': pedidos_filtrados(db, pagos=False).limit(50),
+        'filtro: pagos não entregues': pedidos_filtrados(db, pagos=True, entregues=False).limit(50),
+        'filtro: pagos e entregues': pedidos_filtrados(db, pagos=True, entregues=True).limit(50),
+    }
+
+
+def _explicar(db, consulta):
+    conexao = db.connection()
+    compilado = consulta.statement.compile(dialect=conexao.dialect)
+    parametros = compilado.construct_params()
+    if compilado.positional:
+        parametros = tuple(parametros[nome] for nome in compilado.positiontup)
+    if conexao.dialect.name == 'postgresql':
+        linha = conexao.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compilado), parametros).scalar()
+        return linha[0]['Plan']
+    return [linha[3] for linha in conexao.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compilado), parametros)]
+
+
+def _indices_parciais(db):
+    """Índices com WHERE: percorrer um deles inteiro lê só as linhas do predicado"""
+    if db.get_bind().dialect.name == 'postgresql':
+        sql = ("SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+               "WHERE i.indpred IS NOT NULL")
+    else:
+        sql = "SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'"
+    return {nome for (nome,) in db.execute(text(sql))}
+
+
+def _varreduras(plano, parciais, tabela='orders'):
+    """Passos do plano que leem a tabela inteira (direto ou por um índice completo sem condição)"""
+    if isinstance(plano, list):  # SQLite: "SCAN orders [USING INDEX x]"
+        encontrados = []
+        for passo in plano:
+            palavras = passo.split()
+            if palavras[:2] != ['SCAN', tabela] and palavras[:3] != ['SCAN', 'TABLE', tabela]:
+                continue
+            if 'INDEX' in palavras and palavras[palavras.index('INDEX') + 1] in parciais:
+                continue
+            encontrados.append(passo)
+        return encontrados
+    encontrados = []
+    if plano.get('Relation Name') == tabela:
+        if plano.get('Node Type') == 'Seq Scan':
+            encontrados.append(f"Seq Scan on {tabela}")
+        elif (plano.get('Node Type') in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in plano
+              and plano.get('Index Name') not in parciais):
+            encontrados.append(f"{plano['Node Type']} using {plano.get('Index Name')} sem condição")
+    for filho in plano.get('Plans', []):
+        encontrados.extend(_varreduras(filho, parciais, tabela))
+    return encontrados
+
+
+def verificar_planos(db, cliente_id=1):
+    """{nome da consulta: (plano, varreduras completas encontradas)}"""
+    parciais = _indices_parciais(db)
+    resultado = {}
+    for nome, consulta in consultas_verificadas(db, cliente_id).items():
+        plano = _explicar(db, consulta)
+        resultado[nome] = (plano, _varreduras(plano, parciais))
+    return resultado
+
+
+def semear(db, quantidade, clientes=None):
+    """Pedidos fictícios com a distribuição de uma loja em operação (maioria paga e entregue).
+
+    Só grava na transação corrente: quem chama decide entre commit e
+    rollback. Retorna o id de um dos clientes criados.
+    """
+    aleatorio = random.Random(42)
+    clientes = clientes or max(1, quantidade // 25)
+    usuario = User(username='plano_semente', email='plano_semente@example.com', password_hash='-')
+    db.add(usuario)
+    db.flush()
+    db.execute(insert(Customer), [
+        {'name': f"Cliente {i}", 'user_id': usuario.id, 'created_at': datetime.now()} for i in range(clientes)
+    ])
+    ids_clientes = [i for (i,) in db.query(Customer.id).filter(Customer.user_id == usuario.id)]
+    agora = datetime.now()
+    for inicio in range(0, quantidade, 5000):
+        linhas = []
+        for i in range(inicio, min(quantidade, inicio + 5000)):
+            criado = agora - timedelta(minutes=aleatorio.randint(0, 60 * 24 * 730))
+            sorteio = aleatorio.random()
+            pago = sorteio >= 0.03
+            entregue = pago and sorteio >= 0.05
+            linhas.append({
+                'order_number': f"PL{i:08d}",
+                'total_amount': round(aleatorio.uniform(20, 800), 2),
+                'items': [],
+                'payment_status': 'paid' if pago else 'pending',
+                'delivery_status': 'delivered' if entregue else 'production',
+                'created_at': criado,
+                'updated_at': criado,
+                'customer_id': aleatorio.choice(ids_clientes),
+                'user_id': usuario.id,
+            })
+        db.execute(insert(Order), linhas)
+    db.execute(text("ANALYZE"))  # estatísticas novas para o planejador
+    return ids_clientes[0]
+
+
+if __name__ == "__main__":
+    quantidade = int(sys.argv[sys.argv.index('--semear') + 1]) if '--semear' in sys.argv else 0
+    db = SessionLocal()
+    try:
+        cliente_id = semear(db, quantidade) if quantidade else 1
+        falhas = 0
+        for nome, (plano, varreduras) in verificar_planos(db, cliente_id).items():
+            situacao = "❌ varredura completa" if varreduras else "✅ índice"
+            print(f"{situacao}  {nome}")
+            if varreduras:
+                falhas += 1
+                print(f"    {plano}")
+        sys.exit(1 if falhas else 0)
+    finally:
+        db.rollback()
+        db.close()
@@ -0,0 +1,104 @@
+"""
+Cache de PDFs renderizados, endereçado por conteúdo
+
+A chave é o SHA-256 dos dados normalizados do documento (JSON com chaves
+ordenadas) junto com o tipo e a versão do layout: qualquer alteração no
+orçamento/pedido ou no template gera outra chave, então nunca é preciso
+invalidar manualmente. Os PDFs ficam em memória (LRU limitado por bytes) e,
+ao sair da memória, são gravados no armazém de arquivos gerados (categoria
+'pdf'), que cuida do limite em disco, da validade e da limpeza.
+"""
+
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from artifact_store import armazem_artefatos
+
+LIMITE_MEMORIA_BYTES = 32 * 1024 * 1024
+CATEGORIA = 'pdf'
+
+
+def normalizar(dados):
+    """Representação canônica dos dados (JSON com chaves ordenadas)"""
+    return json.dumps(dados, sort_keys=True, ensure_ascii=False, default=str, separators=(',', ':'))
+
+
+def chave_documento(tipo, versao, *dados):
+    conteudo = '\n'.join([tipo, str(versao)] + [normalizar(d) for d in dados])
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+class CachePDF:
+    """LRU em memória com transbordo para o armazém em disco"""
+
+    def __init__(self, limite_memoria=LIMITE_MEMORIA_BYTES, armazem=armazem_artefatos):
+        self.limite_memoria = limite_memoria
+        self.armazem = armazem
+        self._memoria = OrderedDict()
+        self._bytes_memoria = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter(self, chave):
+        with self._lock:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                self.acertos += 1
+                return self._memoria[chave]
+        pdf = self.armazem.ler(CATEGORIA, f"{chave}.pdf")
+        if pdf is None:
+            with self._lock:
+                self.faltas += 1
+            return None
+        with self._lock:
+            self.acertos += 1
+        self.guardar(chave, pdf)
+        return pdf
+
+    def guardar(self, chave, pdf):
+        despejados = []
+        with self._lock:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return
+            self._memoria[chave] = pdf
+            self._bytes_memoria += len(pdf)
+            while self._bytes_memoria > self.limite_memoria and len(self._memoria) > 1:
+                antiga, conteudo = self._memoria.popitem(last=False)
+                self._bytes_memoria -= len(conteudo)
+                despejados.append((antiga, conteudo))
+        for antiga, conteudo in despejados:
+            self._transbordar(antiga, conteudo)
+
+    def _transbordar(self, chave, pdf):
+        """Grava no armazém o PDF que saiu da memória"""
+        if self.armazem.existe(CATEGORIA, f"{chave}.pdf"):
+            return
+        try:
+            self.armazem.guardar(CATEGORIA, f"{chave}.pdf", pdf)
+        except OSError as e:
+            print(f"⚠️ Cache de PDF: não foi possível gravar em disco: {e}")
+
+    def obter_ou_gerar(self, chave, gerar):
+        pdf = self.obter(chave)
+        if pdf is None:
+            pdf = gerar()
+            if pdf:
+                self.guardar(chave, pdf)
+        return pdf
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'itens_memoria': len(self._memoria),
+                'bytes_memoria': self._bytes_memoria,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+            }
+
+
+# Instância única por processo (compartilhada entre as sessões do Streamlit)
+cache_pdfs = CachePDF()
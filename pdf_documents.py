@@ -0,0 +1,757 @@
+"""
+Documentos PDF (orçamento e nota fiscal/recibo)
+
+Módulo sem dependência do Streamlit: as funções recebem dicionários simples
+e devolvem os bytes do PDF, podendo rodar em processos separados.
+"""
+
+import io
+import os
+import copy
+import threading
+from datetime import datetime
+
+from PIL import Image
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.rl_accel import escapePDF
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Flowable
+
+# Streams binários (só zlib): sem a codificação ASCII85, que é feita em
+# Python puro e deixa o arquivo ~25% maior
+rl_config.useA85 = 0
+
+# Versão do layout dos PDFs: incrementar ao mudar os templates (invalida o cache)
+VERSAO_LAYOUT_PDF = 5
+
+# Cores do layout (mesmas da interface)
+COR_ROXA = "#9370DB"
+COR_AZUL_ARDOSIA = "#836FFF"
+COR_LARANJA = "#FF7F00"
+COR_VERDE = "#238636"
+COR_CINZA = "#30363D"
+
+
+def formatar_moeda(valor):
+    """Formata valor em moeda brasileira"""
+    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+RODAPE_ORCAMENTO = (
+    "CONDIÇÕES E INFORMAÇÕES ADICIONAIS<br/>"
+    "1. Este orçamento tem validade de 30 dias a partir da data de emissão.<br/>"
+    "2. O prazo de produção começa a contar após a confirmação do pedido e pagamento.<br/>"
+    "3. Preços sujeitos a alteração sem aviso prévio.<br/>"
+    "4. Para dúvidas, acesse nossos canais de atendimento.<br/>"
+    "(75) 9155-5968 | @sejacapricho | sejacapricho.com.br"
+)
+
+RODAPE_NOTA_FISCAL = (
+    "INFORMAÇÕES IMPORTANTES<br/>"
+    "1. Este documento serve como recibo/nota fiscal simplificada.<br/>"
+    "2. Guarde este comprovante para futuras referências.<br/>"
+    "3. Para dúvidas ou reclamações, entre em contato.<br/>"
+    "(75) 9155-5968 | @sejacapricho | sejacapricho.com.br"
+)
+
+MARGEM = 72
+LARGURA_UTIL = A4[0] - 2 * MARGEM
+
+# Logos no topo dos documentos (logo.png é branco, para fundos escuros da interface)
+DIRETORIO_IMAGENS = os.path.dirname(os.path.abspath(__file__))
+LOGOS_DOCUMENTOS = {
+    'orcamento': 'logoloja.png',
+    'nota_fiscal': 'logo_nf.png',
+}
+LARGURA_LOGO = 150  # pontos (~5,3 cm)
+DPI_LOGO = 300
+
+
+class LogoPDF:
+    """Logo decodificado uma vez por processo e pronto para entrar nos PDFs.
+
+    A imagem é reduzida à resolução de impressão e achatada sobre fundo
+    branco (sem máscara de transparência) uma única vez; o ImageReader fica
+    guardado com os pixels já prontos e cada documento só o passa ao
+    drawImage (o ReportLab inclui a imagem uma vez por documento).
+    """
+
+    def __init__(self, caminho, largura=LARGURA_LOGO, dpi=DPI_LOGO):
+        with Image.open(caminho) as original:
+            imagem = original.convert('RGBA')
+        pixels = round(largura / 72.0 * dpi)
+        if imagem.width > pixels:
+            imagem = imagem.resize((pixels, round(imagem.height * pixels / imagem.width)), Image.LANCZOS)
+        fundo = Image.new('RGB', imagem.size, 'white')
+        fundo.paste(imagem, mask=imagem.getchannel('A'))
+
+        self.imagem = ImageReader(fundo)
+        self.imagem.getRGBData()  # pixels extraídos agora, não no primeiro documento
+        self.largura = largura
+        self.altura = largura * fundo.height / fundo.width
+
+    def desenhar(self, c, x, y):
+        """Desenha o logo com o canto inferior esquerdo em (x, y)"""
+        c.drawImage(self.imagem, x, y, self.largura, self.altura)
+
+
+class LogoFlowable(Flowable):
+    """Logo centralizado no fluxo do platypus"""
+
+    def __init__(self, logo):
+        Flowable.__init__(self)
+        self.logo = logo
+        self.hAlign = 'CENTER'
+
+    def wrap(self, largura_disponivel, altura_disponivel):
+        return self.logo.largura, self.logo.altura
+
+    def draw(self):
+        self.logo.desenhar(self.canv, 0, 0)
+
+
+def carregar_logos():
+    """Logos dos documentos; os que não existirem ficam de fora (documento sem logo)"""
+    logos = {}
+    for tipo, arquivo in LOGOS_DOCUMENTOS.items():
+        caminho = os.path.join(DIRETORIO_IMAGENS, arquivo)
+        if not os.path.exists(caminho):
+            continue
+        try:
+            logos[tipo] = LogoPDF(caminho)
+        except Exception as e:
+            print(f"⚠️ Logo {arquivo} não pôde ser carregado: {e}")
+    return logos
+
+
+class ModeloPDF:
+    """Partes fixas dos documentos, montadas uma vez por processo.
+
+    Folha de estilos, ParagraphStyles, TableStyles, larguras de coluna, os
+    parágrafos de rodapé (já interpretados) e os logos são compartilhados
+    por todos os documentos; cada documento só preenche os dados em montar().
+    """
+
+    def __init__(self):
+        self.logos = carregar_logos()
+        styles = getSampleStyleSheet()
+        self.estilo_titulo = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            alignment=TA_CENTER,
+            spaceAfter=12
+        )
+        self.estilo_rodape = ParagraphStyle(
+            'Rodape',
+            parent=styles['Normal'],
+            fontSize=9,
+            alignment=TA_CENTER,
+            textColor=colors.gray
+        )
+        # Linha "Emitido em" logo após o rodapé, separada por uma linha em branco
+        self.estilo_emissao = ParagraphStyle(
+            'RodapeEmissao',
+            parent=self.estilo_rodape,
+            spaceBefore=self.estilo_rodape.leading
+        )
+        self.rodapes = {
+            'orcamento': Paragraph(RODAPE_ORCAMENTO, self.estilo_rodape),
+            'nota_fiscal': Paragraph(RODAPE_NOTA_FISCAL, self.estilo_rodape),
+        }
+
+        self.colunas_empresa = [LARGURA_UTIL / 2.0] * 2
+        self.colunas_cliente = [LARGURA_UTIL / 3.0, LARGURA_UTIL * 2 / 3.0]
+        self.colunas_itens = [LARGURA_UTIL * 0.4, LARGURA_UTIL * 0.2, LARGURA_UTIL * 0.2, LARGURA_UTIL * 0.2]
+        self.colunas_resumo = [LARGURA_UTIL / 2.0] * 2
+        self.colunas_inteira = [LARGURA_UTIL]
+
+        self.estilo_empresa = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (0, 1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ])
+        self.estilo_cliente = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_ROXA)),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f5f5f5')),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('PADDING', (0, 1), (-1, -1), 6),
+        ])
+        self.estilo_itens = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_LARANJA)),
+            ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor(COR_AZUL_ARDOSIA)),
+            ('TEXTCOLOR', (0, 0), (-1, 1), colors.white),
+            ('ALIGN', (0, 0), (-1, 1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 1), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 1), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ALIGN', (0, 2), (-1, 2), 'CENTER'),
+            ('BACKGROUND', (0, 2), (-1, 2), colors.HexColor('#f9f9f9')),
+            ('FONTSIZE', (0, 2), (-1, 2), 10),
+            ('PADDING', (0, 2), (-1, 2), 8),
+        ])
+        comandos_resumo = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_VERDE)),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
+            ('FONTSIZE', (0, 1), (-1, -1), 11),
+            ('PADDING', (0, 1), (-1, -1), 8),
+        ]
+        self.estilos_resumo = {
+            # O orçamento destaca o valor total
+            'orcamento': TableStyle(comandos_resumo + [
+                ('BACKGROUND', (1, 1), (1, 1), colors.HexColor('#f0f8ff')),
+            ]),
+            'nota_fiscal': TableStyle(comandos_resumo),
+        }
+        self.estilo_observacoes = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_CINZA)),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ALIGN', (0, 1), (-1, 1), 'LEFT'),
+            ('FONTSIZE', (0, 1), (-1, 1), 10),
+            ('PADDING', (0, 1), (-1, 1), 8),
+            ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor('#f5f5f5')),
+        ])
+        self.estilo_assinatura = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ])
+        self.cabecalho_itens = ["Produto", "Quantidade", "Valor Unitário (R$)", "Valor Total (R$)"]
+        self.recibo = ReciboCanvas(self.logos.get('nota_fiscal'))
+
+    def montar(self, layout):
+        """Gera os bytes do PDF a partir do layout (ver layout_orcamento/layout_nota_fiscal)"""
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=A4,
+                                rightMargin=MARGEM, leftMargin=MARGEM,
+                                topMargin=MARGEM, bottomMargin=MARGEM)
+        elements = []
+        if layout['tipo'] in self.logos:
+            elements += [LogoFlowable(self.logos[layout['tipo']]), Spacer(1, 12)]
+        elements += [Paragraph(layout['titulo'], self.estilo_titulo), Spacer(1, 12)]
+
+        empresa_info = [["Criatividade, Personalidade e muito Capricho!", ""],
+                        ["DTF Pricing Calculator", ""]]
+        empresa_info += [[linha, ""] for linha in layout['cabecalho']]
+        elements.append(Table(empresa_info, colWidths=self.colunas_empresa, style=self.estilo_empresa))
+        elements.append(Spacer(1, 20))
+
+        cliente_data = [["DADOS DO CLIENTE", ""]] + [list(linha) for linha in layout['cliente']]
+        elements.append(Table(cliente_data, colWidths=self.colunas_cliente, style=self.estilo_cliente))
+        elements.append(Spacer(1, 20))
+
+        items_data = [[layout['titulo_itens'], "", "", ""], self.cabecalho_itens]
+        items_data += [[nome, f"{quantidade:.0f}", formatar_moeda(unitario), formatar_moeda(total)]
+                       for nome, quantidade, unitario, total in layout['itens']]
+        elements.append(Table(items_data, colWidths=self.colunas_itens, style=self.estilo_itens))
+        elements.append(Spacer(1, 20))
+
+        resumo_data = [[layout['titulo_resumo'], ""]] + [list(linha) for linha in layout['resumo']]
+        elements.append(Table(resumo_data, colWidths=self.colunas_resumo,
+                              style=self.estilos_resumo[layout['tipo']]))
+
+        if layout.get('observacoes'):
+            elements.append(Spacer(1, 20))
+            elements.append(Table([["OBSERVAÇÕES"], [layout['observacoes']]],
+                                  colWidths=self.colunas_inteira, style=self.estilo_observacoes))
+
+        # Rodapé: parágrafo já interpretado, copiado (wrap() guarda estado na instância)
+        elements.append(Spacer(1, 30))
+        elements.append(copy.copy(self.rodapes[layout['tipo']]))
+        if layout.get('emissao'):
+            elements.append(Paragraph(f"Emitido em: {layout['emissao']}", self.estilo_emissao))
+
+        if layout.get('assinatura'):
+            elements.append(Spacer(1, 40))
+            elements.append(Table([["________________________________"], ["Assinatura do Responsável"]],
+                                  colWidths=self.colunas_inteira, style=self.estilo_assinatura))
+
+        doc.build(elements)
+        return buffer.getvalue()
+
+
+class ReciboCanvas:
+    """Recibo de uma página desenhado direto no canvas, em coordenadas fixas.
+
+    Evita o fluxo do platypus (medição de flowables, quebra de página,
+    montagem de tabelas) para o caso comum. Logo, fundos, grades, rótulos,
+    rodapé e assinatura são convertidos uma única vez em operadores PDF; cada
+    recibo só formata os textos variáveis e desloca os blocos prontos até a
+    posição da seção. desenhar() retorna None quando o conteúdo não cabe em
+    uma página (ou um texto não cabe na coluna) e o recibo deve ser montado
+    pelo ModeloPDF.
+    """
+
+    MARGEM = 36
+    ALTURA_TITULO = 20   # linhas de título das seções
+    ALTURA_LINHA = 16    # demais linhas das tabelas
+    ALTURA_EMPRESA = 14
+    ESPACO = 12          # entre seções
+    ENTRELINHA_OBS = 12
+    ENTRELINHA_RODAPE = 11
+    ALTURA_TITULO_DOCUMENTO = 22
+
+    def __init__(self, logo=None):
+        largura_pagina, altura_pagina = A4
+        self.x0 = self.MARGEM
+        self.largura = largura_pagina - 2 * self.MARGEM
+        self.x1 = self.x0 + self.largura
+        self.topo = altura_pagina - self.MARGEM
+        self.logo = logo
+        self.y_titulo = self.topo
+        if logo:
+            self.y_titulo -= logo.altura + self.ESPACO
+
+        self.colunas_cliente = [self.x0, self.x0 + self.largura * 0.25, self.x1]
+        self.colunas_itens = [self.x0] + [self.x0 + self.largura * f for f in (0.4, 0.6, 0.8)] + [self.x1]
+        self.colunas_resumo = [self.x0, self.x0 + self.largura / 2.0, self.x1]
+
+        # Posições fixas, de cima para baixo...
+        self.y_empresa = self.y_titulo - self.ALTURA_TITULO_DOCUMENTO - self.ESPACO
+        self.y_cliente = self.y_empresa - 4 * self.ALTURA_EMPRESA - self.ESPACO
+        # ... e de baixo para cima: emissão, rodapé e assinatura
+        self.linhas_rodape = RODAPE_NOTA_FISCAL.split('<br/>')
+        self.y_emissao = self.MARGEM
+        self.y_rodape = self.y_emissao + 2 * self.ENTRELINHA_RODAPE
+        self.y_assinatura = self.y_rodape + len(self.linhas_rodape) * self.ENTRELINHA_RODAPE + 2 * self.ESPACO
+        self.limite_conteudo = self.y_assinatura + 2 * self.ALTURA_EMPRESA + 2 * self.ESPACO
+
+        self.preto = self._cor(colors.black)
+        self.branco = self._cor(colors.white)
+        self.cinza = self._cor(colors.gray)
+
+        # Nomes internos das fontes (/F1, /F2): todo canvas as registra na
+        # mesma ordem (_novo_canvas), então os operadores prontos valem em todos
+        rascunho = self._novo_canvas(io.BytesIO())
+        self.fontes = {}
+        for fonte in ('Helvetica', 'Helvetica-Bold'):
+            texto = rascunho.beginText()
+            texto.setFont(fonte, 10)
+            self.fontes[fonte] = next(p for p in texto.getCode().split() if p.startswith('/'))
+
+        self._blocos_cliente = {}
+        self._blocos_resumo = {}
+        self._bloco_fixo = self._gerar_bloco_fixo()
+        self._bloco_itens = self._gerar_cabecalho_itens()
+        self._bloco_observacoes = self._gerar_cabecalho_observacoes()
+
+    @staticmethod
+    def _novo_canvas(destino):
+        c = canvas.Canvas(destino, pagesize=A4)
+        c.setFont('Helvetica', 10)
+        c.setFont('Helvetica-Bold', 10)
+        return c
+
+    # --- operadores PDF ---
+
+    @staticmethod
+    def _cor(cor):
+        return f"{cor.red:.4f} {cor.green:.4f} {cor.blue:.4f} rg"
+
+    def _faixa(self, cor, y, altura):
+        """Retângulo preenchido na largura toda, com a borda superior em y"""
+        return f"{self._cor(cor)} {self.x0:.2f} {y - altura:.2f} {self.largura:.2f} {altura:.2f} re f"
+
+    @staticmethod
+    def _grade(colunas, linhas_y):
+        """Grade de 1 pt em preto (verticais em colunas, horizontais em linhas_y)"""
+        operadores = [f"{x:.2f} {linhas_y[0]:.2f} m {x:.2f} {linhas_y[-1]:.2f} l" for x in colunas]
+        operadores += [f"{colunas[0]:.2f} {y:.2f} m {colunas[-1]:.2f} {y:.2f} l" for y in linhas_y]
+        return "0 G 1 w " + " ".join(operadores) + " S"
+
+    @staticmethod
+    def _deslocado(bloco, y):
+        return f"q 1 0 0 1 0 {y:.2f} cm\n{bloco}\nQ"
+
+    def _escrever(self, texto, x_inicio, x_fim, y, altura, alinhamento, fonte, tamanho):
+        """Operadores de um texto em uma célula cuja borda superior está em y"""
+        base = y - altura + (altura - 0.72 * tamanho) / 2.0
+        if alinhamento == 'CENTER':
+            x = (x_inicio + x_fim - stringWidth(texto, fonte, tamanho)) / 2.0
+        elif alinhamento == 'RIGHT':
+            x = x_fim - 6 - stringWidth(texto, fonte, tamanho)
+        else:
+            x = x_inicio + 6
+        # Fontes padrão do PDF usam WinAnsiEncoding (cp1252)
+        conteudo = escapePDF(texto.encode('cp1252', 'replace'))
+        return f"BT {self.fontes[fonte]} {tamanho} Tf {x:.2f} {base:.2f} Td ({conteudo}) Tj ET"
+
+    # --- blocos prontos ---
+
+    def _gerar_bloco_fixo(self):
+        """Linhas fixas da empresa, assinatura e rodapé"""
+        operadores = [self.preto]
+        y = self.y_empresa
+        for linha in ("Criatividade, Personalidade e muito Capricho!", "DTF Pricing Calculator"):
+            operadores.append(self._escrever(linha, self.x0, self.x1, y, self.ALTURA_EMPRESA,
+                                             'CENTER', 'Helvetica-Bold', 10))
+            y -= self.ALTURA_EMPRESA
+        y = self.y_assinatura + 2 * self.ALTURA_EMPRESA
+        for linha in ("________________________________", "Assinatura do Responsável"):
+            operadores.append(self._escrever(linha, self.x0, self.x1, y, self.ALTURA_EMPRESA,
+                                             'CENTER', 'Helvetica', 10))
+            y -= self.ALTURA_EMPRESA
+        operadores.append(self.cinza)
+        y = self.y_rodape + len(self.linhas_rodape) * self.ENTRELINHA_RODAPE
+        for linha in self.linhas_rodape:
+            operadores.append(self._escrever(linha, self.x0, self.x1, y, self.ENTRELINHA_RODAPE,
+                                             'CENTER', 'Helvetica', 9))
+            y -= self.ENTRELINHA_RODAPE
+        return "\n".join(operadores)
+
+    def _bloco_cliente(self, rotulos):
+        """Quadro do cliente com os rótulos (posição fixa)"""
+        if rotulos not in self._blocos_cliente:
+            y = self.y_cliente
+            altura_linhas = len(rotulos) * self.ALTURA_LINHA
+            linhas_y = [y, y - self.ALTURA_TITULO]
+            operadores = [
+                self._faixa(colors.HexColor(COR_ROXA), y, self.ALTURA_TITULO),
+                self._faixa(colors.HexColor('#f5f5f5'), y - self.ALTURA_TITULO, altura_linhas),
+                self.branco,
+                self._escrever("DADOS DO CLIENTE", self.x0, self.x1, y, self.ALTURA_TITULO,
+                               'CENTER', 'Helvetica-Bold', 12),
+                self.preto,
+            ]
+            for rotulo in rotulos:
+                operadores.append(self._escrever(rotulo, self.colunas_cliente[0], self.colunas_cliente[1],
+                                                 linhas_y[-1], self.ALTURA_LINHA, 'LEFT', 'Helvetica', 10))
+                linhas_y.append(linhas_y[-1] - self.ALTURA_LINHA)
+            operadores.append(self._grade([self.x0, self.x1], linhas_y[:2]))
+            operadores.append(self._grade(self.colunas_cliente, linhas_y[1:]))
+            self._blocos_cliente[rotulos] = "\n".join(operadores)
+        return self._blocos_cliente[rotulos]
+
+    def _gerar_cabecalho_itens(self):
+        """Faixas e cabeçalho das colunas da tabela de itens, com a borda superior em y=0"""
+        operadores = [
+            self._faixa(colors.HexColor(COR_LARANJA), 0, self.ALTURA_TITULO),
+            self._faixa(colors.HexColor(COR_AZUL_ARDOSIA), -self.ALTURA_TITULO, self.ALTURA_TITULO),
+            self.branco,
+        ]
+        for valor, x_inicio, x_fim in zip(("Produto", "Quantidade", "Valor Unitário (R$)", "Valor Total (R$)"),
+                                          self.colunas_itens, self.colunas_itens[1:]):
+            operadores.append(self._escrever(valor, x_inicio, x_fim, -self.ALTURA_TITULO, self.ALTURA_TITULO,
+                                             'CENTER', 'Helvetica-Bold', 11))
+        return "\n".join(operadores)
+
+    def _bloco_resumo(self, rotulos):
+        """Faixa de título, rótulos e grade do resumo, com a borda superior em y=0"""
+        if rotulos not in self._blocos_resumo:
+            linhas_y = [0, -self.ALTURA_TITULO]
+            operadores = [self._faixa(colors.HexColor(COR_VERDE), 0, self.ALTURA_TITULO), self.preto]
+            for rotulo in rotulos:
+                operadores.append(self._escrever(rotulo, self.colunas_resumo[0], self.colunas_resumo[1],
+                                                 linhas_y[-1], self.ALTURA_LINHA, 'LEFT', 'Helvetica', 11))
+                linhas_y.append(linhas_y[-1] - self.ALTURA_LINHA)
+            operadores.append(self._grade([self.x0, self.x1], linhas_y[:2]))
+            operadores.append(self._grade(self.colunas_resumo, linhas_y[1:]))
+            self._blocos_resumo[rotulos] = "\n".join(operadores)
+        return self._blocos_resumo[rotulos]
+
+    def _gerar_cabecalho_observacoes(self):
+        return "\n".join([
+            self._faixa(colors.HexColor(COR_CINZA), 0, self.ALTURA_TITULO),
+            self.branco,
+            self._escrever("OBSERVAÇÕES", self.x0, self.x1, 0, self.ALTURA_TITULO, 'CENTER', 'Helvetica-Bold', 11),
+        ])
+
+    # --- documento ---
+
+    def _altura(self, layout, n_itens, n_observacoes):
+        altura = (self.topo - self.y_cliente
+                  + self.ALTURA_TITULO + len(layout['cliente']) * self.ALTURA_LINHA + self.ESPACO
+                  + 2 * self.ALTURA_TITULO + n_itens * self.ALTURA_LINHA + self.ESPACO
+                  + self.ALTURA_TITULO + len(layout['resumo']) * self.ALTURA_LINHA)
+        if n_observacoes:
+            altura += self.ESPACO + self.ALTURA_TITULO + n_observacoes * self.ENTRELINHA_OBS + 6
+        return altura
+
+    def desenhar(self, layout):
+        itens = [(str(nome), f"{quantidade:.0f}", formatar_moeda(unitario), formatar_moeda(total))
+                 for nome, quantidade, unitario, total in layout['itens']]
+        observacoes = []
+        if layout.get('observacoes'):
+            observacoes = simpleSplit(str(layout['observacoes']), 'Helvetica', 10, self.largura - 12)
+        if self.topo - self._altura(layout, len(itens), len(observacoes)) < self.limite_conteudo:
+            return None
+        largura_valor = self.colunas_cliente[2] - self.colunas_cliente[1] - 12
+        if any(stringWidth(str(valor or ''), 'Helvetica', 10) > largura_valor for _, valor in layout['cliente']):
+            return None
+        larguras_itens = [x_fim - x_inicio - 12 for x_inicio, x_fim in zip(self.colunas_itens, self.colunas_itens[1:])]
+        if any(stringWidth(valor, 'Helvetica', 10) > largura
+               for linha in itens for valor, largura in zip(linha, larguras_itens)):
+            return None
+
+        escrever = self._escrever
+        operadores = [self._bloco_fixo, self.preto,
+                      escrever(layout['titulo'], self.x0, self.x1, self.y_titulo, self.ALTURA_TITULO_DOCUMENTO,
+                               'CENTER', 'Helvetica-Bold', 16)]
+        y = self.y_empresa - 2 * self.ALTURA_EMPRESA
+        for linha in layout['cabecalho'][:2]:
+            operadores.append(escrever(linha, self.x0, self.x1, y, self.ALTURA_EMPRESA, 'CENTER', 'Helvetica', 10))
+            y -= self.ALTURA_EMPRESA
+
+        # Cliente
+        operadores.append(self._bloco_cliente(tuple(rotulo for rotulo, _ in layout['cliente'])))
+        y = self.y_cliente - self.ALTURA_TITULO
+        for _, valor in layout['cliente']:
+            operadores.append(escrever(str(valor or ''), self.colunas_cliente[1], self.colunas_cliente[2], y,
+                                       self.ALTURA_LINHA, 'LEFT', 'Helvetica', 10))
+            y -= self.ALTURA_LINHA
+        y -= self.ESPACO
+
+        # Itens
+        operadores.append(self._deslocado(self._bloco_itens, y))
+        operadores.append(self.branco)
+        operadores.append(escrever(layout['titulo_itens'], self.x0, self.x1, y, self.ALTURA_TITULO,
+                                   'CENTER', 'Helvetica-Bold', 11))
+        operadores.append(self.preto)
+        linhas_y = [y, y - self.ALTURA_TITULO, y - 2 * self.ALTURA_TITULO]
+        y = linhas_y[-1]
+        for linha in itens:
+            for valor, x_inicio, x_fim, alinhamento in zip(linha, self.colunas_itens, self.colunas_itens[1:],
+                                                           ('LEFT', 'CENTER', 'RIGHT', 'RIGHT')):
+                operadores.append(escrever(valor, x_inicio, x_fim, y, self.ALTURA_LINHA,
+                                           alinhamento, 'Helvetica', 10))
+            y -= self.ALTURA_LINHA
+            linhas_y.append(y)
+        operadores.append(self._grade([self.x0, self.x1], linhas_y[:2]))
+        operadores.append(self._grade(self.colunas_itens, linhas_y[1:]))
+        y -= self.ESPACO
+
+        # Resumo
+        operadores.append(self._deslocado(self._bloco_resumo(tuple(rotulo for rotulo, _ in layout['resumo'])), y))
+        operadores.append(self.branco)
+        operadores.append(escrever(layout['titulo_resumo'], self.x0, self.x1, y, self.ALTURA_TITULO,
+                                   'CENTER', 'Helvetica-Bold', 12))
+        operadores.append(self.preto)
+        y -= self.ALTURA_TITULO
+        for _, valor in layout['resumo']:
+            operadores.append(escrever(str(valor), self.colunas_resumo[1], self.colunas_resumo[2], y,
+                                       self.ALTURA_LINHA, 'RIGHT', 'Helvetica', 11))
+            y -= self.ALTURA_LINHA
+
+        # Observações
+        if observacoes:
+            y -= self.ESPACO
+            altura_texto = len(observacoes) * self.ENTRELINHA_OBS + 6
+            operadores.append(self._deslocado(self._bloco_observacoes, y))
+            operadores.append(self._faixa(colors.HexColor('#f5f5f5'), y - self.ALTURA_TITULO, altura_texto))
+            operadores.append(self._grade([self.x0, self.x1],
+                                          [y, y - self.ALTURA_TITULO, y - self.ALTURA_TITULO - altura_texto]))
+            operadores.append(self.preto)
+            y -= self.ALTURA_TITULO
+            for linha in observacoes:
+                operadores.append(escrever(linha, self.x0, self.x1, y, self.ENTRELINHA_OBS + 3,
+                                           'LEFT', 'Helvetica', 10))
+                y -= self.ENTRELINHA_OBS
+
+        if layout.get('emissao'):
+            operadores.append(self.cinza)
+            operadores.append(escrever(f"Emitido em: {layout['emissao']}", self.x0, self.x1,
+                                       self.y_emissao + self.ENTRELINHA_RODAPE, self.ENTRELINHA_RODAPE,
+                                       'CENTER', 'Helvetica', 9))
+
+        buffer = io.BytesIO()
+        c = self._novo_canvas(buffer)
+        c.setTitle(layout['titulo'])
+        if self.logo:
+            self.logo.desenhar(c, (self.x0 + self.x1 - self.logo.largura) / 2.0, self.topo - self.logo.altura)
+        c.addLiteral("\n".join(operadores))
+        c.showPage()
+        c.save()
+        return buffer.getvalue()
+
+
+_modelo = None
+_lock_modelo = threading.Lock()
+
+
+def obter_modelo():
+    """ModeloPDF do processo (criado no primeiro uso)"""
+    global _modelo
+    if _modelo is None:
+        with _lock_modelo:
+            if _modelo is None:
+                _modelo = ModeloPDF()
+    return _modelo
+
+
+def _linhas_itens(items):
+    """(nome, quantidade, valor unitário, total) de cada item"""
+    linhas = []
+    for item in items or []:
+        quantidade = item.get('quantidade', item.get('quantity', 0))
+        unitario = item.get('valor_unitario', item.get('unit_price', 0))
+        linhas.append((item.get('nome', item.get('name', '')), quantidade, unitario,
+                       float(unitario) * float(quantidade)))
+    return linhas
+
+
+def layout_orcamento(orcamento):
+    """Dados do orçamento organizados nas seções do documento"""
+    return {
+        'tipo': 'orcamento',
+        'titulo': f"ORÇAMENTO #{orcamento.get('budget_number', orcamento.get('numero', ''))}",
+        'cabecalho': [f"Data: {orcamento.get('created_at', orcamento.get('data', ''))}"],
+        'cliente': [
+            ("Cliente:", orcamento.get('client_name', orcamento.get('cliente', ''))),
+            ("Endereço:", orcamento.get('address', orcamento.get('endereco', ''))),
+            ("Tipo de Entrega:", orcamento.get('delivery_type', orcamento.get('tipo_entrega', ''))),
+            ("Tipo de Venda:", orcamento.get('sale_type', orcamento.get('tipo_venda', ''))),
+            ("Prazo de Produção:", orcamento.get('production_deadline', orcamento.get('prazo_producao', ''))),
+        ],
+        'titulo_itens': "ITENS DO ORÇAMENTO",
+        'itens': _linhas_itens(orcamento.get('items', [])),
+        'titulo_resumo': "RESUMO DO ORÇAMENTO",
+        'resumo': [
+            ("Valor Total:", formatar_moeda(orcamento.get('total_amount', orcamento.get('valor_total', 0)))),
+        ],
+        'observacoes': orcamento.get('observacoes') or orcamento.get('notes', ''),
+        'emissao': None,
+        'assinatura': False,
+    }
+
+
+CAMPOS_CLIENTE_NOTA = ('name', 'document', 'address', 'phone', 'email')
+
+
+def dados_cliente_nota(cliente):
+    """Só os campos do cliente impressos no recibo (dicionário ou objeto Customer)"""
+    if not cliente:
+        return {campo: '' for campo in CAMPOS_CLIENTE_NOTA}
+    if isinstance(cliente, dict):
+        return {campo: cliente.get(campo) or '' for campo in CAMPOS_CLIENTE_NOTA}
+    return {campo: getattr(cliente, campo, None) or '' for campo in CAMPOS_CLIENTE_NOTA}
+
+
+def argumentos_documento(tipo, *dados):
+    """Argumentos do renderizador reduzidos ao que o documento imprime.
+
+    São eles que entram na chave do cache: campos que não aparecem no PDF
+    (ex.: a lista de pedidos do cliente) não podem gerar uma chave nova.
+    """
+    if tipo == 'nota_fiscal':
+        pedido, cliente = dados
+        return pedido, dados_cliente_nota(cliente)
+    return dados
+
+
+def _data_pedido(valor):
+    if isinstance(valor, datetime):
+        return valor
+    try:
+        return datetime.fromisoformat(valor) if valor else None
+    except (TypeError, ValueError):
+        return None
+
+
+def layout_nota_fiscal(pedido, cliente):
+    """Dados do pedido/cliente organizados nas seções do recibo.
+
+    As datas impressas vêm do próprio pedido (criação e última mudança de
+    status), não do relógio: o mesmo pedido gera sempre o mesmo documento,
+    então o PDF guardado no cache nunca mostra uma emissão desatualizada.
+    """
+    cliente = cliente or {}
+    resumo = [
+        ("Subtotal:", formatar_moeda(pedido.get('total_amount', 0))),
+        ("Status de Pagamento:", "PAGO" if pedido.get('payment_status') == 'paid' else "PENDENTE"),
+        ("Status de Entrega:", "ENTREGUE" if pedido.get('delivery_status') == 'delivered' else "EM PRODUÇÃO"),
+    ]
+    if pedido.get('payment_method'):
+        resumo.insert(2, ("Forma de Pagamento:", pedido.get('payment_method')))
+    criado = _data_pedido(pedido.get('created_at'))
+    emissao = max((d for d in (criado, _data_pedido(pedido.get('paid_at')),
+                                _data_pedido(pedido.get('delivered_at'))) if d), default=None)
+    return {
+        'tipo': 'nota_fiscal',
+        'titulo': "RECIBO / NOTA FISCAL",
+        'cabecalho': [
+            f"Data: {criado.strftime('%d/%m/%Y %H:%M') if criado else ''}",
+            f"Nº do Pedido: #{pedido.get('order_number', pedido.get('id', ''))}",
+        ],
+        'cliente': [
+            ("Cliente:", cliente.get('name', '')),
+            ("Documento:", cliente.get('document', '')),
+            ("Endereço:", cliente.get('address', '')),
+            ("Telefone:", cliente.get('phone', '')),
+            ("Email:", cliente.get('email', '')),
+            ("Tipo de Entrega:", pedido.get('delivery_type', '')),
+            ("Prazo de Entrega:", pedido.get('delivery_deadline', '')),
+        ],
+        'titulo_itens': "ITENS DO PEDIDO",
+        'itens': _linhas_itens(pedido.get('items', [])),
+        'titulo_resumo': "RESUMO DO PEDIDO",
+        'resumo': resumo,
+        'observacoes': pedido.get('notes'),
+        'emissao': emissao.strftime('%d/%m/%Y às %H:%M') if emissao else None,
+        'assinatura': True,
+    }
+
+
+def renderizar_orcamento(orcamento):
+    """Monta o PDF do orçamento (sem cache)"""
+    return obter_modelo().montar(layout_orcamento(orcamento))
+
+
+def renderizar_nota_fiscal(pedido, cliente):
+    """Monta o PDF da nota fiscal/recibo (sem cache).
+
+    Recibos que cabem em uma página são desenhados direto no canvas; os
+    demais (muitos itens, textos longos) passam pelo template paginado.
+    """
+    modelo = obter_modelo()
+    layout = layout_nota_fiscal(pedido, cliente)
+    return modelo.recibo.desenhar(layout) or modelo.montar(layout)
+
+
+def preparar_processo():
+    """Inicialização de cada processo de renderização: monta o modelo antes do primeiro pedido"""
+    obter_modelo()
+
+
+def renderizar_relatorio_mensal(assinatura):
+    """Relatório mensal de vendas (importado só quando usado: consulta o banco)"""
+    from sales_report import renderizar_relatorio_mensal as renderizar_relatorio
+    return renderizar_relatorio(assinatura)
+
+
+RENDERIZADORES = {
+    'orcamento': renderizar_orcamento,
+    'nota_fiscal': renderizar_nota_fiscal,
+    'relatorio_mensal': renderizar_relatorio_mensal,
+}
+
+
+def renderizar(tipo, *args):
+    """Ponto de entrada dos processos de renderização"""
+    return RENDERIZADORES[tipo](*args)
@@ -0,0 +1,139 @@
+"""
+Exportação em lote de orçamentos e notas fiscais em um arquivo ZIP
+
+Os registros são lidos do banco em lotes (yield_per), enviados ao pool de
+processos de PDF com uma janela limitada de documentos em andamento e
+gravados no ZIP na ordem em que ficam prontos. A memória usada depende do
+tamanho da janela, não da quantidade de documentos exportados.
+"""
+
+import time
+import zipfile
+from datetime import datetime, time as hora
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from models import Budget, Order, Customer
+from pdf_cache import cache_pdfs, chave_documento
+from pdf_documents import VERSAO_LAYOUT_PDF, CAMPOS_CLIENTE_NOTA, dados_cliente_nota, argumentos_documento
+from pdf_workers import pool_pdfs, FilaCheia, TempoEsgotado, TEMPO_LIMITE_S
+
+TAMANHO_LOTE = 200
+
+TIPOS_EXPORTACAO = {
+    'orcamento': "Orçamentos",
+    'nota_fiscal': "Notas Fiscais",
+}
+
+
+def _consulta(db, tipo, inicio=None, fim=None, status_pagamento=None, status_entrega=None):
+    if tipo == 'orcamento':
+        consulta = db.query(Budget)
+        modelo = Budget
+    else:
+        # Só as colunas do cliente impressas no recibo (sem carregar Customer.orders)
+        consulta = db.query(Order, *[getattr(Customer, campo) for campo in CAMPOS_CLIENTE_NOTA]) \
+            .join(Customer, Order.customer_id == Customer.id)
+        modelo = Order
+        if status_pagamento:
+            consulta = consulta.filter(Order.payment_status.in_(list(status_pagamento)))
+        if status_entrega:
+            consulta = consulta.filter(Order.delivery_status.in_(list(status_entrega)))
+    if inicio:
+        consulta = consulta.filter(modelo.created_at >= datetime.combine(inicio, hora.min))
+    if fim:
+        consulta = consulta.filter(modelo.created_at <= datetime.combine(fim, hora.max))
+    return consulta.order_by(modelo.id)
+
+
+def contar_documentos(db, tipo, **filtros):
+    return _consulta(db, tipo, **filtros).count()
+
+
+def listar_documentos(db, tipo, lote=TAMANHO_LOTE, **filtros):
+    """Gera (nome do arquivo, argumentos do renderizador), lendo o banco em lotes"""
+    for linha in _consulta(db, tipo, **filtros).yield_per(lote):
+        if tipo == 'orcamento':
+            orcamento = linha.to_dict()
+            yield f"Orcamento_{orcamento['budget_number']}.pdf", (orcamento,)
+        else:
+            pedido = linha[0].to_dict()
+            cliente = dados_cliente_nota(dict(zip(CAMPOS_CLIENTE_NOTA, linha[1:])))
+            yield f"Nota_Pedido_{pedido['order_number']}.pdf", (pedido, cliente)
+
+
+def exportar_zip(destino, tipo, documentos, total=None, janela=None, ao_progredir=None,
+                 pool=pool_pdfs, cache=cache_pdfs):
+    """Renderiza os documentos em paralelo e grava cada PDF no ZIP assim que fica pronto.
+
+    documentos é um iterável de (nome, argumentos), como o de listar_documentos.
+    No máximo `janela` documentos ficam em andamento ao mesmo tempo (por
+    padrão metade da fila do pool, para não bloquear quem gera PDFs pelas
+    telas). ao_progredir(concluidos, total) é chamada a cada documento.
+    Documentos que falharem são listados em ERROS.txt dentro do ZIP.
+    Retorna (documentos gravados, lista de (nome, erro)).
+    """
+    janela = janela or max(1, min(pool.trabalhadores * 2, pool.max_pendentes // 2))
+    em_andamento = {}
+    erros = []
+    gravados = 0
+    concluidos = 0
+
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_STORED) as arquivo_zip:
+        # PDFs já são comprimidos: ZIP_STORED evita recomprimir
+
+        def _gravar(nome, chave, pdf):
+            nonlocal gravados
+            arquivo_zip.writestr(nome, pdf)
+            cache.guardar(chave, pdf)
+            gravados += 1
+
+        def _recolher(bloquear):
+            nonlocal concluidos
+            if not em_andamento:
+                return
+            prontos, _ = wait(list(em_andamento), timeout=TEMPO_LIMITE_S if bloquear else 0,
+                              return_when=FIRST_COMPLETED)
+            if bloquear and not prontos:
+                raise TempoEsgotado(f"Nenhum PDF ficou pronto em {TEMPO_LIMITE_S:.0f} s")
+            for futuro in prontos:
+                nome, chave = em_andamento.pop(futuro)
+                try:
+                    _gravar(nome, chave, futuro.result())
+                except Exception as e:
+                    erros.append((nome, str(e)))
+                concluidos += 1
+                if ao_progredir:
+                    ao_progredir(concluidos, total)
+
+        for nome, argumentos in documentos:
+            argumentos = argumentos_documento(tipo, *argumentos)
+            chave = chave_documento(tipo, VERSAO_LAYOUT_PDF, *argumentos)
+            pdf = cache.obter(chave)
+            if pdf is not None:
+                _gravar(nome, chave, pdf)
+                concluidos += 1
+                if ao_progredir:
+                    ao_progredir(concluidos, total)
+                continue
+
+            while len(em_andamento) >= janela:
+                _recolher(bloquear=True)
+            while True:
+                try:
+                    em_andamento[pool.enviar(tipo, *argumentos)] = (nome, chave)
+                    break
+                except FilaCheia:
+                    # Fila ocupada por outras sessões: espera um dos nossos (ou um instante)
+                    if em_andamento:
+                        _recolher(bloquear=True)
+                    else:
+                        time.sleep(0.2)
+            _recolher(bloquear=False)
+
+        while em_andamento:
+            _recolher(bloquear=True)
+
+        if erros:
+            arquivo_zip.writestr("ERROS.txt", "\n".join(f"{nome}: {erro}" for nome, erro in erros))
+
+    return gravados, erros
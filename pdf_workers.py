@@ -0,0 +1,199 @@
+"""
+Renderização de PDFs em um pool de processos
+
+O doc.build() do ReportLab é CPU-bound e segura o GIL; rodando no thread do
+script ele trava as outras sessões do mesmo processo. Aqui os documentos são
+montados em processos separados (um por núcleo, até o limite configurado),
+com fila limitada: se houver pedidos demais pendentes, o envio é recusado
+na hora (FilaCheia) em vez de acumular trabalho sem fim.
+"""
+
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import pdf_documents
+from pdf_cache import cache_pdfs, chave_documento
+
+TRABALHADORES = int(os.getenv("PDF_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+MAX_PENDENTES = int(os.getenv("PDF_MAX_PENDING", "0")) or TRABALHADORES * 4
+TEMPO_LIMITE_S = float(os.getenv("PDF_TIMEOUT", "30"))
+
+
+class FilaCheia(Exception):
+    """Há PDFs demais aguardando renderização"""
+
+
+class TempoEsgotado(Exception):
+    """O PDF não ficou pronto dentro do tempo limite"""
+
+
+class PoolPDF:
+    """Pool de processos com fila limitada para gerar PDFs"""
+
+    def __init__(self, trabalhadores=TRABALHADORES, max_pendentes=MAX_PENDENTES):
+        self.trabalhadores = trabalhadores
+        self.max_pendentes = max_pendentes
+        self._executor = None
+        self._lock = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(max_pendentes)
+        self.pendentes = 0
+        self.concluidos = 0
+        self.recusados = 0
+        self.duracao_media = 1.0  # segundos (média móvel, usada na barra de progresso)
+
+    def _obter_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: os processos não herdam threads/conexões do servidor
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.trabalhadores,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=pdf_documents.preparar_processo
+                )
+            return self._executor
+
+    def _reiniciar(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _liberar(self):
+        with self._lock:
+            self.pendentes -= 1
+        self._vagas.release()
+
+    def _concluir(self, futuro, inicio):
+        with self._lock:
+            self.concluidos += 1
+            if not futuro.cancelled() and futuro.exception() is None:
+                self.duracao_media = 0.8 * self.duracao_media + 0.2 * (time.monotonic() - inicio)
+        self._liberar()
+
+    def enviar(self, tipo, *args):
+        """Coloca o documento na fila e retorna o Future com os bytes do PDF"""
+        if not self._vagas.acquire(blocking=False):
+            with self._lock:
+                self.recusados += 1
+            raise FilaCheia("Muitos PDFs sendo gerados no momento. Tente novamente em instantes.")
+        with self._lock:
+            self.pendentes += 1
+        try:
+            futuro = self._obter_executor().submit(pdf_documents.renderizar, tipo, *args)
+        except BrokenProcessPool:
+            # Um processo morreu (ex.: falta de memória): recria o pool e tenta uma vez
+            self._reiniciar()
+            try:
+                futuro = self._obter_executor().submit(pdf_documents.renderizar, tipo, *args)
+            except Exception:
+                self._liberar()
+                raise
+        except Exception:
+            self._liberar()
+            raise
+        inicio = time.monotonic()
+        futuro.add_done_callback(lambda f: self._concluir(f, inicio))
+        return futuro
+
+    def aguardar(self, futuro, tempo_limite=TEMPO_LIMITE_S, ao_progredir=None, intervalo=0.1):
+        """Espera o resultado sem segurar o GIL, informando o andamento.
+
+        ao_progredir(fracao, etapa) recebe uma estimativa de 0 a 1 (pela
+        duração média dos últimos PDFs) e a etapa: 'fila', 'gerando' ou
+        'pronto'. Passado o tempo limite, o Future é cancelado (se ainda
+        estiver na fila) e TempoEsgotado é levantada.
+        """
+        inicio = time.monotonic()
+        while True:
+            try:
+                resultado = futuro.result(timeout=intervalo)
+                if ao_progredir:
+                    ao_progredir(1.0, 'pronto')
+                return resultado
+            except FuturesTimeoutError:
+                decorrido = time.monotonic() - inicio
+                if decorrido >= tempo_limite:
+                    futuro.cancel()
+                    raise TempoEsgotado(f"PDF não ficou pronto em {tempo_limite:.0f} s")
+                if ao_progredir:
+                    ao_progredir(min(0.95, decorrido / (2 * self.duracao_media)),
+                                 'gerando' if futuro.running() else 'fila')
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'trabalhadores': self.trabalhadores,
+                'pendentes': self.pendentes,
+                'concluidos': self.concluidos,
+                'recusados': self.recusados,
+                'duracao_media': self.duracao_media,
+            }
+
+
+class PreRenderizador:
+    """Gera em segundo plano o PDF de um documento recém-salvo e o guarda no cache.
+
+    Quando o usuário pedir o PDF, ele já está pronto (ou em geração: quem
+    pedir aguarda o mesmo Future em vez de enviar outro).
+    """
+
+    def __init__(self, pool, cache):
+        self.pool = pool
+        self.cache = cache
+        self._em_andamento = {}
+        self._lock = threading.Lock()
+
+    def agendar(self, tipo, *args):
+        """Envia o documento ao pool se ainda não estiver pronto nem em geração.
+
+        A chave é reservada sob o lock antes do envio: dois pedidos do mesmo
+        documento ao mesmo tempo geram um só PDF. Com a fila cheia (ou
+        qualquer falha do pool) o documento simplesmente não é antecipado:
+        será gerado quando pedido. Nunca levanta exceção, então pode ser
+        chamado logo depois de um commit. Retorna a chave do documento no
+        cache.
+        """
+        args = pdf_documents.argumentos_documento(tipo, *args)
+        chave = chave_documento(tipo, pdf_documents.VERSAO_LAYOUT_PDF, *args)
+        with self._lock:
+            if chave in self._em_andamento:
+                return chave
+            self._em_andamento[chave] = None  # reservada; o Future entra depois do envio
+        try:
+            if self.cache.obter(chave) is not None:
+                futuro = None
+            else:
+                futuro = self.pool.enviar(tipo, *args)
+        except FilaCheia:
+            futuro = None
+        except Exception as e:
+            print(f"⚠️ PDF não antecipado ({tipo}): {e}")
+            futuro = None
+        with self._lock:
+            if futuro is None:
+                self._em_andamento.pop(chave, None)
+                return chave
+            self._em_andamento[chave] = futuro
+        futuro.add_done_callback(lambda f: self._concluir(chave, f))
+        return chave
+
+    def _concluir(self, chave, futuro):
+        # Guarda antes de sair da lista: quem chegar no meio encontra um dos dois
+        if not futuro.cancelled() and futuro.exception() is None:
+            self.cache.guardar(chave, futuro.result())
+        with self._lock:
+            self._em_andamento.pop(chave, None)
+
+    def em_andamento(self, chave):
+        """Future do documento se ele estiver sendo gerado agora"""
+        with self._lock:
+            return self._em_andamento.get(chave)
+
+
+# Instâncias únicas por processo do servidor (compartilhadas entre as sessões)
+pool_pdfs = PoolPDF()
+pre_renderizador = PreRenderizador(pool_pdfs, cache_pdfs)
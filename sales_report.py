@@ -0,0 +1,273 @@
+"""
+Relatório mensal de vendas (PDF)
+
+Os totais por dia, cliente, forma de pagamento e produto saem de
+agregações SQL (GROUP BY) sobre os pedidos do mês e seus itens
+(order_items). O documento é montado com flowables gerados sob demanda:
+cada seção produz pequenas tabelas de LINHAS_POR_TABELA linhas a partir de
+consultas com yield_per, e o platypus desenha e descarta uma página de cada
+vez. Nem as linhas do banco nem os flowables do mês inteiro ficam em memória.
+"""
+
+import io
+import itertools
+from datetime import date, datetime
+
+from sqlalchemy import func
+
+from models import SessionLocal, Order, OrderItem, Customer
+from pdf_documents import (
+    A4, colors, Paragraph, Spacer, Table, TableStyle, SimpleDocTemplate,
+    obter_modelo, formatar_moeda, COR_ROXA, COR_AZUL_ARDOSIA, MARGEM, LARGURA_UTIL
+)
+
+LINHAS_POR_TABELA = 40
+TAMANHO_LOTE = 1000
+
+NOMES_MESES = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho",
+               "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+
+
+class FluxoFlowables(list):
+    """Lista de flowables abastecida sob demanda por um gerador.
+
+    O doc.build() do platypus consome a lista pelo início (del flowables[0])
+    e consulta len() a cada passo; aqui len() repõe a folga a partir do
+    gerador, então só alguns flowables existem ao mesmo tempo.
+    """
+
+    def __init__(self, gerador, folga=16):
+        super().__init__()
+        self._gerador = iter(gerador)
+        self._folga = folga
+
+    def __len__(self):
+        if self._gerador is not None and list.__len__(self) < self._folga:
+            lote = list(itertools.islice(self._gerador, self._folga))
+            if lote:
+                self.extend(lote)
+            else:
+                self._gerador = None
+        return list.__len__(self)
+
+
+def periodo_mes(ano, mes):
+    inicio = datetime(ano, mes, 1)
+    fim = datetime(ano + 1, 1, 1) if mes == 12 else datetime(ano, mes + 1, 1)
+    return inicio, fim
+
+
+def _pedidos_do_mes(consulta, ano, mes):
+    inicio, fim = periodo_mes(ano, mes)
+    return consulta.filter(Order.created_at >= inicio, Order.created_at < fim)
+
+
+def assinatura_mes(db, ano, mes):
+    """Identifica o conteúdo do mês (muda quando algum pedido muda): usada na chave do cache"""
+    linha = _pedidos_do_mes(db.query(
+        func.count(Order.id), func.sum(Order.total_amount), func.max(Order.updated_at)
+    ), ano, mes).one()
+    inicio, fim = periodo_mes(ano, mes)
+    itens = db.query(func.count(OrderItem.id)).filter(
+        OrderItem.created_at >= inicio, OrderItem.created_at < fim
+    ).scalar()
+    return {
+        'ano': ano,
+        'mes': mes,
+        'pedidos': linha[0] or 0,
+        'itens': itens or 0,
+        'total': float(linha[1] or 0),
+        'atualizado': linha[2].isoformat() if linha[2] else None,
+    }
+
+
+def resumo_mes(db, ano, mes):
+    linha = _pedidos_do_mes(db.query(
+        func.count(Order.id),
+        func.sum(Order.total_amount),
+        func.count(func.distinct(Order.customer_id)),
+    ), ano, mes).one()
+    pagos = _pedidos_do_mes(db.query(func.count(Order.id), func.sum(Order.total_amount)), ano, mes).filter(
+        Order.payment_status == 'paid'
+    ).one()
+    pedidos = linha[0] or 0
+    total = float(linha[1] or 0)
+    return {
+        'pedidos': pedidos,
+        'total': total,
+        'clientes': linha[2] or 0,
+        'ticket_medio': total / pedidos if pedidos else 0.0,
+        'pedidos_pagos': pagos[0] or 0,
+        'total_pago': float(pagos[1] or 0),
+    }
+
+
+def totais_por_dia(db, ano, mes):
+    dia = func.date(Order.created_at)
+    consulta = _pedidos_do_mes(db.query(dia, func.count(Order.id), func.sum(Order.total_amount)), ano, mes)
+    for data, pedidos, total in consulta.group_by(dia).order_by(dia).yield_per(TAMANHO_LOTE):
+        if isinstance(data, str):  # SQLite devolve a data como texto
+            data = date.fromisoformat(data)
+        yield data, pedidos, float(total or 0)
+
+
+def totais_por_pagamento(db, ano, mes):
+    forma = func.coalesce(Order.payment_method, '')
+    consulta = _pedidos_do_mes(db.query(forma, func.count(Order.id), func.sum(Order.total_amount)), ano, mes)
+    for metodo, pedidos, total in consulta.group_by(forma).order_by(func.sum(Order.total_amount).desc()):
+        yield metodo or "Não informado", pedidos, float(total or 0)
+
+
+def totais_por_cliente(db, ano, mes):
+    consulta = _pedidos_do_mes(
+        db.query(Customer.name, func.count(Order.id), func.sum(Order.total_amount))
+        .join(Customer, Order.customer_id == Customer.id),
+        ano, mes
+    )
+    consulta = consulta.group_by(Customer.id, Customer.name).order_by(func.sum(Order.total_amount).desc())
+    for nome, pedidos, total in consulta.yield_per(TAMANHO_LOTE):
+        yield nome, pedidos, float(total or 0)
+
+
+def totais_por_produto(db, ano, mes):
+    """Quantidade e faturamento por produto (GROUP BY em order_items, pelo índice de data)"""
+    inicio, fim = periodo_mes(ano, mes)
+    faturamento = func.sum(OrderItem.total)
+    consulta = db.query(OrderItem.product_name, func.sum(OrderItem.quantity), faturamento).filter(
+        OrderItem.created_at >= inicio, OrderItem.created_at < fim
+    ).group_by(OrderItem.product_name).order_by(faturamento.desc())
+    for nome, quantidade, total in consulta:
+        yield nome, float(quantidade or 0), float(total or 0)
+
+
+def pedidos_do_mes(db, ano, mes):
+    consulta = _pedidos_do_mes(
+        db.query(Order.order_number, Order.created_at, Customer.name, Order.payment_method,
+                 Order.payment_status, Order.total_amount)
+        .join(Customer, Order.customer_id == Customer.id),
+        ano, mes
+    )
+    for numero, criado, cliente, metodo, status, total in consulta.order_by(Order.created_at).yield_per(TAMANHO_LOTE):
+        yield numero, criado, cliente, metodo, status, float(total or 0)
+
+
+class _EstilosRelatorio:
+    """TableStyles do relatório (montados uma vez por processo)"""
+
+    def __init__(self):
+        self.tabela = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COR_AZUL_ARDOSIA)),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f5f5f5')]),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#cccccc')),
+            ('TOPPADDING', (0, 0), (-1, -1), 2),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+        ])
+        self.resumo = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f5f5f5')),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ])
+        modelo = obter_modelo()
+        self.titulo = modelo.estilo_titulo
+        self.secao = modelo.estilo_titulo.clone('SecaoRelatorio', fontSize=12, leading=16,
+                                                 textColor=colors.HexColor(COR_ROXA), spaceBefore=12,
+                                                 spaceAfter=6)
+
+
+_estilos = None
+
+
+def _obter_estilos():
+    global _estilos
+    if _estilos is None:
+        _estilos = _EstilosRelatorio()
+    return _estilos
+
+
+def _secao(titulo, cabecalho, linhas, proporcoes):
+    """Título da seção e tabelas de até LINHAS_POR_TABELA linhas, geradas sob demanda"""
+    estilos = _obter_estilos()
+    larguras = [LARGURA_UTIL * p for p in proporcoes]
+    yield Paragraph(titulo, estilos.secao)
+    linhas = iter(linhas)
+    vazia = True
+    while True:
+        bloco = list(itertools.islice(linhas, LINHAS_POR_TABELA))
+        if not bloco:
+            break
+        vazia = False
+        yield Table([cabecalho] + bloco, colWidths=larguras, style=estilos.tabela, repeatRows=1)
+    if vazia:
+        yield Paragraph("Sem movimento no período.", obter_modelo().estilo_rodape)
+
+
+def _flowables(db, ano, mes):
+    estilos = _obter_estilos()
+    resumo = resumo_mes(db, ano, mes)
+    yield Paragraph(f"RELATÓRIO DE VENDAS - {NOMES_MESES[mes - 1].upper()}/{ano}", estilos.titulo)
+    yield Table([
+        ["Pedidos", f"{resumo['pedidos']}"],
+        ["Faturamento", formatar_moeda(resumo['total'])],
+        ["Ticket Médio", formatar_moeda(resumo['ticket_medio'])],
+        ["Clientes Atendidos", f"{resumo['clientes']}"],
+        ["Pedidos Pagos", f"{resumo['pedidos_pagos']} ({formatar_moeda(resumo['total_pago'])})"],
+    ], colWidths=[LARGURA_UTIL / 2.0] * 2, style=estilos.resumo)
+    yield Spacer(1, 12)
+
+    yield from _secao(
+        "Vendas por Dia", ["Data", "Pedidos", "Faturamento"],
+        ([d.strftime('%d/%m/%Y'), f"{p}", formatar_moeda(t)] for d, p, t in totais_por_dia(db, ano, mes)),
+        (0.4, 0.2, 0.4)
+    )
+    yield from _secao(
+        "Vendas por Forma de Pagamento", ["Forma de Pagamento", "Pedidos", "Faturamento"],
+        ([m, f"{p}", formatar_moeda(t)] for m, p, t in totais_por_pagamento(db, ano, mes)),
+        (0.4, 0.2, 0.4)
+    )
+    yield from _secao(
+        "Vendas por Produto", ["Produto", "Quantidade", "Faturamento"],
+        ([n[:60], f"{q:.0f}", formatar_moeda(t)] for n, q, t in totais_por_produto(db, ano, mes)),
+        (0.5, 0.2, 0.3)
+    )
+    yield from _secao(
+        "Vendas por Cliente", ["Cliente", "Pedidos", "Faturamento"],
+        ([(n or '')[:50], f"{p}", formatar_moeda(t)] for n, p, t in totais_por_cliente(db, ano, mes)),
+        (0.5, 0.2, 0.3)
+    )
+    yield from _secao(
+        "Pedidos do Mês", ["Nº", "Data", "Cliente", "Pagamento", "Status", "Total"],
+        ([f"#{n}", c.strftime('%d/%m %H:%M') if c else '', (cl or '')[:30], (m or '')[:18],
+          "Pago" if s == 'paid' else "Pendente", formatar_moeda(t)]
+         for n, c, cl, m, s, t in pedidos_do_mes(db, ano, mes)),
+        (0.1, 0.14, 0.3, 0.18, 0.12, 0.16)
+    )
+
+
+def _numerar_pagina(canvas, doc):
+    canvas.saveState()
+    canvas.setFont('Helvetica', 8)
+    canvas.setFillColor(colors.gray)
+    canvas.drawRightString(A4[0] - MARGEM, MARGEM / 2.0, f"Página {doc.page}")
+    canvas.restoreState()
+
+
+def renderizar_relatorio_mensal(assinatura):
+    """Monta o PDF do mês indicado na assinatura (ver assinatura_mes)"""
+    db = SessionLocal()
+    try:
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=A4,
+                                rightMargin=MARGEM, leftMargin=MARGEM,
+                                topMargin=MARGEM, bottomMargin=MARGEM,
+                                title=f"Relatório de Vendas {assinatura['mes']:02d}/{assinatura['ano']}")
+        doc.build(FluxoFlowables(_flowables(db, assinatura['ano'], assinatura['mes'])),
+                  onFirstPage=_numerar_pagina, onLaterPages=_numerar_pagina)
+        return buffer.getvalue()
+    finally:
+        db.close()
@@ -0,0 +1,243 @@
+"""
+Migrações versionadas do esquema do banco
+
+Cada migração tem um número de versão e roda uma única vez; as aplicadas
+ficam registradas em schema_migrations. migrar() leva qualquer banco
+(novo, criado pelo create_all antigo ou já migrado) até a última versão:
+
+    python schema_migrations.py            aplica as pendentes
+    python schema_migrations.py --status   mostra as versões
+
+Índices são criados aqui, e não no init_db. No PostgreSQL usam CREATE INDEX
+CONCURRENTLY (fora de transação), que não trava gravações nas tabelas; um
+índice que ficou inválido por uma tentativa interrompida é recriado. Uma
+trava consultiva (pg_advisory_lock) impede que dois processos migrem ao
+mesmo tempo.
+
+Migrações já publicadas não devem ser alteradas: mudanças novas entram como
+uma nova versão no fim de MIGRACOES.
+"""
+
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, select, text
+
+from models import engine, Base
+
+CHAVE_TRAVA = 830417  # identificador da trava consultiva (pg_advisory_lock) das migrações
+
+metadados = MetaData()
+versoes = Table(
+    'schema_migrations', metadados,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def _postgres():
+    return engine.dialect.name == 'postgresql'
+
+
+def criar_indice(nome, tabela, colunas, unico=False, onde=None, metodo=None):
+    """CREATE INDEX idempotente (CONCURRENTLY no PostgreSQL)
+
+    colunas é o trecho entre parênteses (colunas ou expressões, ex.:
+    "payment_status, created_at" ou "lower(email)"); onde, a condição de um
+    índice parcial.
+    """
+    unique = 'UNIQUE ' if unico else ''
+    using = f" USING {metodo}" if metodo else ''
+    where = f" WHERE {onde}" if onde else ''
+    if not _postgres():
+        with engine.begin() as conexao:
+            conexao.execute(text(f"CREATE {unique}INDEX IF NOT EXISTS {nome} ON {tabela}{using} ({colunas}){where}"))
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conexao:
+        conexao.execute(text("SET statement_timeout = 0"))  # índices grandes passam do limite do app
+        try:
+            invalido = conexao.execute(text(
+                "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :nome"
+            ), {'nome': nome}).scalar()
+            if invalido:
+                conexao.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}"))
+            conexao.execute(text(
+                f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {nome} ON {tabela}{using} ({colunas}){where}"
+            ))
+        finally:
+            # A conexão volta para o pool do app: limite de volta ao da conexão (DB_STATEMENT_TIMEOUT_MS)
+            conexao.execute(text("RESET statement_timeout"))
+
+
+# --- MIGRAÇÕES ---
+
+def _tabelas_base():
+    # create_all só cria o que falta; bancos antigos já têm as tabelas e as restrições UNIQUE
+    Base.metadata.create_all(bind=engine)
+
+
+def _itens_json():
+    from items_migration import migrar_itens
+    for tabela, corrigidos in migrar_itens().items():
+        if corrigidos:
+            print(f"🧾 {corrigidos} registro(s) de {tabela} com itens convertidos de texto para JSON")
+
+
+def _itens_normalizados():
+    from models import SessionLocal
+    from line_items import preencher_itens, TABELAS
+    db = SessionLocal()
+    try:
+        for tipo in TABELAS:
+            preenchidos = preencher_itens(db, tipo)
+            if preenchidos:
+                print(f"🧾 Itens de {preenchidos} registro(s) ({tipo}) copiados para as tabelas de itens")
+    finally:
+        db.close()
+
+
+INDICES_DESEMPENHO = [
+    ('idx_products_user_id', 'products', 'user_id'),
+    ('idx_customers_name', 'customers', 'name'),
+    ('idx_customers_user_id', 'customers', 'user_id'),
+    ('idx_suppliers_user_id', 'suppliers', 'user_id'),
+    ('idx_orders_customer_id', 'orders', 'customer_id'),
+    ('idx_orders_user_id', 'orders', 'user_id'),
+    ('idx_orders_payment_status', 'orders', 'payment_status'),
+    ('idx_orders_created_at', 'orders', 'created_at'),
+    ('idx_budgets_user_id', 'budgets', 'user_id'),
+    ('idx_budgets_created_at', 'budgets', 'created_at'),
+    ('idx_artworks_user_id', 'artworks', 'user_id'),
+    ('idx_film_consumption_user_id', 'film_consumption', 'user_id'),
+]
+
+
+def _indices_desempenho():
+    for nome, tabela, colunas in INDICES_DESEMPENHO:
+        criar_indice(nome, tabela, colunas)
+    if _postgres():
+        # Consultas de contenção nos itens (items @> '[{"nome": ...}]')
+        for tabela in ('orders', 'budgets'):
+            criar_indice(f"ix_{tabela}_items_gin", tabela, 'items jsonb_path_ops', metodo='gin')
+
+
+INDICES_SEM_CAIXA = [
+    ('uq_users_username_lower', 'users', 'username'),
+    ('uq_users_email_lower', 'users', 'email'),
+    ('uq_products_name_lower', 'products', 'name'),
+]
+
+
+def _indices_sem_caixa():
+    """Índices em lower() para login, cadastro e busca de produto por igualdade
+
+    Ficam UNIQUE (ninguém consegue cadastrar "Admin" ao lado de "admin");
+    se o banco já tiver valores repetidos com caixa diferente, o índice é
+    criado sem UNIQUE para não falhar a migração e os repetidos são listados.
+    """
+    for nome, tabela, coluna in INDICES_SEM_CAIXA:
+        with engine.connect() as conexao:
+            repetidos = conexao.execute(text(
+                f"SELECT lower({coluna}) FROM {tabela} GROUP BY lower({coluna}) HAVING count(*) > 1"
+            )).scalars().all()
+        if repetidos:
+            print(f"⚠️ {tabela}.{coluna} tem valores repetidos (sem diferenciar maiúsculas): "
+                  f"{', '.join(repetidos)}; índice {nome} criado sem UNIQUE")
+        criar_indice(nome, tabela, f"lower({coluna})", unico=not repetidos)
+
+
+def remover_indice(nome):
+    """DROP INDEX idempotente (CONCURRENTLY no PostgreSQL)"""
+    if not _postgres():
+        with engine.begin() as conexao:
+            conexao.execute(text(f"DROP INDEX IF EXISTS {nome}"))
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conexao:
+        conexao.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}"))
+
+
+def _indices_pedidos():
+    """Índices compostos/parciais das consultas de order_queries (painel, produção, filtros)"""
+    criar_indice('ix_orders_unpaid_created', 'orders', 'created_at', onde="payment_status <> 'paid'")
+    criar_indice('ix_orders_production_queue', 'orders', 'created_at',
+                 onde="payment_status = 'paid' AND delivery_status <> 'delivered'")
+    criar_indice('ix_orders_customer_created', 'orders', 'customer_id, created_at DESC')
+    criar_indice('ix_orders_status_created', 'orders', 'payment_status, delivery_status, created_at DESC')
+    # Prefixos dos compostos acima: só custavam escrita
+    remover_indice('idx_orders_customer_id')
+    remover_indice('idx_orders_payment_status')
+
+
+MIGRACOES = [
+    (1, 'Tabelas base', _tabelas_base),
+    (2, 'Itens de pedidos e orçamentos em JSON nativo (JSONB no PostgreSQL)', _itens_json),
+    (3, 'Itens normalizados em order_items/budget_items', _itens_normalizados),
+    (4, 'Índices de desempenho', _indices_desempenho),
+    (5, 'Índices em lower() de usuário, email e nome de produto', _indices_sem_caixa),
+    (6, 'Índices compostos e parciais de pedidos', _indices_pedidos),
+]
+
+VERSAO_ESQUEMA = MIGRACOES[-1][0]
+
+
+# --- EXECUÇÃO ---
+
+@contextmanager
+def _trava():
+    """Um processo migrando por vez (no PostgreSQL; no SQLite o próprio arquivo serializa)"""
+    if not _postgres():
+        yield
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conexao:
+        conexao.execute(text("SELECT pg_advisory_lock(:chave)"), {'chave': CHAVE_TRAVA})
+        try:
+            yield
+        finally:
+            conexao.execute(text("SELECT pg_advisory_unlock(:chave)"), {'chave': CHAVE_TRAVA})
+
+
+def aplicadas():
+    """{versão: data de aplicação} das migrações já registradas"""
+    metadados.create_all(bind=engine)
+    with engine.connect() as conexao:
+        return dict(conexao.execute(select(versoes.c.version, versoes.c.applied_at)).all())
+
+
+def pendentes():
+    feitas = aplicadas()
+    return [(versao, descricao) for versao, descricao, _ in MIGRACOES if versao not in feitas]
+
+
+def migrar():
+    """Aplica as migrações pendentes em ordem; retorna as versões aplicadas"""
+    if not pendentes():
+        return []
+    aplicadas_agora = []
+    with _trava():
+        feitas = aplicadas()  # outro processo pode ter migrado enquanto esperávamos a trava
+        for versao, descricao, funcao in MIGRACOES:
+            if versao in feitas:
+                continue
+            print(f"🔄 Migração {versao}: {descricao}...")
+            funcao()
+            with engine.begin() as conexao:
+                conexao.execute(versoes.insert().values(
+                    version=versao, description=descricao, applied_at=datetime.now()
+                ))
+            aplicadas_agora.append(versao)
+    if aplicadas_agora:
+        print(f"✅ Esquema na versão {VERSAO_ESQUEMA}")
+    return aplicadas_agora
+
+
+if __name__ == "__main__":
+    if '--status' in sys.argv[1:]:
+        feitas = aplicadas()
+        for versao, descricao, _ in MIGRACOES:
+            situacao = feitas[versao].strftime('%d/%m/%Y %H:%M') if versao in feitas else 'pendente'
+            print(f"{versao:>4}  {situacao:<16}  {descricao}")
+    elif not migrar():
+        print(f"✅ Esquema já está na versão {VERSAO_ESQUEMA}")
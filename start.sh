@@ -14,6 +14,7 @@ echo "✅ Banco de dados configurado"
 
 # Executar migrações do banco de dados
 echo "🔄 Executando migrações do banco de dados..."
+python schema_migrations.py || exit 1
 python -c "
 from models import init_db
 init_db()
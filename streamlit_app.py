@@ -10,9 +10,12 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-import tempfile
+import io
+import uuid
 import base64
 
+from artifact_store import armazem_artefatos
+
 # Configuração da Página
 st.set_page_config(
     page_title="DTF Pricing Calculator",
@@ -765,13 +768,9 @@ def mostrar_settings():
 def gerar_pdf(orcamento):
     """Gera PDF para um orçamento"""
     try:
-        # Criar arquivo temporário
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        pdf_path = temp_file.name
-        temp_file.close()
-        
-        # Criar documento
-        doc = SimpleDocTemplate(pdf_path, pagesize=A4, 
+        # Criar documento em memória (o arquivo vai para o armazém de gerados)
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=A4, 
                                rightMargin=72, leftMargin=72,
                                topMargin=72, bottomMargin=72)
         
@@ -949,7 +948,7 @@ def gerar_pdf(orcamento):
         
         # Construir PDF
         doc.build(elements)
-        return pdf_path
+        return armazem_artefatos.guardar('orcamentos', f"{uuid.uuid4().hex}.pdf", buffer.getvalue())
         
     except Exception as e:
         st.error(f"Error generating PDF: {str(e)}")
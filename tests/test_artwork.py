@@ -0,0 +1,48 @@
+"""
+Análise de artes grandes (artwork.abrir_reduzida)
+
+PNG não tem decodificação em escala reduzida: a arte de 10.000 x 10.000 px
+precisa ser aceita e voltar reduzida ao lado máximo da análise.
+"""
+
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import artwork  # noqa: E402
+
+
+def _png(modo, lado, cor):
+    imagem = Image.new(modo, (lado, lado), 0)
+    imagem.paste(cor, (lado // 4, lado // 4, lado * 3 // 4, lado * 3 // 4))
+    buffer = io.BytesIO()
+    imagem.save(buffer, 'PNG', compress_level=1, **({'transparency': 0} if modo == 'P' else {}))
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('modo, cor', [('RGBA', (200, 30, 30, 255)), ('P', 1)])
+def test_png_10000_px_reduzido(modo, cor):
+    imagem, tamanho, _ = artwork.abrir_reduzida(_png(modo, 10000, cor))
+    assert tamanho == (10000, 10000)
+    assert max(imagem.size) <= artwork.LADO_MAX_ANALISE
+    assert imagem.size == (2000, 2000)
+    assert imagem.mode == 'RGBA'
+    # Faixas reduzidas no lugar certo: o quadrado opaco continua centralizado
+    assert imagem.getchannel('A').getbbox() == (500, 500, 1500, 1500)
+
+
+def test_area_impressao_de_png_grande():
+    area = artwork.detectar_area_impressao(_png('RGBA', 10000, (0, 0, 0, 255)))
+    assert not area['vazia']
+    assert area['bbox'] == (2500, 2500, 7500, 7500)
+
+
+def test_acima_do_limite_recusada(monkeypatch):
+    monkeypatch.setattr(artwork, 'LIMITE_PIXELS', 100 * 100 - 1)
+    with pytest.raises(ValueError):
+        artwork.abrir_reduzida(_png('RGBA', 100, (0, 0, 0, 255)))
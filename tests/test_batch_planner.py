@@ -0,0 +1,54 @@
+"""
+Plano de corridas (batch_planner): remoção de pedidos e prazo padrão
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_planner import PlanoImpressao, calcular_prazo_limite  # noqa: E402
+
+
+def _pedido(pedido_id, largura, altura, quantidade=1, criado='2026-10-19T10:00:00'):
+    return {
+        'id': pedido_id,
+        'order_number': f"{pedido_id:04d}",
+        'created_at': criado,
+        'items': [{'nome': 'Camiseta', 'quantidade': quantidade,
+                   'detalhes': {'dimensoes': {'frente_largura': largura, 'frente_altura': altura}}}],
+    }
+
+
+def test_remover_pedido_libera_o_espaco_da_corrida():
+    plano = PlanoImpressao(largura_rolo=50, comprimento_corrida=1000, espacamento=1)
+    pedidos = [_pedido(1, 40, 30), _pedido(2, 20, 10, quantidade=2), _pedido(3, 40, 30)]
+    plano.sincronizar(pedidos)
+    comprimento_antes = plano.resumo()['comprimento_total']
+
+    plano.sincronizar([pedidos[1], pedidos[2]])
+    depois = plano.resumo()
+    assert depois['comprimento_total'] < comprimento_antes
+    (folha,) = plano.folhas()
+    assert min(p['y'] for p in folha['posicoes']) == 0
+    # Nenhuma sobreposição depois do reencaixe
+    posicoes = folha['posicoes']
+    for i, a in enumerate(posicoes):
+        for b in posicoes[i + 1:]:
+            assert (a['x'] + a['largura'] <= b['x'] or b['x'] + b['largura'] <= a['x']
+                    or a['y'] + a['altura'] <= b['y'] or b['y'] + b['altura'] <= a['y'])
+
+    # Remover e adicionar de novo volta ao mesmo comprimento (nada de espaço perdido)
+    plano.sincronizar([pedidos[2]])
+    plano.sincronizar(pedidos)
+    assert plano.resumo()['comprimento_total'] <= comprimento_antes
+
+
+def test_prazo_padrao_vem_da_configuracao():
+    pedido = _pedido(1, 10, 10, criado='2026-10-19T10:00:00')  # segunda-feira
+    assert calcular_prazo_limite(pedido, 2) == datetime(2026, 10, 21, 10, 0)
+    plano = PlanoImpressao(largura_rolo=50, comprimento_corrida=1000, dias_producao=2)
+    plano.sincronizar([pedido])
+    (folha,) = plano.folhas()
+    assert folha['prazo'] == datetime(2026, 10, 21, 10, 0)
@@ -0,0 +1,60 @@
+"""
+Aninhamento por máscara (nesting) com artes que têm margens transparentes
+
+A peça tem o tamanho da área com tinta (recorte do canal alfa, como em
+aplicar_arte_nas_dimensoes e na folha de impressão): a máscara também
+precisa ser recortada, senão as peças vizinhas invadem a arte impressa.
+"""
+
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nesting import CorridaMascara, mascara_de_imagem  # noqa: E402
+
+DPI = 300
+LADO_CM = 400 / DPI * 2.54  # quadrado opaco de 400 px
+
+
+def _arte_com_margem():
+    imagem = Image.new('RGBA', (1000, 1000), (0, 0, 0, 0))
+    imagem.paste((200, 30, 30, 255), (300, 300, 700, 700))
+    buffer = io.BytesIO()
+    imagem.save(buffer, 'PNG', dpi=(DPI, DPI))
+    return buffer.getvalue()
+
+
+def _sobrepoem(a, b):
+    return (a['x'] < b['x'] + b['largura'] and b['x'] < a['x'] + a['largura']
+            and a['y'] < b['y'] + b['altura'] and b['y'] < a['y'] + a['altura'])
+
+
+def test_mascara_recorta_margens_transparentes():
+    mascara = mascara_de_imagem(_arte_com_margem(), 7, 7)
+    assert mascara.all()
+
+
+def test_pecas_com_margem_nao_se_sobrepoem():
+    dados = _arte_com_margem()
+    corrida = CorridaMascara(1, largura=20, comprimento=50, espacamento=0.5,
+                             provedor_arte=lambda arte_id: dados)
+    for unidade in range(8):
+        assert corrida.encaixar({'pedido_id': 1, 'item_indice': 0, 'lado': 'Frente', 'unidade': unidade,
+                                 'largura': LADO_CM, 'altura': LADO_CM, 'arte_id': 'margem'})
+    posicoes = corrida.posicoes
+    for i, a in enumerate(posicoes):
+        for b in posicoes[i + 1:]:
+            assert not _sobrepoem(a, b), (a['x'], a['y'], b['x'], b['y'])
+
+
+@pytest.mark.parametrize('alfa', [0, 4])
+def test_arte_sem_tinta_ocupa_o_retangulo(alfa):
+    imagem = Image.new('RGBA', (100, 100), (0, 0, 0, alfa))
+    buffer = io.BytesIO()
+    imagem.save(buffer, 'PNG')
+    assert mascara_de_imagem(buffer.getvalue(), 3, 2).all()
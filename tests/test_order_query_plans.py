@@ -0,0 +1,40 @@
+"""
+Planos das consultas de order_queries com os índices da migração 6
+
+Banco SQLite temporário, migrado do zero e semeado com ~30 mil pedidos:
+nenhuma consulta quente pode ler a tabela orders inteira.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+# config lê DATABASE_URL na importação de models: o banco temporário vem antes
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'planos.db')}"
+
+import schema_migrations  # noqa: E402
+from models import SessionLocal  # noqa: E402
+from order_queries import semear, verificar_planos  # noqa: E402
+
+PEDIDOS = 30000
+
+
+@pytest.fixture(scope='module')
+def planos():
+    schema_migrations.migrar()
+    db = SessionLocal()
+    try:
+        cliente_id = semear(db, PEDIDOS)
+        db.commit()
+        yield verificar_planos(db, cliente_id)
+    finally:
+        db.close()
+
+
+def test_consultas_sem_varredura_completa(planos):
+    assert planos
+    varrendo = {nome: plano for nome, (plano, varreduras) in planos.items() if varreduras}
+    assert not varrendo
@@ -0,0 +1,72 @@
+"""
+Pré-renderização de PDFs (pdf_workers.PreRenderizador)
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_workers import PreRenderizador, FilaCheia  # noqa: E402
+
+ORCAMENTO = {'budget_number': '0001', 'items': [], 'total_amount': 10}
+
+
+class _Cache:
+    def __init__(self):
+        self.dados = {}
+
+    def obter(self, chave):
+        return self.dados.get(chave)
+
+    def guardar(self, chave, pdf):
+        self.dados[chave] = pdf
+
+
+class _PoolLento:
+    """Envio demorado: abre a janela entre a verificação e o registro do Future"""
+
+    def __init__(self, falha=None):
+        self.envios = 0
+        self.falha = falha
+        self.futuros = []
+
+    def enviar(self, tipo, *args):
+        self.envios += 1
+        time.sleep(0.05)
+        if self.falha:
+            raise self.falha
+        futuro = Future()
+        self.futuros.append(futuro)
+        return futuro
+
+
+def test_pedidos_simultaneos_enviam_um_so_pdf():
+    pool, cache = _PoolLento(), _Cache()
+    pre = PreRenderizador(pool, cache)
+    threads = [threading.Thread(target=pre.agendar, args=('orcamento', ORCAMENTO)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pool.envios == 1
+
+    (futuro,) = pool.futuros
+    chave = pre.agendar('orcamento', ORCAMENTO)
+    assert pre.em_andamento(chave) is futuro
+    futuro.set_result(b'%PDF')
+    assert cache.obter(chave) == b'%PDF'
+    assert pre.em_andamento(chave) is None
+
+
+def test_falha_no_envio_libera_a_reserva():
+    for falha in (FilaCheia(), RuntimeError('pool quebrado')):
+        pool = _PoolLento(falha)
+        pre = PreRenderizador(pool, _Cache())
+        chave = pre.agendar('orcamento', ORCAMENTO)
+        assert pre.em_andamento(chave) is None
+        pre.agendar('orcamento', ORCAMENTO)
+        assert pool.envios == 2